@@ -0,0 +1,25 @@
+"""
+Gunicorn hooks, loaded automatically when gunicorn starts in this directory.
+
+With PROMETHEUS_MULTIPROC_DIR set (to a directory writable by the workers and
+the cron jobs), every process writes its metrics there and /metrics serves
+the sum over all of them.
+"""
+import glob
+import os
+
+
+def on_starting(server):
+    # samples of the previous master would be summed into the new one
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
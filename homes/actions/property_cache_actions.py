@@ -0,0 +1,25 @@
+from django.db import transaction
+
+from homes.selectors import PROPERTY_RESPONSES_VERSION, PROPERTY_READ_SCOPE
+from utils.cache_utils import bump_cache_version
+from utils.db_router import mark_written
+
+
+def _bump_property_responses():
+    # refill the cache from the primary until replicas have caught up with the change
+    mark_written(PROPERTY_READ_SCOPE)
+    bump_cache_version(PROPERTY_RESPONSES_VERSION)
+
+
+def invalidate_property_responses():
+    """
+    Drop every cached property detail and feed payload.
+
+    Runs once the current transaction commits, so no request can cache the
+    old rows again between the bump and the commit. Repeated calls in one
+    transaction (e.g. a row signal per deleted facility) bump only once.
+    """
+    connection = transaction.get_connection()
+    if any(entry[1] is _bump_property_responses for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(_bump_property_responses)
@@ -0,0 +1,51 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Q
+from django.db.models.functions import Coalesce
+
+from homes.models import PropertyFeedBack, Property
+from utils.logger import AppLogger
+
+logger = AppLogger(__name__)
+
+
+def mark_feedback_read(owner, feedback_uuids=None):
+    """
+    Mark unread feedback of an owner as read and lower the per-property unread counters.
+
+    Args:
+        owner: User who received the feedback
+        feedback_uuids (list): Only these feedback; all unread feedback of the owner when omitted
+
+    Returns:
+        int: Number of feedback marked as read
+    """
+    unread = PropertyFeedBack.objects.filter(owner=owner, is_read=False)
+    if feedback_uuids is not None:
+        unread = unread.filter(uuid__in=feedback_uuids)
+
+    with transaction.atomic():
+        # a concurrent call waits on these row locks and then skips the rows this one marked read,
+        # so each feedback lowers its counter once
+        rows = list(unread.select_for_update().order_by('id').values_list('id', 'property_id'))
+        updated = PropertyFeedBack.objects.filter(pk__in=[pk for pk, _ in rows]).update(is_read=True)
+        for property_id, total in sorted(Counter(property_id for _, property_id in rows).items()):
+            Property.objects.filter(pk=property_id).update(unread_feedback_count=F('unread_feedback_count') - total)
+    logger.info(f"Marked {updated} feedback as read for {owner}")
+    return updated
+
+
+def backfill_feedback_counters():
+    """Fill PropertyFeedBack.owner and recount the Property feedback counters from the feedback rows."""
+    with transaction.atomic():
+        PropertyFeedBack.objects.filter(owner__isnull=True).update(
+            owner_id=Subquery(Property.objects.filter(pk=OuterRef('property_id')).values('uploader_id')[:1])
+        )
+        counts = PropertyFeedBack.objects.filter(property_id=OuterRef('pk')).order_by().values('property_id')
+        Property.objects.update(
+            feedback_count=Coalesce(Subquery(counts.annotate(total=Count('id')).values('total')), 0),
+            unread_feedback_count=Coalesce(
+                Subquery(counts.annotate(total=Count('id', filter=Q(is_read=False))).values('total')), 0
+            ),
+        )
@@ -1,24 +1,37 @@
 from homes.models import PropertyImage
 from utils.function import create_file_from_base64
 from utils.logger import AppLogger
+from utils.storage import claim_upload
 
 logger = AppLogger(__name__)
 
+
+def _image_file(img, property_instance):
+    """The base64 "image" of an entry as a file, or the name of the direct upload in its "key"."""
+    data = img.get("image")
+    if data:
+        return create_file_from_base64(data)
+    key = img.get("key")
+    if key:
+        return claim_upload(property_instance.uploader, key, 'property_image')
+    return None
+
+
 def update_property_images(images_data, property_instance):
     """
      Replace existing property images with a new list of images.
 
      Args:
          property_instance: The Property instance whose images are being updated.
-         images_data: A list of dictionaries containing 'filename' and Base64-encoded 'data'.
+         images_data: A list of dictionaries containing 'filename' and Base64-encoded 'data',
+                      or the 'key' of a direct upload (utils/storage.py).
                       Example: [{"filename": "image1.jpg", "data": "...base64..."}]
      """
     if images_data:
         property_instance.property_images.all().delete()
         for img in images_data:
-            data = img.get("image")
-            if data:
-                image_file = create_file_from_base64(data)
+            image_file = _image_file(img, property_instance)
+            if image_file:
                 PropertyImage.objects.create(property=property_instance, image=image_file)
                 logger.info(f"Successfully create image {image_file}")
 
@@ -29,15 +42,15 @@ def create_property_images(property_instance, images_data):
 
     Args:
         property_instance: The Property instance to associate the images with.
-        images_data: A list of dictionaries containing 'filename' and Base64-encoded 'data'.
+        images_data: A list of dictionaries containing 'filename' and Base64-encoded 'data',
+                     or the 'key' of a direct upload (utils/storage.py).
                      Example: [{"filename": "image1.jpg", "data": "...base64..."}]
 
     Returns:
         None
     """
     for img in images_data:
-        data = img.get("image")
-        if data:
-            image_file = create_file_from_base64(data)
+        image_file = _image_file(img, property_instance)
+        if image_file:
             PropertyImage.objects.create(property=property_instance, image=image_file)
             logger.info(f"Successfully create image {image_file}")
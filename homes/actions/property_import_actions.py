@@ -0,0 +1,260 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from homes.actions.property_cache_actions import invalidate_property_responses
+from homes.models import Property, FacilityProperty, PropertyCost, PropertyImage, PendingPropertyImage
+from homes.serializers import PropertyImportRowSerializer
+from utils.logger import AppLogger
+from utils.remote_files import RemoteFileError, fetch_remote_file
+
+logger = AppLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'xlsx', 'ndjson')
+# columns overwritten when an imported row matches an existing (name, type, uploader)
+UPSERT_FIELDS = [
+    'category', 'address', 'price', 'total_price', 'maintenance', 'description', 'latitude', 'longitude',
+    'region', 'district', 'updated_by', 'updated_at',
+]
+
+
+def guess_import_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'jsonl': 'ndjson', 'json': 'ndjson'}.get(extension, extension)
+
+
+def _clean_row(row):
+    # empty cells count as missing so optional columns fall back to their defaults
+    return {key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+
+
+def read_import_rows(file, import_format):
+    """
+    Yield (row number, dict) for each data row of a CSV, XLSX or NDJSON file without loading it whole.
+
+    The dict is None for an NDJSON line that is not a JSON object.
+
+    Args:
+        file: Binary file object
+        import_format (str): csv, xlsx or ndjson
+    """
+    if import_format == 'csv':
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        for row in reader:
+            yield reader.line_num, _clean_row(row)
+    elif import_format == 'ndjson':
+        for line_number, line in enumerate(io.TextIOWrapper(file, encoding='utf-8'), start=1):
+            line = line.strip()
+            if line:
+                try:
+                    yield line_number, _clean_row(json.loads(line))
+                except (ValueError, AttributeError):
+                    yield line_number, None
+    elif import_format == 'xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [str(header).strip() if header is not None else None for header in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield row_number, _clean_row(dict(zip(headers, values)))
+        workbook.close()
+    else:
+        raise ValueError(f"Unknown import format: {import_format}, expected one of {', '.join(IMPORT_FORMATS)}")
+
+
+def _save_chunk(chunk, uploader):
+    """
+    Upsert one chunk of validated rows, replace their facilities and costs and queue their new image URLs.
+
+    Returns:
+        tuple: (created, updated)
+    """
+    # the last row wins when a file repeats the same property
+    rows = {(row['name'], row['type']): row for row in chunk}
+    now = timezone.now()
+    properties = []
+    for row in rows.values():
+        fields = {key: value for key, value in row.items() if key not in ('facilities', 'property_costs', 'images')}
+        properties.append(Property(uploader=uploader, created_by=uploader, updated_by=uploader, updated_at=now, **fields))
+
+    names = [name for name, _ in rows]
+    with transaction.atomic():
+        existing = set(Property.objects.filter(uploader=uploader, name__in=names).values_list('name', 'type'))
+        Property.objects.bulk_create(
+            properties,
+            update_conflicts=True,
+            unique_fields=['name', 'type', 'uploader'],
+            update_fields=UPSERT_FIELDS,
+        )
+        ids = {
+            (name, property_type): pk
+            for name, property_type, pk in Property.objects.filter(uploader=uploader, name__in=names)
+            .values_list('name', 'type', 'id')
+            if (name, property_type) in rows
+        }
+
+        property_ids = list(ids.values())
+        FacilityProperty.objects.filter(property_id__in=property_ids).delete()
+        PropertyCost.objects.filter(property_id__in=property_ids).delete()
+        PendingPropertyImage.objects.filter(property_id__in=property_ids, status__in=["PENDING", "FAILED"]).delete()
+        # a re-imported file does not download, and attach, the images it already brought in again
+        queued = set(
+            PendingPropertyImage.objects.filter(property_id__in=property_ids).values_list('property_id', 'source_url')
+        )
+
+        audit = {'created_by': uploader, 'updated_by': uploader}
+        FacilityProperty.objects.bulk_create([
+            FacilityProperty(property_id=ids[key], name=name, **audit)
+            for key, row in rows.items() for name in row['facilities']
+        ])
+        PropertyCost.objects.bulk_create([
+            PropertyCost(property_id=ids[key], name=cost['name'], amount=cost['amount'], **audit)
+            for key, row in rows.items() for cost in row['property_costs']
+        ])
+        PendingPropertyImage.objects.bulk_create([
+            PendingPropertyImage(property_id=ids[key], source_url=url, **audit)
+            for key, row in rows.items() for url in dict.fromkeys(row['images'])
+            if (ids[key], url) not in queued
+        ])
+        # bulk_create sends no post_save signals
+        invalidate_property_responses()
+
+    created = len([key for key in rows if key not in existing])
+    return created, len(rows) - created
+
+
+def import_properties(file, import_format, uploader, chunk_size=None):
+    """
+    Bulk import properties for an uploader from a CSV, XLSX or NDJSON file.
+
+    Rows are validated one by one with PropertyImportRowSerializer while the
+    file is read. Valid rows are upserted on (name, type, uploader) in chunks
+    with bulk_create, their facilities and costs are replaced in bulk and
+    their image URLs are queued for process_pending_images_cron. Invalid rows
+    are reported and skipped; they never abort the import.
+
+    Columns: name, type, category, address, price, total_price, maintenance,
+    and optionally description, latitude, longitude, region, district,
+    facilities ("Parking; Wifi"), property_costs ("Water:10000; Security:5000")
+    and images (";" separated URLs). NDJSON rows may use JSON lists instead.
+
+    Returns:
+        dict: total_rows, created, updated, failed and the per-row errors
+    """
+    chunk_size = chunk_size or getattr(settings, 'PROPERTY_IMPORT_CHUNK_SIZE', 500)
+    max_errors = getattr(settings, 'PROPERTY_IMPORT_MAX_REPORTED_ERRORS', 1000)
+    result = {'total_rows': 0, 'created': 0, 'updated': 0, 'failed': 0, 'errors': []}
+
+    def flush(chunk):
+        created, updated = _save_chunk(chunk, uploader)
+        result['created'] += created
+        result['updated'] += updated
+        chunk.clear()
+
+    chunk = []
+    for row_number, row in read_import_rows(file, import_format):
+        result['total_rows'] += 1
+        serializer = PropertyImportRowSerializer(data=row) if row is not None else None
+        if serializer is None or not serializer.is_valid():
+            result['failed'] += 1
+            if len(result['errors']) < max_errors:
+                errors = serializer.errors if serializer is not None else {'row': ["Invalid JSON object"]}
+                result['errors'].append({'row': row_number, 'errors': errors})
+            continue
+
+        chunk.append(serializer.validated_data)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+    if chunk:
+        flush(chunk)
+
+    logger.info(
+        f"✅ Property import for {uploader}: {result['created']} created, "
+        f"{result['updated']} updated, {result['failed']} failed"
+    )
+    return result
+
+
+def _claim_pending_images(batch_size, claim_timeout):
+    """
+    Mark up to `batch_size` queued images PROCESSING and return them.
+
+    SELECT ... FOR UPDATE SKIP LOCKED lets several workers claim at once, and
+    the lock is only held for the claim. Claims older than `claim_timeout`
+    seconds belong to a worker that died and are taken over.
+    """
+    stale = timezone.now() - timedelta(seconds=claim_timeout)
+    with transaction.atomic():
+        claimed = list(
+            PendingPropertyImage.objects.select_for_update(skip_locked=True)
+            .filter(Q(status="PENDING") | Q(status="PROCESSING", updated_at__lt=stale))
+            .order_by('id')[:batch_size]
+        )
+        PendingPropertyImage.objects.filter(pk__in=[image.pk for image in claimed]).update(
+            status="PROCESSING", updated_at=timezone.now()
+        )
+    return claimed
+
+
+def _record_failed_download(pending_image, error, max_attempts):
+    pending_image.attempts += 1
+    pending_image.error = str(error)
+    pending_image.status = "FAILED" if pending_image.attempts >= max_attempts else "PENDING"
+    pending_image.save(update_fields=['attempts', 'error', 'status', 'updated_at'])
+    logger.error(f"❌ Failed to download image {pending_image.source_url}: {error}")
+
+
+def process_pending_images(batch_size=None):
+    """
+    Download queued import images and attach them to their properties.
+
+    Entries are claimed in a short transaction, downloaded with no
+    transaction open, and each result is saved in its own transaction.
+    Downloads go through fetch_remote_file, so only public http(s) image URLs
+    up to PROPERTY_IMAGE_MAX_BYTES are fetched. Failed downloads are retried
+    until PROPERTY_IMAGE_MAX_ATTEMPTS is reached.
+
+    Returns:
+        int: Number of images attached
+    """
+    batch_size = batch_size or getattr(settings, 'PROPERTY_IMAGE_BATCH_SIZE', 50)
+    max_attempts = getattr(settings, 'PROPERTY_IMAGE_MAX_ATTEMPTS', 3)
+    timeout = getattr(settings, 'PROPERTY_IMAGE_DOWNLOAD_TIMEOUT', 10)
+    max_bytes = getattr(settings, 'PROPERTY_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+    claim_timeout = getattr(settings, 'PROPERTY_IMAGE_CLAIM_TIMEOUT', 10 * 60)
+    attached = 0
+
+    pending = _claim_pending_images(batch_size, claim_timeout)
+    for pending_image in pending:
+        try:
+            content, url = fetch_remote_file(pending_image.source_url, timeout=timeout, max_bytes=max_bytes)
+        except (RemoteFileError, requests.RequestException) as ex:
+            _record_failed_download(pending_image, ex, max_attempts)
+            continue
+
+        filename = url.rsplit('/', 1)[-1].split('?', 1)[0] or "image.jpg"
+        with transaction.atomic():
+            PropertyImage.objects.create(
+                property_id=pending_image.property_id,
+                image=ContentFile(content, name=filename),
+                created_by_id=pending_image.created_by_id,
+                updated_by_id=pending_image.created_by_id,
+            )
+            pending_image.status = "DONE"
+            pending_image.error = None
+            pending_image.save(update_fields=['status', 'error', 'updated_at'])
+        attached += 1
+
+    if pending:
+        logger.info(f"✅ Attached {attached} of {len(pending)} imported images")
+    return attached
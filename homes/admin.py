@@ -1,18 +1,21 @@
 from django.contrib import admin
 
-from homes.models import Property, PropertyImage, FacilityProperty, Facility, PropertyFeedBack, PropertyCost
+from homes.models import Property, PropertyImage, FacilityProperty, Facility, PropertyFeedBack, PropertyCost, \
+    PendingPropertyImage
+from utils.admin_utils import LargeTableAdmin
 
 admin.site.site_header = "More Homes"
 admin.site.site_title = "More Homes"
 admin.site.index_title = "More Homes"
 
 @admin.register(Property)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(LargeTableAdmin):
     list_display = [
         'uploader', 'name', 'type', 'address', 'price', 'category', 'is_booked', 'region', 'district', 'longitude',
         'latitude', 'created_at'
     ]
-    list_filter = ['is_booked', 'category', 'created_at', 'updated_at']
+    list_select_related = ['uploader']
+    list_filter = ['is_booked', 'category', 'created_at']
     list_max_show_all = True
     search_fields = ['name']
     list_per_page = 30
@@ -21,6 +24,7 @@ class PropertyAdmin(admin.ModelAdmin):
 @admin.register(PropertyImage)
 class PropertyImageAdmin(admin.ModelAdmin):
     list_display = ['property', 'image', 'created_at', 'updated_at']
+    list_select_related = ['property']
     list_filter = ['created_at', 'updated_at']
     list_per_page = 30
 
@@ -35,6 +39,7 @@ class FacilityAdmin(admin.ModelAdmin):
 @admin.register(PropertyFeedBack)
 class PropertyFeedBackAdmin(admin.ModelAdmin):
     list_display = ['property', 'message', 'created_at', 'updated_at']
+    list_select_related = ['property']
     list_filter = ['created_at', 'updated_at']
     list_per_page = 30
 
@@ -42,11 +47,22 @@ class PropertyFeedBackAdmin(admin.ModelAdmin):
 @admin.register(FacilityProperty)
 class FacilityPropertyAdmin(admin.ModelAdmin):
     list_display = ['property', 'name', 'created_at', 'updated_at']
+    list_select_related = ['property']
     list_filter = ['created_at', 'updated_at']
     list_per_page = 30
 
 @admin.register(PropertyCost)
 class FacilityPropertyAdmin(admin.ModelAdmin):
     list_display = ['property', 'name', 'amount', 'created_at', 'updated_at']
+    list_select_related = ['property']
     list_filter = ['created_at', 'updated_at']
     list_per_page = 30
+
+
+@admin.register(PendingPropertyImage)
+class PendingPropertyImageAdmin(admin.ModelAdmin):
+    list_display = ['property', 'source_url', 'status', 'attempts', 'created_at']
+    list_select_related = ['property']
+    list_filter = ['status']
+    raw_id_fields = ['property']
+    list_per_page = 30
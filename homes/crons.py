@@ -0,0 +1,18 @@
+from homes.actions.property_import_actions import process_pending_images
+from utils.logger import AppLogger
+from utils.metrics import track_cron
+from utils.tracing import trace_job
+
+logger = AppLogger(__name__)
+
+
+@track_cron('process_pending_images')
+@trace_job('process_pending_images')
+def process_pending_images_cron():
+    """
+    Cron job: Download images referenced by bulk property imports.
+
+    Drains one batch of the PendingPropertyImage queue per run.
+    """
+    logger.info("process_pending_images_cron started")
+    process_pending_images()
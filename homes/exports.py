@@ -0,0 +1,12 @@
+from homes.models import Property
+from utils.db_router import get_read_db
+from utils.export_utils import ExportDataset
+
+property_export = ExportDataset(
+    name="properties",
+    get_queryset=lambda: Property.objects.using(get_read_db()).order_by('pk'),
+    fields=(
+        'uuid', 'name', 'type', 'category', 'address', 'region', 'district', 'price', 'total_price', 'maintenance',
+        'latitude', 'longitude', 'is_booked', 'uploader__username', 'uploader__phone', 'created_at', 'updated_at',
+    ),
+)
@@ -0,0 +1,71 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from homes.models import FacilityProperty, Property, PropertyCost, PropertyImage
+from homes.selectors import get_property_to_display
+from homes.serializers import PropertySerializer
+from users.models import User
+from utils.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer with ORJSONRenderer on a serialized property feed page. "
+        "The properties are created in a transaction that is rolled back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=200, help="Properties in the rendered page")
+        parser.add_argument('--rounds', type=int, default=50, help="Renders to time per renderer")
+
+    def _generate(self, count):
+        uploader = User.objects.create(username='render-bench', phone='+255700000000', password='!')
+        properties = Property.objects.bulk_create([
+            Property(
+                uploader=uploader, name=f"Bench property {index}", type="Apartment", category="Rent",
+                address=f"Plot {index}, Mikocheni", price=450000, total_price=450000, maintenance=25000,
+                description="Two bedrooms, balcony and parking. " * 4, latitude='-6.7712345', longitude='39.2412345',
+                region="Dar es Salaam", district="Kinondoni",
+            )
+            for index in range(count)
+        ])
+        FacilityProperty.objects.bulk_create([
+            FacilityProperty(property=property_obj, name=name)
+            for property_obj in properties for name in ("Parking", "Wifi", "Security")
+        ])
+        PropertyCost.objects.bulk_create([
+            PropertyCost(property=property_obj, name=name, amount=amount)
+            for property_obj in properties for name, amount in (("Water", 10000), ("Security", 5000))
+        ])
+        PropertyImage.objects.bulk_create([
+            PropertyImage(property=property_obj, image=f"property/images/bench-{property_obj.pk}-{number}.jpg")
+            for property_obj in properties for number in range(3)
+        ])
+
+    def _time(self, renderer, data, rounds):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            rendered = renderer.render(data)
+        return (time.perf_counter() - started) / rounds, rendered
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._generate(options['properties'])
+            request = RequestFactory().get('/api/v1/property/')
+            data = PropertySerializer(get_property_to_display(None), many=True, context={'request': request}).data
+
+            stdlib, expected = self._time(JSONRenderer(), data, options['rounds'])
+            fast, rendered = self._time(ORJSONRenderer(), data, options['rounds'])
+            if json.loads(rendered) != json.loads(expected):
+                self.stderr.write(self.style.ERROR("ORJSONRenderer output differs from JSONRenderer"))
+
+            self.stdout.write(f"{len(data)} properties, {len(rendered) / 1024:.0f} KB per page:")
+            self.stdout.write(f"  {'JSONRenderer':<16} {stdlib * 1000:8.2f} ms")
+            self.stdout.write(f"  {'ORJSONRenderer':<16} {fast * 1000:8.2f} ms  ({stdlib / fast:.1f}x)")
+
+            transaction.set_rollback(True)
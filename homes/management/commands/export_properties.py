@@ -0,0 +1,7 @@
+from homes.exports import property_export
+from utils.export_utils import ExportCommand
+
+
+class Command(ExportCommand):
+    help = "Export all properties as csv, ndjson or xlsx"
+    dataset = property_export
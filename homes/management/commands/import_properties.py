@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from homes.actions.property_import_actions import import_properties, guess_import_format, IMPORT_FORMATS
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk import properties for an uploader from a csv, xlsx or ndjson file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--uploader', required=True, help="Username of the broker or owner")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            uploader = User.objects.get(username=options['uploader'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['uploader']} does not exist")
+
+        import_format = options['format'] or guess_import_format(options['path'])
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f"Unknown import format: {import_format}, use --format")
+
+        with open(options['path'], 'rb') as file:
+            result = import_properties(file, import_format, uploader, chunk_size=options['chunk_size'])
+        self.stdout.write(json.dumps(result, indent=2, default=str))
@@ -0,0 +1,128 @@
+# Generated by Django 5.2 on 2026-10-19 16:20
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='facilityproperty',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Property Facilities', 'verbose_name_plural': 'Property Facilities'},
+        ),
+        migrations.AlterModelOptions(
+            name='property',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Property', 'verbose_name_plural': 'Properties'},
+        ),
+        migrations.AlterModelOptions(
+            name='propertyimage',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Property Images', 'verbose_name_plural': 'Property Images'},
+        ),
+        migrations.AlterField(
+            model_name='facilityproperty',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Facility Name'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='address',
+            field=models.TextField(verbose_name='Property Address'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='category',
+            field=models.CharField(choices=[('Rent', 'Rent'), ('Sale', 'Sale'), ('Short Stay', 'Short Stay')], max_length=255, verbose_name='Property Category'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='name',
+            field=models.CharField(max_length=255, verbose_name='Propert Name'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Property Price'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='type',
+            field=models.CharField(choices=[('House', 'House'), ('Apartment', 'Apartment'), ('Room', 'Room'), ('Land', 'Land'), ('Office', 'Office'), ('Construction', 'Construction')], max_length=100, verbose_name='Property Type'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(upload_to='property/images/', verbose_name='Property Image'),
+        ),
+        migrations.AlterModelTable(
+            name='facilityproperty',
+            table='property_facility',
+        ),
+        migrations.CreateModel(
+            name='Facility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who created this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, help_text='User who last updated this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Facility',
+                'verbose_name_plural': 'Facilities',
+                'db_table': 'facility',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PropertyCost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=200, verbose_name='Cost')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Amount')),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who created this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='property_costs', to='homes.property')),
+                ('updated_by', models.ForeignKey(blank=True, help_text='User who last updated this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Property Costs',
+                'verbose_name_plural': 'Property Costs',
+                'db_table': 'property_cost',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PropertyFeedBack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('message', models.TextField()),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who created this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='property_feedback', to='homes.property')),
+                ('updated_by', models.ForeignKey(blank=True, help_text='User who last updated this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Property Feedback',
+                'verbose_name_plural': 'Property Feedback',
+                'db_table': 'property_feedback',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
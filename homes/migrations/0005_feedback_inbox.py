@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    PropertyFeedBack = apps.get_model('homes', 'PropertyFeedBack')
+    Property = apps.get_model('homes', 'Property')
+    PropertyFeedBack.objects.filter(owner__isnull=True).update(
+        owner_id=Subquery(Property.objects.filter(pk=OuterRef('property_id')).values('uploader_id')[:1])
+    )
+    counts = PropertyFeedBack.objects.filter(property_id=OuterRef('pk')).order_by().values('property_id')
+    Property.objects.update(
+        feedback_count=Coalesce(Subquery(counts.annotate(total=Count('id')).values('total')), 0),
+        unread_feedback_count=Coalesce(
+            Subquery(counts.annotate(total=Count('id', filter=Q(is_read=False))).values('total')), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homes', '0004_pendingpropertyimage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='feedback_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='unread_feedback_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propertyfeedback',
+            name='is_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='propertyfeedback',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_feedback', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='propertyfeedback',
+            index=models.Index(fields=['owner', '-created_at'], name='feedback_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyfeedback',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['owner', '-created_at'], name='feedback_owner_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyfeedback',
+            index=models.Index(fields=['property', '-created_at'], name='feedback_property_created_idx'),
+        ),
+    ]
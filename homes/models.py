@@ -45,6 +45,9 @@ class Property(AuditModel):
     region = models.CharField(max_length=100, null=True, blank=True)
     district = models.CharField(max_length=100, null=True, blank=True)
     is_booked = models.BooleanField(default=False)
+    # maintained by the feedback signals and mark_feedback_read
+    feedback_count = models.PositiveIntegerField(default=0, editable=False)
+    unread_feedback_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -55,6 +58,11 @@ class Property(AuditModel):
         verbose_name_plural = "Properties"
         verbose_name = "Property"
         unique_together = ('name', 'type', 'uploader')
+        indexes = [
+            # admin changelist filters
+            models.Index(fields=['is_booked', 'category', '-created_at'], name='property_booked_category_idx'),
+            models.Index(fields=['-created_at'], name='property_created_idx'),
+        ]
 
 
 class PropertyImage(AuditModel):
@@ -101,7 +109,13 @@ class PropertyCost(AuditModel):
 
 class PropertyFeedBack(AuditModel):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="property_feedback")
+    # copy of property.uploader so an owner's inbox is read from a single index
+    owner = models.ForeignKey(
+        'users.User', on_delete=models.CASCADE, null=True, blank=True, related_name='received_feedback',
+        db_index=False
+    )
     message = models.TextField()
+    is_read = models.BooleanField(default=False)
 
     def __str__(self):
         return f"{self.property.name}"
@@ -110,4 +124,38 @@ class PropertyFeedBack(AuditModel):
         db_table = 'property_feedback'
         verbose_name_plural = "Property Feedback"
         verbose_name = "Property Feedback"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='feedback_owner_created_idx'),
+            models.Index(
+                fields=['owner', '-created_at'], name='feedback_owner_unread_idx', condition=models.Q(is_read=False)
+            ),
+            models.Index(fields=['property', '-created_at'], name='feedback_property_created_idx'),
+        ]
+
+class PendingPropertyImage(AuditModel):
+    """Image reference from a bulk import, downloaded in the background by process_pending_images_cron."""
+    STATUS_CHOICES = (
+        ("PENDING", "PENDING"),
+        ("PROCESSING", "PROCESSING"),
+        ("DONE", "DONE"),
+        ("FAILED", "FAILED"),
+    )
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='pending_images')
+    source_url = models.URLField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source_url}"
+
+    class Meta:
+        db_table = 'property_pending_image'
+        verbose_name_plural = "Pending Property Images"
+        verbose_name = "Pending Property Image"
+        indexes = [
+            models.Index(
+                fields=['id'], name='pending_image_queue_idx', condition=models.Q(status__in=["PENDING", "PROCESSING"])
+            ),
+        ]
@@ -1,18 +1,78 @@
-from homes.models import Property
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from homes.models import Property, PropertyFeedBack
+from utils.cache_utils import get_cache_versions
+from utils.db_router import get_read_db
+from utils.tracing import traced
+
+# bumped whenever a property, its images, facilities or costs change
+PROPERTY_RESPONSES_VERSION = 'property-responses'
+# replica reads of properties go to the primary for a moment after that bump
+PROPERTY_READ_SCOPE = 'properties'
+
+# columns read by PropertyFeedBackSerializer
+FEEDBACK_FIELDS = (
+    'id', 'uuid', 'message', 'is_read', 'created_at', 'property', 'created_by',
+    'property__uuid', 'property__name', 'created_by__first_name', 'created_by__last_name',
+)
 
 
 def get_property_to_display(uploader):
     return (
-        Property.objects.all().
+        Property.objects.using(get_read_db(PROPERTY_READ_SCOPE)).
         filter(is_booked=False).
         exclude(uploader=uploader).
         prefetch_related('uploader', 'property_images', 'facilities')
     )
 
 
-def get_property_detail(property_uuid) -> Property:
-    return Property.objects.get(uuid=property_uuid)
+@traced()
+def get_property_detail(property_uuid, using=None) -> Property:
+    """Read from a replica unless `using` is given; load a property that will be saved from the primary."""
+    return Property.objects.using(using or get_read_db(PROPERTY_READ_SCOPE)).get(uuid=property_uuid)
+
+
+def property_detail_cache_key(property_uuid, host):
+    # image URLs are absolute, so the payload depends on the host it was requested on
+    version, = get_cache_versions(PROPERTY_RESPONSES_VERSION)
+    return f"property-detail:{version}:{host}:{property_uuid}"
+
+
+def property_feed_cache_key(user_id, host):
+    # the feed leaves out the user's own properties, so it is cached per user
+    version, = get_cache_versions(PROPERTY_RESPONSES_VERSION)
+    return f"property-feed:{version}:{host}:{user_id}"
 
 
 def get_property_by_uploader(uploader):
-    return Property.objects.filter(uploader=uploader)
+    return Property.objects.using(get_read_db()).filter(uploader=uploader)
+
+
+def _feedback_queryset():
+    return (
+        PropertyFeedBack.objects.using(get_read_db()).select_related('property', 'created_by')
+        .only(*FEEDBACK_FIELDS)
+        .order_by('-created_at', '-id')
+    )
+
+
+def get_owner_feedback(owner, unread_only=False):
+    """Feedback received by an owner on all their properties, newest first, read through the owner index."""
+    feedback = _feedback_queryset().filter(owner=owner)
+    if unread_only:
+        feedback = feedback.filter(is_read=False)
+    return feedback
+
+
+def get_property_feedback(property_id):
+    """Feedback of one property, newest first."""
+    return _feedback_queryset().filter(property_id=property_id)
+
+
+def get_owner_unread_feedback_count(owner):
+    """Unread feedback of an owner from the per-property counters, without counting feedback rows."""
+    return Property.objects.using(get_read_db()).filter(uploader=owner).aggregate(
+        total=Coalesce(Sum('unread_feedback_count'), 0)
+    )['total']
+
@@ -1,6 +1,5 @@
 import json
 
-from decouple import config
 from django.db.models import Sum, Value, DecimalField
 from django.db.models.functions import Coalesce
 from rest_framework import serializers
@@ -9,9 +8,9 @@ from homes.actions.property_facility_actions import update_property_facilities,
     create_property_cost
 from homes.actions.property_image_actions import update_property_images, create_property_images
 from homes.models import PropertyImage, FacilityProperty, Property, Facility, PropertyFeedBack, PropertyCost
+from users.selectors import get_user_group_names
 from utils.function import check_json_list_type
-
-base_url = config('BASE_URL')
+from utils.media import media_url
 
 
 class FacilitySerializer(serializers.ModelSerializer):
@@ -40,11 +39,7 @@ class PropertyImageSerializer(serializers.ModelSerializer):
         fields = ["id", "image", "image_url"]
 
     def get_image_url(self, obj):
-        request = self.context.get("request")
-        if obj.image and hasattr(obj.image, "url"):
-            # Use request.build_absolute_uri() for a full URL
-            return request.build_absolute_uri(obj.image.url) if request else f"{base_url}{obj.image.url}"
-        return None
+        return media_url(obj.image, self.context.get("request"))
 
 
 class PropertySerializer(serializers.ModelSerializer):
@@ -91,7 +86,7 @@ class PropertySerializer(serializers.ModelSerializer):
 
     def get_uploader_role(self, obj):
         """Return a comma-separated string of group names the user belongs to."""
-        group_name = [group.name for group in obj.uploader.groups.all()]
+        group_name = get_user_group_names(obj.uploader_id)
         if not group_name:
             print("user has no group")
             return None
@@ -101,20 +96,17 @@ class PropertySerializer(serializers.ModelSerializer):
     def get_uploader_image_url(self, obj):
         """Return the full URL of the uploader's profile image, or None if not available."""
         try:
-            if obj.uploader and obj.uploader.profile:
-                return f"{base_url}{obj.uploader.profile.url}"
+            if obj.uploader:
+                return media_url(obj.uploader.profile, self.context.get("request"), variant='thumb')
         except Exception:
             return None
         return None
 
     def get_thumbnail(self, obj):
-        """Return the URL of the first property image as thumbnail, or None if no images exist. use related name"""
+        """Return the URL of the thumbnail variant of the first property image, or None if no images exist."""
         first_image = obj.property_images.first()
-        if first_image and first_image.image:
-            request = self.context.get("request")
-            if request:
-                return request.build_absolute_uri(first_image.image.url)
-            return first_image.image.url
+        if first_image:
+            return media_url(first_image.image, self.context.get("request"), variant='thumb')
         return None
 
     # --- CREATE with Base64 images ---
@@ -182,6 +174,42 @@ class PropertySerializer(serializers.ModelSerializer):
         return instance
 
 
+class DelimitedListField(serializers.ListField):
+    """List field that also accepts a `;` separated string, as found in CSV and XLSX cells."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [item.strip() for item in data.split(';') if item.strip()]
+        return super().to_internal_value(data)
+
+
+class PropertyCostListField(DelimitedListField):
+    """Property costs as a list of {"name", "amount"} or a "Water:10000; Security:5000" string."""
+
+    def __init__(self, **kwargs):
+        super().__init__(child=PropertyCostSerializer(), **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [item.strip() for item in data.split(';') if item.strip()]
+            data = [dict(zip(('name', 'amount'), map(str.strip, item.rsplit(':', 1)))) for item in data]
+        return super().to_internal_value(data)
+
+
+class PropertyImportRowSerializer(serializers.ModelSerializer):
+    """Validates one row of a bulk property import."""
+    facilities = DelimitedListField(child=serializers.CharField(max_length=100), required=False, default=list)
+    property_costs = PropertyCostListField(required=False, default=list)
+    images = DelimitedListField(child=serializers.URLField(max_length=500), required=False, default=list)
+
+    class Meta:
+        model = Property
+        fields = [
+            "name", "type", "category", "address", "price", "total_price", "maintenance", "description",
+            "latitude", "longitude", "region", "district", "facilities", "property_costs", "images"
+        ]
+
+
 class PropertyFeedBackSerializer(serializers.ModelSerializer):
     property_uuid = serializers.SerializerMethodField()
     property_name = serializers.SerializerMethodField()
@@ -189,8 +217,8 @@ class PropertyFeedBackSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PropertyFeedBack
-        fields = ['uuid', 'message', 'property_uuid', 'property_name', 'sender_name']
-        read_only_fields = ['property_uuid']
+        fields = ['uuid', 'message', 'is_read', 'created_at', 'property_uuid', 'property_name', 'sender_name']
+        read_only_fields = ['property_uuid', 'is_read']
 
     def get_property_uuid(self, obj):
         return obj.property.uuid
@@ -205,9 +233,9 @@ class PropertyFeedBackSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         request = self.context["request"]
-        property_instance = PropertyFeedBack.objects.create(**validated_data)
-        property_instance.created_by = request.user
-        property_instance.updated_by = request.user
-        property_instance.save()
-
-        return property_instance
+        return PropertyFeedBack.objects.create(
+            owner_id=validated_data['property'].uploader_id,
+            created_by=request.user,
+            updated_by=request.user,
+            **validated_data
+        )
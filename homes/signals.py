@@ -0,0 +1,34 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from homes.actions.property_cache_actions import invalidate_property_responses
+from homes.models import PropertyFeedBack, Property, PropertyImage, FacilityProperty, PropertyCost
+
+
+@receiver(post_save, sender=PropertyFeedBack)
+def count_property_feedback(sender, instance, created, **kwargs):
+    if created:
+        Property.objects.filter(pk=instance.property_id).update(
+            feedback_count=F('feedback_count') + 1,
+            unread_feedback_count=F('unread_feedback_count') + (0 if instance.is_read else 1),
+        )
+
+
+@receiver(post_delete, sender=PropertyFeedBack)
+def uncount_property_feedback(sender, instance, **kwargs):
+    Property.objects.filter(pk=instance.property_id, feedback_count__gt=0).update(
+        feedback_count=F('feedback_count') - 1,
+    )
+    if not instance.is_read:
+        Property.objects.filter(pk=instance.property_id, unread_feedback_count__gt=0).update(
+            unread_feedback_count=F('unread_feedback_count') - 1,
+        )
+
+
+@receiver([post_save, post_delete], sender=Property)
+@receiver([post_save, post_delete], sender=PropertyImage)
+@receiver([post_save, post_delete], sender=FacilityProperty)
+@receiver([post_save, post_delete], sender=PropertyCost)
+def expire_property_responses(sender, **kwargs):
+    invalidate_property_responses()
@@ -1,3 +1,948 @@
-from django.test import TestCase
+import contextvars
+import csv
+import gzip
+import io
+import json
+import re
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from moto import mock_aws
+from PIL import Image
+import requests
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+import zstandard
+
+from homes.actions.property_feedback_actions import backfill_feedback_counters, mark_feedback_read
+from homes.actions.property_image_actions import create_property_images
+from homes.actions import property_import_actions
+from homes.actions.property_import_actions import IMPORT_FORMATS, import_properties, process_pending_images, \
+    read_import_rows
+from homes.models import FacilityProperty, PendingPropertyImage, Property, PropertyCost, PropertyFeedBack, \
+    PropertyImage
+from homes.selectors import PROPERTY_READ_SCOPE, get_property_to_display
+from homes.serializers import PropertySerializer
+from users.models import User
+from utils import remote_files
+from utils.compression import ENCODINGS, CompressionMiddleware, negotiate_encoding
+from utils.db_router import PRIMARY_PIN_COOKIE, ReplicaStickinessMiddleware, get_read_db, mark_written
+from utils.media import HashedFileSystemStorage, serve_media
+from utils.remote_files import RemoteFileError, check_public_url
+from utils.renderers import ORJSONRenderer
+from utils.sql_profiler import PROFILE_HEADER, QueryStatsStore, SQLProfilerMiddleware, fingerprint, normalize_sql, \
+    query_stats
+from utils.storage import claim_upload
+
+
+def create_property(uploader, name="Sea View", **fields):
+    return Property.objects.create(
+        uploader=uploader, name=name, type="House", category="Rent", address="Mikocheni", price=500000,
+        total_price=500000, maintenance=0, **fields
+    )
+
+
+def png_bytes():
+    output = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(output, format='PNG')
+    return output.getvalue()
+
+
+class ImageServerHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the hosts an import links to."""
+    routes = {
+        '/photo.png': (200, {'Content-Type': 'image/png'}, png_bytes()),
+        '/page.html': (200, {'Content-Type': 'text/html'}, b'<html></html>'),
+        '/huge.png': (200, {'Content-Type': 'image/png'}, b'\x89PNG' + b'0' * 4096),
+        '/to-metadata': (302, {'Location': 'http://169.254.169.254/latest/meta-data/'}, b''),
+        '/to-photo': (302, {'Location': '/photo.png'}, b''),
+    }
+
+    last_host = None
+
+    def do_GET(self):
+        ImageServerHandler.last_host = self.headers['Host']
+        code, headers, body = self.routes.get(self.path, (404, {'Content-Type': 'text/plain'}, b'missing'))
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PublicUrlTests(SimpleTestCase):
+    def test_refuses_internal_and_non_http_urls(self):
+        for url in (
+            'ftp://example.com/photo.png',
+            'file:///etc/passwd',
+            'http://127.0.0.1/photo.png',
+            'http://localhost:8000/admin/',
+            'http://10.0.0.5/photo.png',
+            'http://192.168.1.1/photo.png',
+            'http://169.254.169.254/latest/meta-data/',
+            'http://100.64.0.1/photo.png',
+            'http://[::1]/photo.png',
+            'http://[::ffff:127.0.0.1]/photo.png',
+            'http://0.0.0.0/photo.png',
+        ):
+            with self.subTest(url=url), self.assertRaises(RemoteFileError):
+                check_public_url(url)
+
+    def test_accepts_public_addresses(self):
+        check_public_url('http://93.184.215.14/photo.png')
+        check_public_url('https://[2606:4700::1111]/photo.png')
+
+
+class PendingImageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, PROPERTY_IMAGE_MAX_BYTES=1024, PROPERTY_IMAGE_MAX_ATTEMPTS=1)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ImageServerHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f"http://127.0.0.1:{server.server_port}"
+
+        # the local server stands in for a public host; every other address is still checked
+        is_public = remote_files._is_public_address
+        patcher = mock.patch.object(
+            remote_files, '_is_public_address', side_effect=lambda address: address == '127.0.0.1' or is_public(address)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.uploader = User.objects.create(username='broker', phone='+255711000000', password='!')
+        self.property = create_property(self.uploader)
+
+    def queue(self, path):
+        return PendingPropertyImage.objects.create(property=self.property, source_url=f"{self.base_url}{path}")
+
+    def test_attaches_images_and_refuses_unsafe_responses(self):
+        photo, redirected = self.queue('/photo.png'), self.queue('/to-photo')
+        refused = [self.queue(path) for path in ('/to-metadata', '/page.html', '/huge.png', '/missing.png')]
+
+        self.assertEqual(process_pending_images(), 2)
+
+        self.assertEqual(PropertyImage.objects.filter(property=self.property).count(), 2)
+        for image in (photo, redirected):
+            image.refresh_from_db()
+            self.assertEqual(image.status, "DONE")
+        errors = {}
+        for image in refused:
+            image.refresh_from_db()
+            self.assertEqual(image.status, "FAILED")
+            errors[image.source_url.rsplit('/', 1)[-1]] = image.error
+        self.assertIn("169.254.169.254", errors['to-metadata'])
+        self.assertIn("content type text/html", errors['page.html'])
+        self.assertIn("limit is 1024", errors['huge.png'])
+        self.assertIn("404", errors['missing.png'])
+
+    def test_connects_to_the_checked_address(self):
+        # the second lookup of the host would return a private address (DNS rebinding)
+        resolve = remote_files.socket.getaddrinfo
+        answers = iter(['127.0.0.1'])
+
+        def getaddrinfo(host, port, *args, **kwargs):
+            if host == 'images.example':
+                return resolve(next(answers, '10.255.255.1'), port, *args, **kwargs)
+            return resolve(host, port, *args, **kwargs)
+
+        port = self.base_url.rsplit(':', 1)[1]
+        with mock.patch('socket.getaddrinfo', side_effect=getaddrinfo):
+            content, url = remote_files.fetch_remote_file(
+                f"http://images.example:{port}/photo.png", timeout=2, max_bytes=1024
+            )
+        self.assertEqual(content, png_bytes())
+        self.assertEqual(url, f"http://images.example:{port}/photo.png")
+        self.assertEqual(ImageServerHandler.last_host, f"images.example:{port}")
+
+    def test_claimed_images_are_skipped_until_the_claim_expires(self):
+        image = self.queue('/photo.png')
+        PendingPropertyImage.objects.filter(pk=image.pk).update(status="PROCESSING")
+
+        self.assertEqual(process_pending_images(), 0)
+        with override_settings(PROPERTY_IMAGE_CLAIM_TIMEOUT=-1):
+            self.assertEqual(process_pending_images(), 1)
+
+
+IMPORT_COLUMNS = ['name', 'type', 'category', 'address', 'price', 'total_price', 'maintenance', 'facilities',
+                  'property_costs', 'images']
+
+
+def import_file(rows, import_format):
+    """Write rows (lists in IMPORT_COLUMNS order) as a binary csv, xlsx or ndjson file."""
+    if import_format == 'csv':
+        output = io.StringIO()
+        csv.writer(output).writerows([IMPORT_COLUMNS] + rows)
+        return io.BytesIO(output.getvalue().encode())
+    if import_format == 'ndjson':
+        return io.BytesIO(''.join(json.dumps(dict(zip(IMPORT_COLUMNS, row))) + '\n' for row in rows).encode())
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    for row in [IMPORT_COLUMNS] + rows:
+        workbook.active.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def import_row(name, price='500000', images='', **overrides):
+    row = dict(zip(IMPORT_COLUMNS, [
+        name, 'House', 'Rent', 'Mikocheni', price, price, '0', 'Parking; Wifi', 'Water:10000', images,
+    ]), **overrides)
+    return [row[column] for column in IMPORT_COLUMNS]
+
+
+class PropertyImportTests(TestCase):
+    def setUp(self):
+        self.uploader = User.objects.create(username='broker', phone='+255711000000', password='!')
+
+    def test_reads_csv_xlsx_and_ndjson(self):
+        rows = [import_row('Sea View'), import_row('Hill Top', facilities='')]
+        for import_format in IMPORT_FORMATS:
+            with self.subTest(import_format=import_format):
+                read = list(read_import_rows(import_file(rows, import_format), import_format))
+                # spreadsheet rows are numbered after the header row
+                expected_rows = [1, 2] if import_format == 'ndjson' else [2, 3]
+                self.assertEqual([row_number for row_number, _ in read], expected_rows)
+                self.assertEqual(read[0][1]['name'], 'Sea View')
+                self.assertEqual(str(read[0][1]['price']), '500000')
+                self.assertEqual(read[0][1]['facilities'], 'Parking; Wifi')
+                # empty cells are left out, so the column falls back to its default
+                self.assertNotIn('facilities', read[1][1])
+                self.assertNotIn('images', read[1][1])
+
+        with self.assertRaises(ValueError):
+            list(read_import_rows(io.BytesIO(b''), 'xml'))
+
+    def test_invalid_rows_are_reported_without_aborting_the_import(self):
+        file = import_file([import_row('Sea View'), import_row('Broken', price='cheap'), import_row('Hill Top')], 'csv')
+        result = import_properties(file, 'csv', self.uploader)
+        self.assertEqual((result['total_rows'], result['created'], result['failed']), (3, 2, 1))
+        self.assertEqual(result['errors'][0]['row'], 3)
+        self.assertIn('price', result['errors'][0]['errors'])
+
+        file = io.BytesIO(b'["not", "an", "object"]\n' + import_file([import_row('Garden')], 'ndjson').read())
+        result = import_properties(file, 'ndjson', self.uploader)
+        self.assertEqual((result['created'], result['failed']), (1, 1))
+        self.assertEqual(result['errors'], [{'row': 1, 'errors': {'row': ["Invalid JSON object"]}}])
+        self.assertEqual(Property.objects.filter(uploader=self.uploader).count(), 3)
+
+    def test_reimport_updates_the_uploaders_properties_and_keeps_downloaded_images(self):
+        other = User.objects.create(username='agent', phone='+255722000000', password='!')
+        create_property(other, name='Sea View')
+        images = 'https://img.example/1.png; https://img.example/2.png'
+        rows = [import_row('Sea View', images=images), import_row('Hill Top')]
+
+        result = import_properties(import_file(rows, 'csv'), 'csv', self.uploader)
+        self.assertEqual((result['created'], result['updated']), (2, 0))
+        sea_view = Property.objects.get(uploader=self.uploader, name='Sea View')
+        PendingPropertyImage.objects.filter(source_url='https://img.example/1.png').update(status="DONE")
+
+        rows[0] = import_row('Sea View', price='750000', images=images, facilities='Pool')
+        result = import_properties(import_file(rows, 'xlsx'), 'xlsx', self.uploader)
+        self.assertEqual((result['created'], result['updated']), (0, 2))
+
+        sea_view.refresh_from_db()
+        self.assertEqual(sea_view.price, 750000)
+        self.assertEqual(Property.objects.get(uploader=other).price, 500000)
+        self.assertEqual(list(sea_view.facilities.values_list('name', flat=True)), ['Pool'])
+        self.assertEqual(sorted(
+            PendingPropertyImage.objects.filter(property=sea_view).values_list('source_url', 'status')
+        ), [('https://img.example/1.png', 'DONE'), ('https://img.example/2.png', 'PENDING')])
+
+    def test_rows_are_saved_in_chunks(self):
+        rows = [import_row(f"Plot {index}") for index in range(5)]
+        chunk_sizes = []
+        save_chunk = property_import_actions._save_chunk
+
+        def record_chunk(chunk, uploader):
+            chunk_sizes.append(len(chunk))
+            return save_chunk(chunk, uploader)
+
+        with mock.patch.object(property_import_actions, '_save_chunk', side_effect=record_chunk):
+            result = import_properties(import_file(rows, 'ndjson'), 'ndjson', self.uploader, chunk_size=2)
+        self.assertEqual(chunk_sizes, [2, 2, 1])
+        self.assertEqual(result['created'], 5)
+
+
+class HashedStorageTests(SimpleTestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = HashedFileSystemStorage(location=location)
+
+    def test_identical_uploads_get_their_own_files(self):
+        first = self.storage.save('property/images/flat.jpg', ContentFile(png_bytes()))
+        second = self.storage.save('property/images/flat.jpg', ContentFile(png_bytes()))
+
+        self.assertNotEqual(first, second)
+        self.assertRegex(first, r"^property/images/flat\.[0-9a-f]{12}\.jpg$")
+        self.assertRegex(second, rf"^property/images/flat_\w{{7}}{re.escape(first[len('property/images/flat'):])}$")
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(second))
+
+    def test_long_names_are_shortened_ahead_of_the_hash(self):
+        name = self.storage.save(f"ads/{'a' * 80}.png", ContentFile(png_bytes()), max_length=60)
+        again = self.storage.save(f"ads/{'a' * 80}.png", ContentFile(png_bytes()), max_length=60)
+
+        for saved in (name, again):
+            self.assertLessEqual(len(saved), 60)
+            self.assertRegex(saved, r"^ads/a+(_\w{7})?\.[0-9a-f]{12}\.png$")
+        self.assertNotEqual(name, again)
+
+
+class ServeMediaTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        media_settings = override_settings(
+            MEDIA_ROOT=self.root, MEDIA_SERVE_MODE='django', MEDIA_CACHE_MAX_AGE=600,
+            MEDIA_IMAGE_VARIANTS={'thumb': 2},
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.storage = HashedFileSystemStorage(location=self.root)
+        self.data = bytes(range(100))
+        self.name = self.storage.save('docs/plan.bin', ContentFile(self.data))
+        image = io.BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(image, format='PNG')
+        self.image = self.storage.save('property/images/flat.png', ContentFile(image.getvalue()))
+
+    def serve(self, path, **headers):
+        return serve_media(RequestFactory().get(f"/media/{path}", headers=headers), path)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file_is_served_immutable(self):
+        response = self.serve(self.name)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], f'"{self.name.split(".")[1]}"')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_ranges(self):
+        response = self.serve(self.name, Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.data[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.serve(self.name, Range='bytes=90-')
+        self.assertEqual((response.status_code, self.body(response)), (206, self.data[90:]))
+
+        response = self.serve(self.name, Range='bytes=95-500')
+        self.assertEqual(response['Content-Range'], 'bytes 95-99/100')
+
+    def test_suffix_ranges(self):
+        response = self.serve(self.name, Range='bytes=-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.data[-5:])
+        self.assertEqual(response['Content-Range'], 'bytes 95-99/100')
+
+        response = self.serve(self.name, Range='bytes=-500')
+        self.assertEqual((response.status_code, self.body(response)), (206, self.data))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=100-', 'bytes=50-40', 'bytes=-0'):
+            with self.subTest(header):
+                response = self.serve(self.name, Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_malformed_and_multiple_ranges_send_the_whole_file(self):
+        for header in ('bytes=0-1,5-6', 'items=0-5', 'bytes=-'):
+            with self.subTest(header):
+                response = self.serve(self.name, Range=header)
+                self.assertEqual((response.status_code, self.body(response)), (200, self.data))
+
+    def test_if_range(self):
+        etag = self.serve(self.name)['ETag']
+        last_modified = self.serve(self.name)['Last-Modified']
+
+        for validator in (etag, last_modified):
+            with self.subTest(validator):
+                response = self.serve(self.name, Range='bytes=0-9', **{'If-Range': validator})
+                self.assertEqual((response.status_code, self.body(response)), (206, self.data[:10]))
+
+        response = self.serve(self.name, Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual((response.status_code, self.body(response)), (200, self.data))
+
+    def test_not_modified(self):
+        first = self.serve(self.name)
+
+        response = self.serve(self.name, **{'If-None-Match': f'"other", {first["ETag"]}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response['Cache-Control'], first['Cache-Control'])
+
+        response = self.serve(self.name, **{'If-Modified-Since': first['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+        # If-None-Match takes precedence over If-Modified-Since
+        response = self.serve(self.name, **{'If-None-Match': '"other"', 'If-Modified-Since': first['Last-Modified']})
+        self.assertEqual(response.status_code, 200)
+        response = self.serve(self.name, **{'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unhashed_files_get_a_short_max_age(self):
+        with open(f"{self.root}/legacy.bin", 'wb') as legacy:
+            legacy.write(self.data)
+
+        response = self.serve('legacy.bin')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+        self.assertEqual(self.serve('legacy.bin', **{'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_variants_are_resized_and_revalidated(self):
+        response = serve_media(RequestFactory().get(f"/media/{self.image}", {'variant': 'thumb'}), self.image)
+
+        self.assertEqual(response.status_code, 200)
+        with Image.open(io.BytesIO(self.body(response))) as variant:
+            self.assertEqual(variant.size, (2, 2))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+        self.assertEqual(response['ETag'], f'"{self.image.split(".")[1]}-thumb-2"')
+
+        with override_settings(MEDIA_IMAGE_VARIANTS={'thumb': 4}):
+            response = serve_media(RequestFactory().get(f"/media/{self.image}", {'variant': 'thumb'}), self.image)
+            with Image.open(io.BytesIO(self.body(response))) as variant:
+                self.assertEqual(variant.size, (4, 4))
+            self.assertEqual(response['ETag'], f'"{self.image.split(".")[1]}-thumb-4"')
+
+        with self.assertRaises(Http404):
+            serve_media(RequestFactory().get(f"/media/{self.image}", {'variant': 'huge'}), self.image)
+
+    def test_missing_files_traversal_and_variants_are_not_found(self):
+        self.serve(self.image)
+        serve_media(RequestFactory().get(f"/media/{self.image}", {'variant': 'thumb'}), self.image)
+
+        for path in ('docs/missing.bin', '../etc/passwd', 'docs/../../etc/passwd', '/etc/passwd', 'docs',
+                     f"variants/thumb-2/{self.image}"):
+            with self.subTest(path), self.assertRaises(Http404):
+                self.serve(path)
+
+    def test_head_sends_no_body(self):
+        response = serve_media(RequestFactory().head(f"/media/{self.name}"), self.name)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), b'')
+
+    def test_web_server_modes_only_send_headers(self):
+        with override_settings(MEDIA_SERVE_MODE='x-accel', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response = self.serve(self.name, Range='bytes=0-9')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Accel-Redirect'], f"/protected-media/{self.name}")
+            self.assertEqual(response.content, b'')
+            self.assertIn('ETag', response)
+
+            response = serve_media(RequestFactory().get(f"/media/{self.image}", {'variant': 'thumb'}), self.image)
+            self.assertEqual(response['X-Accel-Redirect'], f"/protected-media/variants/thumb-2/{self.image}")
+
+        with override_settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.serve(self.name)
+            self.assertEqual(response['X-Sendfile'], f"{self.root}/{self.name}")
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertEqual(self.serve(self.name, **{'If-None-Match': response['ETag']}).status_code, 304)
+
+
+def leave_feedback(property_obj, count):
+    return [
+        PropertyFeedBack.objects.create(
+            property=property_obj, owner_id=property_obj.uploader_id, message=f"Hello {index}"
+        )
+        for index in range(count)
+    ]
+
+
+class FeedbackCounterTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', phone='+255711000001', password='!')
+        self.first, self.second = create_property(self.owner), create_property(self.owner, name="Hill Top")
+
+    def counters(self, property_obj):
+        property_obj.refresh_from_db()
+        return property_obj.feedback_count, property_obj.unread_feedback_count
+
+    def test_mark_read_lowers_unread_counters_once(self):
+        feedback = leave_feedback(self.first, 3)
+        leave_feedback(self.second, 2)
+        self.assertEqual(self.counters(self.first), (3, 3))
+
+        self.assertEqual(mark_feedback_read(self.owner, [feedback[0].uuid]), 1)
+        self.assertEqual(mark_feedback_read(self.owner, [feedback[0].uuid]), 0)
+        self.assertEqual(self.counters(self.first), (3, 2))
+
+        self.assertEqual(mark_feedback_read(self.owner), 4)
+        self.assertEqual(mark_feedback_read(self.owner), 0)
+        self.assertEqual((self.counters(self.first), self.counters(self.second)), ((3, 0), (2, 0)))
+
+    def test_backfill_recounts_from_the_feedback_rows(self):
+        leave_feedback(self.first, 2)
+        PropertyFeedBack.objects.update(owner=None)
+        first = PropertyFeedBack.objects.order_by('id').first()
+        PropertyFeedBack.objects.filter(pk=first.pk).update(is_read=True)
+        Property.objects.update(feedback_count=0, unread_feedback_count=0)
+
+        backfill_feedback_counters()
+
+        self.assertEqual(self.counters(self.first), (2, 1))
+        self.assertFalse(PropertyFeedBack.objects.exclude(owner=self.owner).exists())
+
+
+class ConcurrentMarkReadTests(TransactionTestCase):
+    def test_concurrent_calls_lower_the_counter_once(self):
+        owner = User.objects.create(username='owner', phone='+255711000001', password='!')
+        property_obj = create_property(owner)
+        leave_feedback(property_obj, 5)
+        start = threading.Barrier(2)
+        results = []
+
+        def mark_read():
+            try:
+                start.wait()
+                results.append(mark_feedback_read(owner))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=mark_read) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [0, 5])
+        property_obj.refresh_from_db()
+        self.assertEqual((property_obj.feedback_count, property_obj.unread_feedback_count), (5, 0))
+
+
+class PropertyRenderingTests(TestCase):
+    def test_orjson_renders_the_feed_like_drf(self):
+        uploader = User.objects.create(username='broker', phone='+255711000000', password='!', first_name='Asha')
+        for index in range(3):
+            property_obj = create_property(
+                uploader, name=f"Flat {index}", latitude='-6.7712345', description="Café ✓"
+            )
+            FacilityProperty.objects.create(property=property_obj, name="Parking")
+            PropertyCost.objects.create(property=property_obj, name="Water", amount='10000.50')
+            PropertyImage.objects.create(property=property_obj, image=f"property/images/flat-{index}.jpg")
+        request = RequestFactory().get('/api/v1/property/')
+        data = PropertySerializer(get_property_to_display(None), many=True, context={'request': request}).data
+
+        rendered = ORJSONRenderer().render(data)
+
+        self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(json.loads(rendered)[0]['total_cost'], 510000.5)
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class PropertyResponseCacheTests(TransactionTestCase):
+    # committed saves, so the cache version is bumped by the on_commit hook as in production
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tenant', phone='+255711000002', password='!')
+        self.property = create_property(User.objects.create(username='owner', phone='+255711000003', password='!'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/homes/property/{self.property.uuid}"
+
+    def get_name(self):
+        return json.loads(self.client.get(self.url).content)['data']['name']
+
+    @override_settings(PROPERTY_RESPONSE_CACHE_TIMEOUT=300)
+    def test_cached_detail_is_served_without_queries_until_the_property_changes(self):
+        self.assertEqual(self.get_name(), "Sea View")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_name(), "Sea View")
+        self.assertEqual(len(queries), 0)
+
+        self.property.name = "Ocean View"
+        self.property.save()
+        self.assertEqual(self.get_name(), "Ocean View")
+
+    @override_settings(PROPERTY_RESPONSE_CACHE_TIMEOUT=0)
+    def test_nothing_is_cached_without_a_timeout(self):
+        self.assertEqual(self.get_name(), "Sea View")
+        Property.objects.filter(pk=self.property.pk).update(name="Ocean View")
+        self.assertEqual(self.get_name(), "Ocean View")
+
+
+def decompress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'br':
+        return brotli.decompress(data)
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps([{'name': "Sea View", 'address': "Mikocheni"}] * 100).encode()
+
+    def process(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation_follows_quality_then_server_preference(self):
+        for header, expected in (
+            ('gzip, br', 'br'),
+            ('gzip;q=1.0, br;q=0.5', 'gzip'),
+            ('GZIP;Q=0.8, deflate', 'gzip'),
+            ('*', 'zstd'),
+            ('br;q=0, *;q=0.1', 'zstd'),
+            ('zstd;q=0.5, br;q=0.5, gzip;q=0.4', 'zstd'),
+            ('gzip;q=0', None),
+            ('identity', None),
+            ('', None),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(negotiate_encoding(header), expected)
+        self.assertEqual(negotiate_encoding('*', ('gzip',)), 'gzip')
+
+    def test_responses_below_the_minimum_size_are_left_alone(self):
+        response = self.process(HttpResponse(self.body[:512], content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+        with override_settings(COMPRESSION_MIN_SIZE=256):
+            response = self.process(HttpResponse(self.body[:512], content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body[:512])
+
+    def test_encoded_partial_and_binary_responses_are_skipped(self):
+        encoded = HttpResponse(gzip.compress(self.body), content_type='application/json')
+        encoded['Content-Encoding'] = 'gzip'
+        partial = HttpResponse(self.body, status=206, content_type='application/json')
+        binary = HttpResponse(self.body, content_type='image/png')
+        for response in (encoded, partial, binary):
+            with self.subTest(response=response):
+                content = response.content
+                response = self.process(response, 'br')
+                self.assertEqual(response.content, content)
+                self.assertNotEqual(response.get('Content-Encoding'), 'br')
+
+    def test_vary_and_weak_etag(self):
+        response = HttpResponse(self.body, content_type='application/json', headers={'ETag': '"v1"'})
+        response = self.process(response, 'br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+        # the representation varies even when this client gets it uncompressed
+        response = HttpResponse(self.body, content_type='application/json', headers={'ETag': '"v1"'})
+        response = self.process(response, 'identity')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_responses_decompress_to_the_original(self):
+        chunks = [f"{index},Sea View,Mikocheni\n" for index in range(500)]
+        original = ''.join(chunks).encode()
+
+        async def achunks():
+            for chunk in chunks:
+                yield chunk
+
+        async def aread(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        for encoding in ENCODINGS:
+            with self.subTest(encoding=encoding):
+                response = self.process(StreamingHttpResponse(iter(chunks), content_type='text/csv'), encoding)
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertFalse(response.has_header('Content-Length'))
+                self.assertEqual(decompress(b''.join(response.streaming_content), encoding), original)
+
+                response = self.process(StreamingHttpResponse(achunks(), content_type='text/csv'), encoding)
+                self.assertTrue(response.is_async)
+                self.assertEqual(decompress(async_to_sync(aread)(response), encoding), original)
+
+        # a declared length below the minimum is sent as is
+        response = StreamingHttpResponse(iter([b'small']), content_type='text/csv', headers={'Content-Length': '5'})
+        self.assertFalse(self.process(response).has_header('Content-Encoding'))
+
+
+def list_uploaders(request):
+    """The N+1 the SQL profiler looks for: one uploader query per property."""
+    return HttpResponse(', '.join(item.uploader.username for item in Property.objects.order_by('id')))
+
+
+@override_settings(SQL_PROFILER_TOKEN='profile-token', SQL_PROFILER_SAMPLE_RATE=0.0, SQL_PROFILER_DUPLICATE_THRESHOLD=5)
+class SQLProfilerTests(TestCase):
+    def setUp(self):
+        query_stats.reset()
+        self.addCleanup(query_stats.reset)
+        self.factory = RequestFactory()
+
+    def serve(self, view, **headers):
+        request = self.factory.get('/homes/uploaders', headers=headers)
+        return contextvars.copy_context().run(SQLProfilerMiddleware(view), request)
+
+    def create_properties(self, count):
+        offset = User.objects.count()
+        for index in range(offset, offset + count):
+            uploader = User.objects.create(username=f"owner{index}", phone=f"+2557120000{index:02d}", password='!')
+            create_property(uploader)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT *  FROM \"t1\"\n WHERE id = 42 AND name = 'O''Brien' AND price > 1.5"),
+            'SELECT * FROM "t1" WHERE id = ? AND name = ? AND price > ?',
+        )
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)'), 'SELECT * FROM "t" WHERE "id" IN (...)'
+        )
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "t" WHERE "id" IN (%s)'),
+            normalize_sql('SELECT * FROM "t" WHERE "id" IN (7, 8)'),
+        )
+        self.assertEqual(
+            normalize_sql('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (?, ?), ...',
+        )
+        self.assertEqual(
+            fingerprint(normalize_sql('INSERT INTO "t" ("a") VALUES (%s), (%s)')),
+            fingerprint(normalize_sql('INSERT INTO "t" ("a") VALUES (1), (2), (3)')),
+        )
+
+    def test_n_plus_one_is_reported_from_the_duplicate_threshold(self):
+        self.create_properties(4)
+        response = self.serve(list_uploaders, **{PROFILE_HEADER: 'profile-token'})
+        self.assertEqual(response['X-SQL-Profile'].split('; ')[::2], ['queries=5', 'duplicates=0'])
+
+        self.create_properties(5)
+        response = self.serve(list_uploaders, **{PROFILE_HEADER: 'profile-token'})
+        self.assertEqual(response['X-SQL-Profile'].split('; ')[::2], ['queries=10', 'duplicates=1'])
+
+        slowest_first = query_stats.snapshot()['slow_requests']
+        duplicate, = [request['duplicates'] for request in slowest_first if request['queries'] == 10][0]
+        self.assertEqual(duplicate['count'], 9)
+        self.assertTrue(duplicate['callers'][0].startswith('homes/tests.py:'))
+        self.assertTrue(duplicate['callers'][0].endswith(' in <genexpr>'))
+
+    def test_only_the_configured_token_turns_profiling_on(self):
+        self.create_properties(1)
+        for headers in ({}, {PROFILE_HEADER: 'wrong-token'}, {PROFILE_HEADER: ''}):
+            with self.subTest(headers=headers):
+                self.assertFalse(self.serve(list_uploaders, **headers).has_header('X-SQL-Profile'))
+        with override_settings(SQL_PROFILER_TOKEN=''):
+            self.assertFalse(self.serve(list_uploaders, **{PROFILE_HEADER: ''}).has_header('X-SQL-Profile'))
+        self.assertEqual(query_stats.snapshot()['profiled_requests'], 0)
+
+        self.assertTrue(self.serve(list_uploaders, **{PROFILE_HEADER: 'profile-token'}).has_header('X-SQL-Profile'))
+        # sampled requests are recorded without telling the client
+        with override_settings(SQL_PROFILER_SAMPLE_RATE=1.0):
+            self.assertFalse(self.serve(list_uploaders).has_header('X-SQL-Profile'))
+        self.assertEqual(query_stats.snapshot()['profiled_requests'], 2)
+
+    def test_stats_store_keeps_the_costliest_fingerprints_and_slowest_requests(self):
+        store = QueryStatsStore(max_fingerprints=2, max_requests=2)
+
+        def record(duration_ms, *groups):
+            summary = {'view': 'homes.views.PropertyView', 'duration_ms': duration_ms}
+            store.record(summary, [
+                {'fingerprint': key, 'sql': f"SELECT {key}", 'count': 1, 'time_ms': time_ms} for key, time_ms in groups
+            ])
+
+        record(10, ('a', 5.0), ('b', 1.0))
+        record(30, ('c', 3.0))
+        record(20, ('a', 1.0))
+        record(5, ('d', 0.5))
+
+        snapshot = store.snapshot()
+        self.assertEqual(snapshot['profiled_requests'], 4)
+        # a new fingerprint always gets in and pushes out the one with the least total time: b for c, then c for d
+        self.assertEqual(
+            [(item['fingerprint'], item['time_ms']) for item in snapshot['fingerprints']], [('a', 6.0), ('d', 0.5)]
+        )
+        self.assertEqual([request['duration_ms'] for request in snapshot['slow_requests']], [30, 20])
+
+    def test_profile_endpoint_is_admin_only(self):
+        self.create_properties(1)
+        self.serve(list_uploaders, **{PROFILE_HEADER: 'profile-token'})
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='tenant', phone='+255713000000', password='!'))
+        self.assertEqual(client.get('/monitoring/sql-profile').status_code, 403)
+        self.assertEqual(client.delete('/monitoring/sql-profile').status_code, 403)
+
+        client.force_authenticate(User.objects.create_superuser(username='admin', phone='+255713000001', password='x'))
+        body = client.get('/monitoring/sql-profile', {'limit': 1}).json()
+        self.assertEqual(body['data']['profiled_requests'], 1)
+        self.assertEqual(len(body['data']['fingerprints']), 1)
+        self.assertEqual(body['data']['slow_requests'][0]['queries'], 2)
+        self.assertEqual(client.get('/monitoring/sql-profile', {'limit': 'all'}).status_code, 400)
+
+        self.assertEqual(client.delete('/monitoring/sql-profile').status_code, 200)
+        self.assertEqual(query_stats.snapshot()['profiled_requests'], 0)
+
+
+def read_properties(request):
+    """A feed read (scoped) and an inbox style read (unscoped)."""
+    return HttpResponse(f"{get_property_to_display(None).count()} {Property.objects.using(get_read_db()).count()}")
+
+
+def rename_and_read_properties(request):
+    Property.objects.update(name="Renamed")
+    return read_properties(request)
+
+
+@skipUnless('replica' in settings.DATABASES, "needs a second database alias, e.g. DB_LOCAL_REPLICA=True")
+# the local memory cache stands in for the shared one
+@override_settings(DATABASE_REPLICAS=['replica'], CACHE_URL='redis://cache.test:6379/0')
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        create_property(User.objects.create(username='owner', phone='+255711000004', password='!'))
+        # forget the mark left by saving the property
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def serve(self, view, cookies=None):
+        """Serve a request in a fresh context, as a worker would; return (response, (primary, replica) queries)."""
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaStickinessMiddleware(view)
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = contextvars.copy_context().run(middleware, request)
+        return response, (len(primary), len(replica))
+
+    def test_reads_go_to_the_replica(self):
+        response, queries = self.serve(read_properties)
+        self.assertEqual(response.content, b"1 1")
+        self.assertEqual(queries, (0, 2))
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        with transaction.atomic():
+            self.assertEqual(get_read_db(), 'default')
+
+    def test_a_client_that_wrote_reads_from_the_primary(self):
+        response, queries = self.serve(rename_and_read_properties)
+        self.assertEqual(queries, (3, 0))
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        self.assertEqual(self.serve(read_properties, cookies={PRIMARY_PIN_COOKIE: '1'})[1], (2, 0))
+        self.assertEqual(self.serve(read_properties)[1], (0, 2))
+
+    def test_a_written_scope_is_read_from_the_primary_by_every_client(self):
+        mark_written(PROPERTY_READ_SCOPE)
+        self.assertEqual(self.serve(read_properties)[1], (1, 1))
+
+        cache.clear()
+        self.assertEqual(self.serve(read_properties)[1], (0, 2))
+
+    @override_settings(CACHE_URL='')
+    def test_scoped_reads_stay_on_the_primary_without_a_shared_cache(self):
+        mark_written(PROPERTY_READ_SCOPE)
+        self.assertIsNone(cache.get(f"db-written:{PROPERTY_READ_SCOPE}"))
+        self.assertEqual(self.serve(read_properties)[1], (1, 1))
+
+
+MEDIA_BUCKET = 'mhp-media-test'
+S3_STORAGES = {
+    **settings.STORAGES,
+    'default': {
+        'BACKEND': 'utils.storage.HashedS3Storage',
+        'OPTIONS': {
+            'bucket_name': MEDIA_BUCKET, 'region_name': 'us-east-1', 'access_key': 'test', 'secret_key': 'test',
+            'querystring_auth': False,
+        },
+    },
+}
+
+
+@mock_aws
+@override_settings(
+    STORAGES=S3_STORAGES, MEDIA_MULTIPART_THRESHOLD=1024 * 1024, MEDIA_MULTIPART_PART_SIZE=5 * 1024 * 1024,
+)
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        default_storage.connection.meta.client.create_bucket(Bucket=MEDIA_BUCKET)
+        self.s3 = default_storage.connection.meta.client
+        self.owner = User.objects.create(username='broker', phone='+255711000005', password='!')
+        self.property = create_property(self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def start(self, size, content_type='image/png', kind='property_image'):
+        response = self.client.post('/uploads', {'kind': kind, 'content_type': content_type, 'size': size})
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)['data']
+
+    def test_presigned_post_upload_is_claimed_as_a_property_image(self):
+        content = png_bytes()
+        upload = self.start(len(content))
+        self.assertEqual(upload['method'], 'POST')
+        self.assertTrue(upload['key'].startswith(f"property/images/u{self.owner.pk}/"))
+
+        sent = requests.post(upload['url'], data=upload['fields'], files={'file': ('photo.png', content)})
+        self.assertLess(sent.status_code, 300)
+        create_property_images(self.property, [{'key': upload['key']}])
+
+        image = PropertyImage.objects.get(property=self.property)
+        self.assertEqual(image.image.name, upload['key'])
+        self.assertEqual(self.s3.get_object(Bucket=MEDIA_BUCKET, Key=upload['key'])['Body'].read(), content)
+
+    def test_multipart_upload_is_completed_and_claimed(self):
+        content = b'\x89PNG' + b'0' * (6 * 1024 * 1024)
+        upload = self.start(len(content))
+        self.assertEqual((upload['method'], len(upload['parts'])), ('MULTIPART', 2))
+
+        parts = []
+        for part in upload['parts']:
+            offset = (part['part_number'] - 1) * upload['part_size']
+            sent = requests.put(part['url'], data=content[offset:offset + upload['part_size']])
+            parts.append({'part_number': part['part_number'], 'etag': sent.headers['ETag']})
+        response = self.client.post(
+            '/uploads/complete', {'key': upload['key'], 'upload_id': upload['upload_id'], 'parts': parts},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(claim_upload(self.owner, upload['key'], 'property_image'), upload['key'])
+        self.assertEqual(self.s3.head_object(Bucket=MEDIA_BUCKET, Key=upload['key'])['ContentLength'], len(content))
+
+    def test_foreign_missing_and_unacceptable_uploads_are_not_claimed(self):
+        other = User.objects.create(username='other', phone='+255711000006', password='!')
+        upload = self.start(3)
+        self.s3.put_object(Bucket=MEDIA_BUCKET, Key=upload['key'], Body=b'abc', ContentType='image/png')
+        self.assertIsNone(claim_upload(other, upload['key'], 'property_image'))
+        self.assertIsNone(claim_upload(self.owner, f"property/images/u{self.owner.pk}/missing.png", 'property_image'))
+
+        self.s3.put_object(Bucket=MEDIA_BUCKET, Key=upload['key'], Body=b'<html>', ContentType='text/html')
+        self.assertIsNone(claim_upload(self.owner, upload['key'], 'property_image'))
+        self.assertEqual(self.s3.list_objects_v2(Bucket=MEDIA_BUCKET)['KeyCount'], 0)
+
+        response = self.client.post('/uploads', {'kind': 'profile', 'content_type': 'image/png', 'size': 3})
+        self.assertEqual(response.status_code, 400)
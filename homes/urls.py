@@ -1,7 +1,8 @@
 from django.urls import path
 
 from homes.views import PropertyAPIView, PropertyDetailAPIView, PropertyOwnerAPIView, PropertyFeedbackAPIView, \
-    PropertyOwnerFeedbackAPIView, PropertyUpdateAPIView
+    PropertyOwnerFeedbackAPIView, PropertyUpdateAPIView, PropertyExportAPIView, PropertyImportAPIView, \
+    PropertyOwnerFeedbackReadAPIView
 
 urlpatterns = [
     path('properties/', PropertyAPIView.as_view(), name='properties'),
@@ -10,4 +11,8 @@ urlpatterns = [
     path('uploader-properties/', PropertyOwnerAPIView.as_view(), name='property_detail'),
     path('property-feedbacks/', PropertyFeedbackAPIView.as_view(), name='property_feedbacks'),
     path('property-owner-feedbacks/', PropertyOwnerFeedbackAPIView.as_view(), name='property_owner_feedbacks'),
+    path('property-owner-feedbacks/read', PropertyOwnerFeedbackReadAPIView.as_view(),
+         name='property_owner_feedbacks_read'),
+    path('export/properties', PropertyExportAPIView.as_view(), name='export_properties'),
+    path('import/properties', PropertyImportAPIView.as_view(), name='import_properties'),
 ]
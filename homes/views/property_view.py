@@ -1,14 +1,27 @@
 import json
 
-from drf_spectacular.utils import extend_schema
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 from rest_framework import status, permissions
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 
-from homes.models import Property, Facility, PropertyFeedBack
-from homes.selectors import get_property_detail, get_property_by_uploader, get_property_to_display
+from homes.actions.property_feedback_actions import mark_feedback_read
+from homes.actions.property_import_actions import import_properties, guess_import_format, IMPORT_FORMATS
+from homes.exports import property_export
+from homes.models import Property, Facility
+from homes.selectors import get_property_detail, get_property_by_uploader, get_property_to_display, \
+    get_owner_feedback, get_property_feedback, get_owner_unread_feedback_count, property_detail_cache_key, \
+    property_feed_cache_key
 from homes.serializers import PropertySerializer, FacilitySerializer, PropertyFeedBackSerializer
+from utils.compression import get_precompressed_response
+from utils.db_router import get_read_db
+from utils.export_utils import ExportAPIView
 from utils.logger import AppLogger
-from utils.response_utils import create_response
+from utils.pagination import paginate_queryset
+from utils.response_utils import create_response, render_response
 
 logger = AppLogger(__name__)
 
@@ -23,7 +36,7 @@ class FacilityAPIView(APIView):
         description='Return List of all Facility',
     )
     def get(self, request):
-        facilities = Facility.objects.all()
+        facilities = Facility.objects.using(get_read_db()).all()
         serializer = FacilitySerializer(facilities, many=True)
         return create_response("success", status.HTTP_200_OK, total_item=len(serializer.data), data=serializer.data)
 
@@ -39,12 +52,20 @@ class PropertyAPIView(APIView):
     )
     def get(self, request, *args):
         logger.info(f"Received GET request on PropertyAPIView by user {request.user}")
-        properties = get_property_to_display(request.user)
-        total_item = properties.count()
-        serializer = PropertySerializer(properties, many=True, context={'request': request})
 
-        logger.info(f"Returning {total_item} properties")
-        return create_response("success", status.HTTP_200_OK, total_item=total_item, data=serializer.data)
+        def render_feed():
+            properties = get_property_to_display(request.user)
+            total_item = properties.count()
+            serializer = PropertySerializer(properties, many=True, context={'request': request})
+            logger.info(f"Returning {total_item} properties")
+            return render_response("success", status.HTTP_200_OK, total_item=total_item, data=serializer.data)
+
+        return get_precompressed_response(
+            request,
+            property_feed_cache_key(request.user.id, request.get_host()),
+            render_feed,
+            timeout=getattr(settings, 'PROPERTY_RESPONSE_CACHE_TIMEOUT', 300),
+        )
 
     # @payment_required(['broker', 'property owner', 'customer'])
     @extend_schema(
@@ -88,10 +109,18 @@ class PropertyDetailAPIView(APIView):
     )
     def get(self, request, uuid, *args):
         logger.info(f"Received GET request for property with ID {uuid}")
+
+        def render_property():
+            serializer = PropertySerializer(get_property_detail(uuid), context={'request': request})
+            return render_response("success", status.HTTP_200_OK, data=serializer.data)
+
         try:
-            get_property = get_property_detail(uuid)
-            serializer = PropertySerializer(get_property, context={'request': request})
-            return create_response("success", status.HTTP_200_OK, data=serializer.data)
+            return get_precompressed_response(
+                request,
+                property_detail_cache_key(uuid, request.get_host()),
+                render_property,
+                timeout=getattr(settings, 'PROPERTY_RESPONSE_CACHE_TIMEOUT', 300),
+            )
         except Property.DoesNotExist:
             msg = f"Property with ID {uuid} not found"
             logger.error(msg)
@@ -132,7 +161,7 @@ class PropertyUpdateAPIView(APIView):
         logger.info(f"Received PUT request by {request.user} for Property {uuid}")
 
         try:
-            property_obj = get_property_detail(uuid)
+            property_obj = get_property_detail(uuid, using=DEFAULT_DB_ALIAS)
             if not property_obj:
                 msg = f"Property with ID {uuid} not found"
                 logger.error(msg)
@@ -176,9 +205,16 @@ class PropertyFeedbackAPIView(APIView):
     def get(self, request, *args):
         logger.info(f"Received GET request on PropertyFeedbackAPIView by user {request.user}")
         property_uuid = request.query_params.get('property')
-        get_feedback = PropertyFeedBack.objects.filter(property__uuid=property_uuid)
-        serializers = PropertyFeedBackSerializer(get_feedback, many=True, context={'request': request})
-        return create_response("success", status.HTTP_200_OK, data=serializers.data, total_item=get_feedback.count())
+        try:
+            property_obj = Property.objects.using(get_read_db()).only('id', 'feedback_count').get(uuid=property_uuid)
+        except (Property.DoesNotExist, ValidationError):
+            return create_response("Property with given ID not found", status.HTTP_404_NOT_FOUND)
+
+        feedback, extra = paginate_queryset(get_property_feedback(property_obj.id), request, view=self)
+        serializers = PropertyFeedBackSerializer(feedback, many=True, context={'request': request})
+        return create_response(
+            "success", status.HTTP_200_OK, data=serializers.data, total_item=property_obj.feedback_count, extra=extra
+        )
 
     @extend_schema(
         responses={200: PropertyFeedBackSerializer(many=True)},
@@ -212,13 +248,82 @@ class PropertyOwnerFeedbackAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
+        parameters=[
+            OpenApiParameter('unread', bool, description="Only unread feedback"),
+            OpenApiParameter('cursor', str, description="Cursor of the page to return"),
+            OpenApiParameter('page_size', int, description="Feedback per page (max 100)"),
+        ],
         responses={200: PropertyFeedBackSerializer(many=True)},
         tags=["Property feedback"],
         summary="List Property owner Feedback",
-        description="Returns all Property owner Feedbacks."
+        description="Cursor paginated inbox of the feedback on all properties of the authenticated owner."
     )
     def get(self, request, *args):
-        logger.info(f"Received GET request on PropertyFeedbackAPIView by user {request.user}")
-        get_feedbacks = PropertyFeedBack.objects.filter(property__uploader=request.user)
-        serializers = PropertyFeedBackSerializer(get_feedbacks, many=True, context={'request': request})
-        return create_response("success", status.HTTP_200_OK, data=serializers.data, total_item=get_feedbacks.count())
+        logger.info(f"Received GET request on PropertyOwnerFeedbackAPIView by user {request.user}")
+        unread_only = request.query_params.get('unread', '').lower() in ('1', 'true')
+        feedback, extra = paginate_queryset(get_owner_feedback(request.user, unread_only), request, view=self)
+        extra['unread_total'] = get_owner_unread_feedback_count(request.user)
+        serializers = PropertyFeedBackSerializer(feedback, many=True, context={'request': request})
+        return create_response("success", status.HTTP_200_OK, data=serializers.data, total_item=len(feedback), extra=extra)
+
+
+class PropertyOwnerFeedbackReadAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        request={'application/json': {'type': 'object', 'properties': {
+            'feedback': {'type': 'array', 'items': {'type': 'string', 'format': 'uuid'}},
+        }}},
+        responses={200: {"msg": "Feedback marked as read"}},
+        tags=["Property feedback"],
+        summary="Mark Property owner Feedback as read",
+        description="Marks the given feedback uuids, or all unread feedback when none are given, as read."
+    )
+    def post(self, request, *args):
+        feedback_uuids = request.data.get('feedback')
+        if feedback_uuids is not None and not isinstance(feedback_uuids, list):
+            return create_response("feedback must be a list of uuids", status.HTTP_400_BAD_REQUEST)
+        try:
+            updated = mark_feedback_read(request.user, feedback_uuids)
+        except ValidationError:
+            return create_response("feedback must be a list of uuids", status.HTTP_400_BAD_REQUEST)
+        return create_response("Feedback marked as read", status.HTTP_200_OK, total_item=updated)
+
+
+@extend_schema_view(get=extend_schema(
+    tags=["properties"],
+    summary="Export properties",
+    description="Streams all properties as csv, ndjson or xlsx. Admin only.",
+))
+class PropertyExportAPIView(ExportAPIView):
+    dataset = property_export
+
+
+class PropertyImportAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    @extend_schema(
+        request={'multipart/form-data': {'type': 'object', 'properties': {'file': {'type': 'string', 'format': 'binary'}}}},
+        parameters=[
+            OpenApiParameter('file_format', str, enum=IMPORT_FORMATS, description="Defaults to the file extension"),
+        ],
+        responses={200: {"msg": "Import finished"}, 400: "Missing file or unknown format"},
+        tags=["properties"],
+        summary="Bulk import properties",
+        description="Upsert the properties of a csv, xlsx or ndjson file for the authenticated uploader. "
+                    "Invalid rows are reported per row and skipped, images are downloaded in the background.",
+    )
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return create_response("Missing file", status.HTTP_400_BAD_REQUEST)
+
+        import_format = request.query_params.get('file_format') or guess_import_format(upload.name)
+        if import_format not in IMPORT_FORMATS:
+            msg = f"Unknown import format: {import_format}, expected one of {', '.join(IMPORT_FORMATS)}"
+            return create_response(msg, status.HTTP_400_BAD_REQUEST)
+
+        result = import_properties(upload, import_format, request.user)
+        return create_response("Import finished", status.HTTP_200_OK, total_item=result['total_rows'], data=result)
+
@@ -3,6 +3,13 @@ ASGI config for mhp project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run it with gunicorn managing uvicorn workers, e.g.:
+
+    gunicorn mhp.asgi:application -k uvicorn_worker.UvicornWorker -w 4
+
+Views that wait on Selcom or NextSMS are async there, so a slow gateway no
+longer holds a worker; the other views run in Django's sync thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
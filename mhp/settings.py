@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -56,9 +56,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.metrics.MetricsMiddleware',
+    'utils.tracing.TracingMiddleware',
+    'utils.sql_profiler.SQLProfilerMiddleware',
+    'utils.compression.CompressionMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'utils.db_router.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -98,20 +103,47 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'mhp.wsgi.application'
+ASGI_APPLICATION = 'mhp.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Read-only selectors read from DATABASE_REPLICAS through utils.db_router.get_read_db();
+# writes, migrations and requests that wrote recently stay on the primary.
+DATABASE_ROUTERS = ['utils.db_router.PrimaryReplicaRouter']
+
 if config('DEFAULT_DB', cast=bool):
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # take the write lock at BEGIN so concurrent transactions queue instead of failing with
+            # "database is locked"; SQLite ignores select_for_update()
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+            # a file rather than shared-cache memory, so tests that use several threads can wait on locks
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
+    # local two-database setup: a second connection to the same file stands in for a replica
+    if config('DB_LOCAL_REPLICA', default=False, cast=bool):
+        DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
 else:
     pass
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASE_OPTIONS = {
+        'options': f"-c search_path={config('SCHEMA')}",
+    }
+    if DB_POOL:
+        # in-process psycopg 3 pool per worker; connections are checked before being handed out
+        from psycopg_pool import ConnectionPool
+
+        DATABASE_OPTIONS['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+            'check': ConnectionPool.check_connection,
+        }
     DATABASES = {
         'default': {
             'ENGINE': config('DB_ENGINE'),
@@ -120,12 +152,49 @@ else:
             'PASSWORD': config('DB_PASSWORD'),
             'HOST': config('DB_HOST'),
             'PORT': config('DB_PORT'),
-            'CONN_MAX_AGE': config('CONN_MAX_AGE', cast=int),
-            'OPTIONS': {
-                'options': f"-c search_path={config('SCHEMA')}",
-            }
+            # pooled connections are never persistent, the pool keeps them open
+            'CONN_MAX_AGE': 0 if DB_POOL else config('CONN_MAX_AGE', cast=int),
+            # ping persistent connections before reusing them, so a restarted server or proxy costs no failed request
+            'CONN_HEALTH_CHECKS': config('CONN_HEALTH_CHECKS', default=True, cast=bool),
+            # PgBouncer in transaction mode cannot keep the server-side cursors used by exports
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+            'OPTIONS': DATABASE_OPTIONS,
         }
     }
+    # comma separated replica hosts, e.g. "10.0.0.5,10.0.0.6:5433"; same credentials as the primary
+    for index, replica in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+        host, _, port = replica.partition(':')
+        DATABASES[f'replica_{index}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# seconds a client that wrote, or data cached for everyone after a write, is read from the primary
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+
+# Cache shared by every worker and cron process: redis://host:6379/0 or memcached://host:11211 (needs pymemcache).
+# User access, the payment registry, property payloads and replica stickiness are invalidated
+# through it, so without CACHE_URL (a per-process cache) a change only reaches the process that made it.
+CACHE_URL = config('CACHE_URL', default='')
+CACHE_BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+if CACHE_URL:
+    _cache_scheme, _, _cache_location = CACHE_URL.partition('://')
+    CACHES = {
+        'default': {
+            'BACKEND': CACHE_BACKENDS[_cache_scheme],
+            'LOCATION': CACHE_URL if _cache_scheme.startswith('redis') else _cache_location,
+            'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='mhp'),
+        }
+    }
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -145,6 +214,83 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing policy. The first hasher is used for new hashes; older hashes are
+# upgraded on the next successful login (see utils/hashers.py).
+PASSWORD_HASHING_ALGORITHM = config('PASSWORD_HASHING_ALGORITHM', default='scrypt')
+PASSWORD_HASHING_MAX_WORKERS = config('PASSWORD_HASHING_MAX_WORKERS', default=2, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 14, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=1, cast=int)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=19456, cast=int)
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=1, cast=int)
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000, cast=int)
+
+_PASSWORD_HASHERS = {
+    'argon2': 'utils.hashers.Argon2PasswordHasher',
+    'scrypt': 'utils.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'utils.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHING_ALGORITHM],
+    *[hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHING_ALGORITHM],
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+
+# bulk property import
+PROPERTY_IMPORT_CHUNK_SIZE = config('PROPERTY_IMPORT_CHUNK_SIZE', default=500, cast=int)
+PROPERTY_IMPORT_MAX_REPORTED_ERRORS = config('PROPERTY_IMPORT_MAX_REPORTED_ERRORS', default=1000, cast=int)
+PROPERTY_IMAGE_BATCH_SIZE = config('PROPERTY_IMAGE_BATCH_SIZE', default=50, cast=int)
+PROPERTY_IMAGE_MAX_ATTEMPTS = config('PROPERTY_IMAGE_MAX_ATTEMPTS', default=3, cast=int)
+PROPERTY_IMAGE_DOWNLOAD_TIMEOUT = config('PROPERTY_IMAGE_DOWNLOAD_TIMEOUT', default=10, cast=int)
+PROPERTY_IMAGE_MAX_BYTES = config('PROPERTY_IMAGE_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+# seconds after which a claimed download is handed to another worker
+PROPERTY_IMAGE_CLAIM_TIMEOUT = config('PROPERTY_IMAGE_CLAIM_TIMEOUT', default=10 * 60, cast=int)
+
+# threads per vendor SDK for async views; a slow gateway holds at most this many threads, further calls queue
+VENDOR_THREAD_POOL_SIZES = {
+    'selcom': config('SELCOM_THREAD_POOL_SIZE', default=20, cast=int),
+    'sms': config('SMS_THREAD_POOL_SIZE', default=10, cast=int),
+}
+
+# response compression; brotli and zstd are used when the brotli / zstandard packages are installed
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+# seconds the precompressed property detail and feed payloads stay cached; they are only cached in the shared
+# cache, a per-process one would keep serving a changed property from the workers that did not change it
+PROPERTY_RESPONSE_CACHE_TIMEOUT = config('PROPERTY_RESPONSE_CACHE_TIMEOUT', default=300 if CACHE_URL else 0, cast=int)
+
+# bearer token required to scrape /metrics; the endpoint is open when empty, which production settings refuse
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# SQL profiling of sampled requests: a share of all requests (0 to 1), or any request sending
+# "X-Profile-SQL: <SQL_PROFILER_TOKEN>"; both are off by default
+SQL_PROFILER_SAMPLE_RATE = config('SQL_PROFILER_SAMPLE_RATE', default=0.0, cast=float)
+SQL_PROFILER_TOKEN = config('SQL_PROFILER_TOKEN', default='')
+# profiled requests slower than this are logged with their query breakdown
+SQL_PROFILER_SLOW_REQUEST_MS = config('SQL_PROFILER_SLOW_REQUEST_MS', default=500, cast=int)
+# a query shape repeated this many times in one request is reported as an N+1
+SQL_PROFILER_DUPLICATE_THRESHOLD = config('SQL_PROFILER_DUPLICATE_THRESHOLD', default=5, cast=int)
+
+# Tracing (utils/tracing.py): spans of requests, database queries, gateway calls and cron runs, written
+# to TRACING_FILE as JSON lines or sent to an OpenTelemetry collector (TRACING_EXPORTER=otlp)
+TRACING_ENABLED = config('TRACING_ENABLED', default=False, cast=bool)
+# share of requests traced (0 to 1); a request with a traceparent header follows the caller's decision
+TRACING_SAMPLE_RATE = config('TRACING_SAMPLE_RATE', default=1.0, cast=float)
+TRACING_EXPORTER = config('TRACING_EXPORTER', default='file')
+TRACING_FILE = config('TRACING_FILE', default=os.path.join(BASE_DIR, 'logs', 'traces.jsonl'))
+TRACING_OTLP_ENDPOINT = config('TRACING_OTLP_ENDPOINT', default='http://localhost:4318/v1/traces')
+# extra headers for the collector, e.g. "authorization=Bearer abc,x-tenant=mhp"
+TRACING_OTLP_HEADERS = config('TRACING_OTLP_HEADERS', default='', cast=Csv())
+TRACING_SERVICE_NAME = config('TRACING_SERVICE_NAME', default='mhp')
+# spans kept per trace; a cron touching thousands of rows drops the rest
+TRACING_MAX_SPANS = config('TRACING_MAX_SPANS', default=1000, cast=int)
+
+# milliseconds `manage.py profile_startup` allows for django.setup() plus loading the URLconf
+STARTUP_BUDGET_MS = config('STARTUP_BUDGET_MS', default=1000, cast=int)
+
+# Admin changelists of tables with more rows than this show estimated counts (PostgreSQL only)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=10000, cast=int)
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -166,6 +312,59 @@ MEDIA_URL = '/media/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# public origin of the API, used for media URLs built outside a request
+BASE_URL = config('BASE_URL', default='')
+
+# uploads are saved under content-hashed names (utils/media.py) and served with immutable cache headers
+STORAGES = {
+    'default': {'BACKEND': 'utils.media.HashedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# "local" keeps uploads in MEDIA_ROOT; "s3" stores them in an S3-compatible bucket (AWS S3, MinIO) that every
+# app server shares and enables direct client uploads (utils/storage.py)
+MEDIA_STORAGE = config('MEDIA_STORAGE', default='local')
+# server-side uploads above the threshold are sent in parts; direct uploads above it get one presigned URL per part
+MEDIA_MULTIPART_THRESHOLD = config('MEDIA_MULTIPART_THRESHOLD', default=8 * 1024 * 1024, cast=int)
+MEDIA_MULTIPART_PART_SIZE = config('MEDIA_MULTIPART_PART_SIZE', default=8 * 1024 * 1024, cast=int)
+MEDIA_UPLOAD_MAX_SIZE = config('MEDIA_UPLOAD_MAX_SIZE', default=20 * 1024 * 1024, cast=int)
+MEDIA_UPLOAD_CONTENT_TYPES = config('MEDIA_UPLOAD_CONTENT_TYPES', default='image/jpeg,image/png,image/webp', cast=Csv())
+# seconds a presigned upload URL stays valid
+MEDIA_UPLOAD_EXPIRES = config('MEDIA_UPLOAD_EXPIRES', default=900, cast=int)
+if MEDIA_STORAGE == 's3':
+    from boto3.s3.transfer import TransferConfig
+
+    STORAGES['default'] = {
+        'BACKEND': 'utils.storage.HashedS3Storage',
+        'OPTIONS': {
+            'bucket_name': config('MEDIA_BUCKET_NAME'),
+            # e.g. http://minio:9000; empty for AWS
+            'endpoint_url': config('MEDIA_S3_ENDPOINT_URL', default=None),
+            'region_name': config('MEDIA_S3_REGION', default=None),
+            'access_key': config('MEDIA_S3_ACCESS_KEY', default=None),
+            'secret_key': config('MEDIA_S3_SECRET_KEY', default=None),
+            # "path" for MinIO without wildcard DNS
+            'addressing_style': config('MEDIA_S3_ADDRESSING_STYLE', default=None),
+            # CDN domain in front of the bucket
+            'custom_domain': config('MEDIA_CUSTOM_DOMAIN', default=None),
+            # media is public: plain URLs, readable through the bucket policy (see setup_media_bucket)
+            'querystring_auth': config('MEDIA_S3_QUERYSTRING_AUTH', default=False, cast=bool),
+            'object_parameters': {'CacheControl': 'public, max-age=31536000, immutable'},
+            'transfer_config': TransferConfig(
+                multipart_threshold=MEDIA_MULTIPART_THRESHOLD, multipart_chunksize=MEDIA_MULTIPART_PART_SIZE,
+            ),
+        },
+    }
+# "django" streams media itself; "x-accel" (nginx) and "x-sendfile" (Apache, lighttpd) only send headers
+# and let the web server transfer the file from MEDIA_ACCEL_PREFIX / MEDIA_ROOT
+MEDIA_SERVE_MODE = config('MEDIA_SERVE_MODE', default='django')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+# seconds browsers may cache image variants and media uploaded before names were hashed
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+# resized copies served for ?variant=<name>, by maximum width in pixels
+MEDIA_IMAGE_VARIANTS = {
+    'thumb': config('MEDIA_THUMB_WIDTH', default=480, cast=int),
+    'medium': config('MEDIA_MEDIUM_WIDTH', default=1280, cast=int),
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -177,15 +376,27 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = config('SESSION_EXPIRE_AT_BROWSER_CLOSE', cast
 SESSION_SAVE_EVERY_REQUEST = config('SESSION_SAVE_EVERY_REQUEST', cast=bool)
 
 # SimpleJWT Settings and rest framework
+# Trust the signed user claims in the access token instead of loading the user on every request
+JWT_CLAIMS_AUTH = config('JWT_CLAIMS_AUTH', default=False, cast=bool)
+# seconds a process may accept a locked, deactivated or re-passworded user before re-checking the shared cache
+JWT_REVOCATION_CACHE_TTL = config('JWT_REVOCATION_CACHE_TTL', default=10, cast=int)
+# seconds a process may serve a user's groups/permissions before re-checking the shared cache version
+USER_ACCESS_LOCAL_TTL = config('USER_ACCESS_LOCAL_TTL', default=10, cast=int)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
+        'users.authentication.ClaimsJWTCookieAuthentication' if JWT_CLAIMS_AUTH
+        else 'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.renderers.ORJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
@@ -207,6 +418,9 @@ REST_AUTH = {
     'LOGOUT_ON_PASSWORD_CHANGE': config('LOGOUT_ON_PASSWORD_CHANGE', cast=bool),
 }
 
+# serve the OpenAPI schema and Swagger/Redoc views (off in mhp.settings_production)
+API_SCHEMA_ENABLED = config('API_SCHEMA_ENABLED', default=True, cast=bool)
+
 SPECTACULAR_SETTINGS = {
     'TITLE': config('SPECTACULAR_API_TITLE', cast=str),
     'DESCRIPTION': config('SPECTACULAR_API_DESC', cast=str),
@@ -226,6 +440,7 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': os.path.join(LOG_DIR, f"{datetime.now().date()}.log"),
             'formatter': 'verbose',
+            'delay': True,
         },
     },
     'formatters': {
@@ -242,9 +457,26 @@ LOGGING = {
     },
 }
 
+# seconds between checks for payment configuration changes made by other processes
+PAYMENT_CONFIG_CHECK_INTERVAL = config('PAYMENT_CONFIG_CHECK_INTERVAL', default=30, cast=int)
+ORDER_GENERATION_CHUNK_SIZE = config('ORDER_GENERATION_CHUNK_SIZE', default=1000, cast=int)
+# subscriptions due within this many days get their next cycle order
+RENEWAL_WINDOW_DAYS = config('RENEWAL_WINDOW_DAYS', default=3, cast=int)
+RENEWAL_BATCH_SIZE = config('RENEWAL_BATCH_SIZE', default=500, cast=int)
+# payment reconciliation against the gateway order status API
+RECONCILIATION_STALE_MINUTES = config('RECONCILIATION_STALE_MINUTES', default=30, cast=int)
+RECONCILIATION_RECHECK_MINUTES = config('RECONCILIATION_RECHECK_MINUTES', default=60, cast=int)
+RECONCILIATION_BATCH_SIZE = config('RECONCILIATION_BATCH_SIZE', default=200, cast=int)
+RECONCILIATION_MAX_WORKERS = config('RECONCILIATION_MAX_WORKERS', default=4, cast=int)
+# order status requests per second
+RECONCILIATION_RATE_LIMIT = config('RECONCILIATION_RATE_LIMIT', default=5, cast=float)
+
 CRONTAB_COMMAND_SUFFIX = config('CRONTAB_COMMAND_SUFFIX', cast=str)
 
 CRONJOBS = [
     ("* * * * *", "payment.crons.request_payment_url_cron"),
-    ("* * * * *", "payment.crons.generate_order_for_user_cron")
+    ("* * * * *", "payment.crons.generate_order_for_user_cron"),
+    ("0 * * * *", "payment.crons.renew_subscriptions_cron"),
+    ("*/15 * * * *", "payment.crons.reconcile_payments_cron"),
+    ("* * * * *", "homes.crons.process_pending_images_cron"),
 ]
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Production settings for mhp project.
+
+The base settings without development-only apps, middleware and API schema
+generation, so workers import less and boot faster:
+
+    DJANGO_SETTINGS_MODULE=mhp.settings_production gunicorn mhp.asgi:application ...
+
+Check the boot time with `python manage.py profile_startup --settings=mhp.settings_production`.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+from mhp.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+DEVELOPMENT_APPS = ('debug_toolbar', 'drf_yasg', 'drf_spectacular', 'django_forms_bootstrap')
+DEVELOPMENT_MIDDLEWARE = ('debug_toolbar.middleware.DebugToolbarMiddleware',)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEVELOPMENT_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in DEVELOPMENT_MIDDLEWARE]
+
+API_SCHEMA_ENABLED = False
+
+if not CACHE_URL:
+    # several workers and the cron processes would each keep their own copy of cached access and payloads
+    raise ImproperlyConfigured("CACHE_URL must point to a shared Redis or Memcached in production")
+
+if not METRICS_TOKEN:
+    # /metrics lists every view, its traffic and the gateway error rates
+    raise ImproperlyConfigured("METRICS_TOKEN must be set in production, /metrics would be public")
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # DRF's own inspector is only instantiated on schema requests, which production does not serve
+    'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': ['utils.renderers.ORJSONRenderer'],
+}
@@ -1,26 +1,12 @@
+from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularSwaggerView, SpectacularAPIView, SpectacularJSONAPIView, \
-    SpectacularRedocView
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 
-from mhp import settings
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="More Homes Project",
-        default_version='v1',
-        description="API description",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="developer@mhp.co.tz"),
-        license=openapi.License(name="License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny, ],
-)
+from utils.media import serve_media
+from utils.metrics import metrics_view
+from utils.sql_profiler import SQLProfileApiView
+from utils.storage import DirectUploadApiView, DirectUploadCompleteApiView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,13 +14,41 @@ urlpatterns = [
     path('payment/', include("payment.urls")),
     path('auth/', include("users.urls")),
     path('dj-auth/', include('dj_rest_auth.urls')),
-    path('api-doc/', SpectacularSwaggerView.as_view(url_name='yaml-schema'), name='swagger-schema'),
-    path('schema/yaml-schema/', SpectacularAPIView.as_view(), name='yaml-schema'),
-    path('schema/json-schema/', SpectacularJSONAPIView.as_view(), name='json-schema'),
-    path('schema/swagger-schema/', SpectacularSwaggerView.as_view(url_name='yaml-schema'), name='swagger-schema'),
-    path('schema/redoc-schema/', SpectacularRedocView.as_view(url_name='yaml-schema'), name='redoc-schema'),
+    path('metrics', metrics_view, name='metrics'),
+    path('monitoring/sql-profile', SQLProfileApiView.as_view(), name='sql-profile'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'),
+    path('uploads', DirectUploadApiView.as_view(), name='direct-upload'),
+    path('uploads/complete', DirectUploadCompleteApiView.as_view(), name='direct-upload-complete'),
 ]
 
+# schema generation is development tooling; the production profile leaves it out
+if settings.API_SCHEMA_ENABLED:
+    from drf_spectacular.views import SpectacularSwaggerView, SpectacularAPIView, SpectacularJSONAPIView, \
+        SpectacularRedocView
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    schema_view = get_schema_view(
+        openapi.Info(
+            title="More Homes Project",
+            default_version='v1',
+            description="API description",
+            terms_of_service="https://www.google.com/policies/terms/",
+            contact=openapi.Contact(email="developer@mhp.co.tz"),
+            license=openapi.License(name="License"),
+        ),
+        public=True,
+        permission_classes=[permissions.AllowAny, ],
+    )
+
+    urlpatterns += [
+        path('api-doc/', SpectacularSwaggerView.as_view(url_name='yaml-schema'), name='swagger-schema'),
+        path('schema/yaml-schema/', SpectacularAPIView.as_view(), name='yaml-schema'),
+        path('schema/json-schema/', SpectacularJSONAPIView.as_view(), name='json-schema'),
+        path('schema/swagger-schema/', SpectacularSwaggerView.as_view(url_name='yaml-schema'), name='swagger-schema'),
+        path('schema/redoc-schema/', SpectacularRedocView.as_view(url_name='yaml-schema'), name='redoc-schema'),
+    ]
+
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
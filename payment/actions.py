@@ -1,15 +1,28 @@
+import asyncio
+from datetime import timedelta
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Min, Subquery
 from django.utils import timezone
 from requests import Response
 from rest_framework import status
 
-from payment.models import CustomerOrderPayment, CustomerOrder, WebhookResponse
+from payment.models import CustomerOrderPayment, CustomerOrder, WebhookResponse, OrderNumberGenerator, \
+    CronCheckpoint
+from payment.registry import payment_config_registry
 from payment.selectors import get_current_static_config, get_group_fee
+from users.actions import invalidate_user_access
 from users.models import User
+from utils.generators import generate_order_id
+from utils.locks import run_lock
 from utils.logger import AppLogger
 from utils.response_utils import create_response
 from utils.selcom_service import SelcomApiClient
+from utils.tracing import traced
 
 logger = AppLogger(__name__)
 
@@ -31,8 +44,9 @@ def create_payment_record(order, payment_data):
     """Create a CustomerOrderPayment record"""
     return CustomerOrderPayment.objects.create(
         order=order,
+        customer_id=order.customer_id,
         result=payment_data['result'],
-        resultcode=payment_data['resultcode'],
+        resultcode=payment_data.get('resultcode', ''),
         transid=payment_data['transid'],
         reference=payment_data['reference'],
         channel=payment_data['channel'],
@@ -43,8 +57,97 @@ def create_payment_record(order, payment_data):
     )
 
 
+@traced()
+def record_payment(payment_data, webhook_res=None):
+    """
+    Record a gateway payment notification as one unit of work.
+
+    The order row is locked with SELECT ... FOR UPDATE, so duplicate deliveries
+    of the same webhook are serialized and the second one finds the transid
+    already recorded instead of crediting the order twice. A successful payment
+    marks the order paid with a single conditional UPDATE, and the webhook
+    response is flagged processed in the same transaction.
+
+    Args:
+        payment_data (dict): Validated PaymentResponseSerializer data.
+        webhook_res (WebhookResponse): Stored webhook body to mark as processed.
+
+    Returns:
+        tuple: (CustomerOrder, created) where created is False for a duplicate delivery.
+
+    Raises:
+        CustomerOrder.DoesNotExist: If no order matches payment_data['order_id'].
+    """
+    with transaction.atomic():
+        order = (
+            CustomerOrder.objects.select_for_update()
+            .only('id', 'order_id', 'customer_id', 'fee_id', 'is_paid')
+            .get(order_id=payment_data['order_id'])
+        )
+
+        created = not CustomerOrderPayment.objects.filter(order=order, transid=payment_data['transid']).exists()
+        if created:
+            payment = create_payment_record(order, payment_data)
+            if payment.is_successful:
+                interval = payment_config_registry.get_fee_interval(order.fee_id)
+                CustomerOrder.objects.filter(pk=order.pk, is_paid=False).update(
+                    is_paid=True,
+                    next_payment_date=timezone.localdate(payment.created_at) + timedelta(days=interval),
+                    updated_at=timezone.now(),
+                )
+                logger.info(f"Payment completed for order {order.order_id}")
+        else:
+            logger.info(f"Duplicate payment {payment_data['transid']} for order {order.order_id} ignored")
+
+        if webhook_res is not None:
+            WebhookResponse.objects.filter(pk=webhook_res.pk).update(processed=True)
+    return order, created
+
+
+def record_admin_payment(payment):
+    """
+    Record a payment entered in the admin the same way as a webhook delivery.
+
+    Args:
+        payment (CustomerOrderPayment): Unsaved instance built by the admin form.
+
+    Returns:
+        tuple: (CustomerOrderPayment, created); the already recorded payment when the transid is a duplicate.
+    """
+    order, created = record_payment({
+        'result': payment.result,
+        'resultcode': payment.resultcode,
+        'order_id': payment.order.order_id,
+        'transid': payment.transid,
+        'reference': payment.reference,
+        'channel': payment.channel,
+        'amount': payment.amount,
+        'phone': payment.phone,
+        'payment_status': payment.payment_status,
+    })
+    return CustomerOrderPayment.objects.get(order=order, transid=payment.transid), created
+
+
+def backfill_payment_customers():
+    """Fill CustomerOrderPayment.customer for payments recorded before the field existed."""
+    updated = CustomerOrderPayment.objects.filter(customer__isnull=True).update(
+        customer_id=Subquery(CustomerOrder.objects.filter(pk=OuterRef('order_id')).values('customer_id')[:1])
+    )
+    logger.info(f"✅ Backfilled customer of {updated} payments")
+    return updated
+
+
 def request_payment_url(payer: User) -> Response:
     success, response = request_payer_payment_url(payer)
+    return _payment_url_response(payer, success, response)
+
+
+async def arequest_payment_url(payer: User) -> Response:
+    success, response = await arequest_payer_payment_url(payer)
+    return _payment_url_response(payer, success, response)
+
+
+def _payment_url_response(payer, success, response):
     if success:
         return create_response("Payment url processed successfully", status.HTTP_200_OK, data=response)
     else:
@@ -53,48 +156,84 @@ def request_payment_url(payer: User) -> Response:
         return create_response(msg, status.HTTP_400_BAD_REQUEST)
 
 
-def request_payer_payment_url(user: User):
-    name = f"{user.first_name} {user.last_name}"
-    logger.info(f"🔥 Start generating payment url request for {name}")
-    get_orders = CustomerOrder.objects.filter(is_paid=False, is_generated=False, customer=user)
+def _get_orders_to_generate(user):
+    # customer and fee are read while building the gateway payload
+    return CustomerOrder.objects.filter(is_paid=False, is_generated=False, customer=user).select_related(
+        'customer', 'fee'
+    )
+
 
-    total_order = get_orders.count()
+def _summarize_payment_urls(orders, responses):
+    """Store the gateway response on failed orders and count the generated ones."""
     fail_order = 0
     success_order = 0
-    logger.info(f"🔥 Total order: {total_order}")
+    for order, response in zip(orders, responses):
+        logger.info(f"Response from selcom, {response}")
+        if not response['result'] == "SUCCESS":
+            fail_order = fail_order + 1
+            order.message = response
+            order.save()
+
+        if response['result'] == "SUCCESS":
+            success_order = success_order + 1
+
+    return {
+        "msg": "success",
+        "total_order": len(orders),
+        "generated_order": success_order,
+        "non_generated_order": fail_order
+    }
+
+
+@traced()
+def request_payer_payment_url(user: User):
+    name = f"{user.first_name} {user.last_name}"
+    logger.info(f"🔥 Start generating payment url request for {name}")
+    get_orders = list(_get_orders_to_generate(user))
+    logger.info(f"🔥 Total order: {len(get_orders)}")
 
-    if get_orders.exists():
+    if get_orders:
         get_static_config = get_current_static_config()
         if get_static_config is None:
-            msg = f"🔥 active payment configuration found."
-            logger.info(msg)
-            return create_response(msg, status.HTTP_500_INTERNAL_SERVER_ERROR)
+            logger.info(f"🔥 No active payment configuration found.")
+            return False, None
 
         initialize_payment = SelcomApiClient(get_static_config)
-        for order in get_orders:
-            response = initialize_payment.execute_selcom_payment(order)
-            logger.info(f"Response from selcom, {response}")
-            if not response['result'] == "SUCCESS":
-                fail_order = fail_order + 1
-                order.message = response
-                order.save()
-
-            if response['result'] == "SUCCESS":
-                success_order = success_order + 1
-
-        response = {
-            "msg": "success",
-            "total_order": total_order,
-            "generated_order": success_order,
-            "non_generated_order": fail_order
-        }
-        return True, response
+        responses = [initialize_payment.execute_selcom_payment(order) for order in get_orders]
+        return True, _summarize_payment_urls(get_orders, responses)
     else:
         msg = f"No unpaid orders found for {name}"
         logger.info(msg)
         return False, None
 
 
+@traced()
+async def arequest_payer_payment_url(user: User):
+    """
+    Async request_payer_payment_url: the orders of the payer are sent to
+    Selcom concurrently instead of one after the other.
+    """
+    name = f"{user.first_name} {user.last_name}"
+    logger.info(f"🔥 Start generating payment url request for {name}")
+    get_orders = await sync_to_async(list)(_get_orders_to_generate(user))
+    logger.info(f"🔥 Total order: {len(get_orders)}")
+
+    if not get_orders:
+        logger.info(f"No unpaid orders found for {name}")
+        return False, None
+
+    get_static_config = await sync_to_async(get_current_static_config)()
+    if get_static_config is None:
+        logger.info(f"🔥 No active payment configuration found.")
+        return False, None
+
+    initialize_payment = SelcomApiClient(get_static_config)
+    responses = await asyncio.gather(
+        *(initialize_payment.aexecute_selcom_payment(order) for order in get_orders)
+    )
+    return True, await sync_to_async(_summarize_payment_urls)(get_orders, responses)
+
+
 def generate_order_action(user):
     """Get fee"""
     fee = get_group_fee(user.groups.first())
@@ -107,13 +246,199 @@ def generate_order_action(user):
     if fee and static_conf:
         logger.info(f"Customer order is created for {user}")
         customer_order = CustomerOrder(
-            fee=fee,
+            fee_id=fee.id,
             customer=user,
-            static_conf=static_conf,
+            static_conf_id=static_conf.id,
             last_payment_date=timezone.now().date(),
             created_by=user,
             updated_by=user,
         )
         customer_order.save()
         return customer_order
-    return None
\ No newline at end of file
+    return None
+
+
+ORDER_GENERATION_CHECKPOINT = "generate_order_for_user"
+
+
+def assign_default_group_in_bulk(default_group_name="customer"):
+    """
+    Add every user that has no group and no order to the default group with one insert.
+
+    Unlike user.groups.add() this does not fire m2m_changed, so orders for these
+    users are created by bulk_generate_orders() in the same pass.
+
+    Returns:
+        int: Number of users assigned.
+    """
+    group = Group.objects.filter(name=default_group_name).first()
+    if group is None:
+        logger.warning(f"⚠️ Default group '{default_group_name}' does not exist.")
+        return 0
+
+    user_ids = list(
+        User.objects.filter(groups__isnull=True)
+        .filter(~Exists(CustomerOrder.objects.filter(customer_id=OuterRef('pk'))))
+        .values_list('id', flat=True)
+    )
+    if user_ids:
+        membership = User.groups.through
+        membership.objects.bulk_create(
+            [membership(user_id=user_id, group_id=group.id) for user_id in user_ids],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        invalidate_user_access(user_ids)
+        logger.info(f"✅ Assigned default group '{default_group_name}' to {len(user_ids)} users.")
+    return len(user_ids)
+
+
+@traced()
+def bulk_generate_orders(chunk_size=None):
+    """
+    Create the first CustomerOrder of every user that has none, in chunks.
+
+    Eligible users and their group (the lowest group id, as user.groups.first()
+    picked) come from one grouped query over the user/group table. Fees come from
+    the payment config registry, order numbers are reserved one block per chunk
+    and the orders are written with bulk_create.
+
+    After every chunk the last processed user id is stored in a CronCheckpoint in
+    the same transaction as the orders, so an interrupted run resumes after it.
+    A run lock keeps overlapping runs of the every-minute cron from generating
+    orders for the same users; a run that finds it taken returns at once.
+
+    Returns:
+        int: Number of orders created.
+    """
+    chunk_size = chunk_size or getattr(settings, 'ORDER_GENERATION_CHUNK_SIZE', 1000)
+    static_conf = payment_config_registry.get_static_config()
+    if static_conf is None:
+        logger.info(f"Static configuration not found")
+        return 0
+
+    with run_lock(ORDER_GENERATION_CHECKPOINT) as acquired:
+        if not acquired:
+            logger.info("🤚 Order generation is already running")
+            return 0
+        return _generate_missing_orders(static_conf, chunk_size)
+
+
+def _generate_missing_orders(static_conf, chunk_size):
+    assign_default_group_in_bulk()
+
+    checkpoint, _ = CronCheckpoint.objects.get_or_create(name=ORDER_GENERATION_CHECKPOINT)
+    if checkpoint.last_id:
+        logger.info(f"🔥 Resuming order generation after user {checkpoint.last_id}")
+
+    eligible = (
+        User.groups.through.objects
+        .filter(~Exists(CustomerOrder.objects.filter(customer_id=OuterRef('user_id'))))
+        .values('user_id')
+        .annotate(group_id=Min('group_id'))
+        .order_by('user_id')
+    )
+
+    total_created = 0
+    while True:
+        rows = list(eligible.filter(user_id__gt=checkpoint.last_id)[:chunk_size])
+        if not rows:
+            break
+
+        pending = []
+        for row in rows:
+            fee = payment_config_registry.get_group_fee(row['group_id'])
+            if fee is not None:
+                pending.append((row['user_id'], fee))
+        if len(pending) < len(rows):
+            logger.info(f"Fee for the group of {len(rows) - len(pending)} users does not found")
+
+        today = timezone.now().date()
+        numbers = OrderNumberGenerator.reserve_numbers(len(pending)) if pending else []
+        orders = [
+            CustomerOrder(
+                order_id=generate_order_id(number),
+                customer_id=user_id,
+                fee_id=fee.id,
+                static_conf_id=static_conf.id,
+                last_payment_date=today,
+                next_payment_date=today + timedelta(days=fee.interval),
+                created_by_id=user_id,
+                updated_by_id=user_id,
+            )
+            for (user_id, fee), number in zip(pending, numbers)
+        ]
+
+        with transaction.atomic():
+            CustomerOrder.objects.bulk_create(orders)
+            checkpoint.last_id = rows[-1]['user_id']
+            checkpoint.save(update_fields=['last_id', 'updated_at'])
+
+        total_created += len(orders)
+        logger.info(f"✅ Generated {len(orders)} orders, checkpoint at user {checkpoint.last_id}")
+
+    # a completed pass starts from the beginning next time, e.g. for groups that get a fee later
+    checkpoint.last_id = 0
+    checkpoint.save(update_fields=['last_id', 'updated_at'])
+    return total_created
+
+
+@traced()
+def renew_due_subscriptions(window_days=None, batch_size=None):
+    """
+    Create the next cycle order for every paid order that falls due within the window.
+
+    Due orders are read through the partial (next_payment_date, is_paid) index of
+    orders not yet renewed, so a pass costs in proportion to the number of due
+    orders. Each batch is locked with SKIP LOCKED, the next orders are created
+    with bulk_create using the fee's interval, and the batch is flagged as renewed
+    in the same transaction.
+
+    Returns:
+        int: Number of orders renewed.
+    """
+    window_days = getattr(settings, 'RENEWAL_WINDOW_DAYS', 3) if window_days is None else window_days
+    batch_size = batch_size or getattr(settings, 'RENEWAL_BATCH_SIZE', 500)
+    static_conf = payment_config_registry.get_static_config()
+    if static_conf is None:
+        logger.info(f"Static configuration not found")
+        return 0
+
+    horizon = timezone.now().date() + timedelta(days=window_days)
+    due_orders = CustomerOrder.objects.filter(
+        is_renewed=False, is_paid=True, next_payment_date__lte=horizon
+    ).order_by('next_payment_date', 'id')
+
+    total_renewed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                due_orders.select_for_update(skip_locked=True)
+                .values('id', 'customer_id', 'fee_id', 'next_payment_date')[:batch_size]
+            )
+            if not batch:
+                break
+
+            numbers = OrderNumberGenerator.reserve_numbers(len(batch))
+            CustomerOrder.objects.bulk_create([
+                CustomerOrder(
+                    order_id=generate_order_id(number),
+                    customer_id=order['customer_id'],
+                    fee_id=order['fee_id'],
+                    static_conf_id=static_conf.id,
+                    last_payment_date=order['next_payment_date'],
+                    next_payment_date=order['next_payment_date'] + timedelta(
+                        days=payment_config_registry.get_fee_interval(order['fee_id'])
+                    ),
+                    created_by_id=order['customer_id'],
+                    updated_by_id=order['customer_id'],
+                )
+                for order, number in zip(batch, numbers)
+            ])
+            CustomerOrder.objects.filter(id__in=[order['id'] for order in batch]).update(
+                is_renewed=True, updated_at=timezone.now()
+            )
+
+        total_renewed += len(batch)
+        logger.info(f"✅ Renewed {len(batch)} subscriptions")
+    return total_renewed
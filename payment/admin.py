@@ -1,6 +1,8 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
+from payment.actions import record_admin_payment
 from payment.models import CustomerOrderPayment, CustomerOrder, OrderStaticConfig, Fee, WebhookResponse
+from utils.admin_utils import LargeTableAdmin
 
 
 # Register your models here.
@@ -23,12 +25,17 @@ class OrderStaticConfigAdmin(admin.ModelAdmin):
 
 
 @admin.register(CustomerOrder)
-class CustomerOrderAdmin(admin.ModelAdmin):
+class CustomerOrderAdmin(LargeTableAdmin):
     list_display = (
         'customer', 'fee', 'is_paid', 'last_payment_date', 'next_payment_date',
         'reference', 'resultcode', 'result', 'message'
     )
-    list_filter = ('is_paid', 'last_payment_date', 'next_payment_date')
+    list_select_related = ('customer', 'fee__group')
+    list_filter = ('is_paid', 'next_payment_date', 'created_at')
+    export_fields = (
+        'order_id', 'customer__username', 'customer__phone', 'fee__amount', 'is_paid', 'is_generated',
+        'last_payment_date', 'next_payment_date', 'reference', 'result', 'created_at'
+    )
     search_fields = (
         'customer__username', 'customer__email', 'reference', 'gateway_buyer_uuid'
     )
@@ -41,20 +48,42 @@ class CustomerOrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(CustomerOrderPayment)
-class CustomerOrderPaymentAdmin(admin.ModelAdmin):
+class CustomerOrderPaymentAdmin(LargeTableAdmin):
     list_display = (
         'order', 'amount', 'payment_status', 'result', 'transid', 'phone', 'created_at'
     )
-    list_filter = ('payment_status', 'result', 'channel')
+    list_select_related = ('order__customer',)
+    list_filter = ('payment_status', 'result', 'created_at')
+    export_fields = (
+        'orderid', 'order__customer__username', 'transid', 'reference', 'channel', 'amount', 'phone',
+        'result', 'payment_status', 'created_at'
+    )
     search_fields = ('order__order_id', 'transid', 'reference', 'phone')
     raw_id_fields = ('order',)
     readonly_fields = ('uuid', 'created_at', 'updated_at', 'amount')
 
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            # the amount is entered once, when a payment is recorded by hand
+            return tuple(field for field in self.readonly_fields if field != 'amount')
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+        # through record_payment, so the order is marked paid and a duplicate transid is not credited twice
+        payment, created = record_admin_payment(obj)
+        obj.pk, obj.uuid, obj.created_at = payment.pk, payment.uuid, payment.created_at
+        if not created:
+            self.message_user(
+                request, f"Payment {obj.transid} was already recorded for order {obj.order}", messages.WARNING
+            )
+
 
 @admin.register(WebhookResponse)
-class WebhookResponseAdmin(admin.ModelAdmin):
+class WebhookResponseAdmin(LargeTableAdmin):
     list_display = ('id', 'remote_ip', 'processed', 'created_at', 'updated_at')
-    list_filter = ('processed', 'remote_ip', 'created_at')
+    list_filter = ('processed', 'created_at')
     search_fields = ('remote_ip', 'response')
     readonly_fields = ('response', 'remote_ip', 'created_at', 'updated_at')
     ordering = ('-created_at',)
@@ -1,13 +1,15 @@
-from payment.actions import request_payer_payment_url, generate_order_action
-from payment.models import CustomerOrder
+from payment.actions import request_payer_payment_url, bulk_generate_orders, renew_due_subscriptions
+from payment.reconciliation import reconcile_payments
 from payment.selectors import get_orders_url_not_generate
-from users.actions import add_user_to_default_group
-from users.models import User
 from utils.logger import AppLogger
+from utils.metrics import track_cron
+from utils.tracing import trace_job
 
 logger = AppLogger(__name__)
 
 
+@track_cron('request_payment_url')
+@trace_job('request_payment_url')
 def request_payment_url_cron():
     """
     Cron job: Generate and request payment URLs for pending orders.
@@ -37,6 +39,8 @@ def request_payment_url_cron():
 
 
 
+@track_cron('generate_order_for_user')
+@trace_job('generate_order_for_user')
 def generate_order_for_user_cron():
     """
     Cron job: Automatically generate customer orders for users.
@@ -48,23 +52,43 @@ def generate_order_for_user_cron():
 
     Steps:
       1. Log cron start.
-      2. Retrieve users without any existing order.
-      3. For each user:
-         - Assign a default group if missing.
-         - Generate a new order via `generate_order_action()`.
+      2. Assign the default group to users without group and order.
+      3. Create the missing orders in chunks via `bulk_generate_orders()`,
+         resuming from the last checkpoint if a previous run was interrupted.
 
     Expected behavior:
       - Keeps user order records synchronized.
       - Ensures every user has at least one active order.
     """
     logger.info("generate_order_for_user_cron started")
-    users_without_order = User.objects.exclude(
-        id__in=CustomerOrder.objects.values_list("customer__id", flat=True)
-    )
+    total_created = bulk_generate_orders()
+    logger.info(f"generate_order_for_user_cron created {total_created} orders")
 
-    for user in users_without_order:
-        if not user.groups.first():
-            add_user_to_default_group(user)
-            continue
-        generate_order_action(user)
 
+@track_cron('renew_subscriptions')
+@trace_job('renew_subscriptions')
+def renew_subscriptions_cron():
+    """
+    Cron job: Create next cycle orders for subscriptions falling due.
+
+    Paid orders whose `next_payment_date` is within RENEWAL_WINDOW_DAYS get a
+    new unpaid order for the following cycle (using the fee's interval), which
+    `request_payment_url_cron` then picks up.
+    """
+    logger.info("renew_subscriptions_cron started")
+    total_renewed = renew_due_subscriptions()
+    logger.info(f"renew_subscriptions_cron renewed {total_renewed} orders")
+
+
+@track_cron('reconcile_payments')
+@trace_job('reconcile_payments')
+def reconcile_payments_cron():
+    """
+    Cron job: Recover payments whose webhook was lost.
+
+    Generated orders that stay unpaid for RECONCILIATION_STALE_MINUTES are checked
+    against the Selcom order status API and completed payments are recorded the
+    same way the payment webhook records them.
+    """
+    logger.info("reconcile_payments_cron started")
+    reconcile_payments()
@@ -0,0 +1,22 @@
+from payment.models import CustomerOrder, CustomerOrderPayment
+from utils.db_router import get_read_db
+from utils.export_utils import ExportDataset
+
+order_export = ExportDataset(
+    name="orders",
+    get_queryset=lambda: CustomerOrder.objects.using(get_read_db()).order_by('pk'),
+    fields=(
+        'order_id', 'customer__username', 'customer__phone', 'fee__amount', 'fee__interval', 'is_paid',
+        'is_generated', 'is_renewed', 'last_payment_date', 'next_payment_date', 'reference', 'result',
+        'created_at', 'updated_at',
+    ),
+)
+
+payment_export = ExportDataset(
+    name="payments",
+    get_queryset=lambda: CustomerOrderPayment.objects.using(get_read_db()).order_by('pk'),
+    fields=(
+        'uuid', 'orderid', 'order__customer__username', 'transid', 'reference', 'channel', 'amount', 'phone',
+        'result', 'resultcode', 'payment_status', 'created_at',
+    ),
+)
@@ -0,0 +1,91 @@
+import os
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from payment.exports import payment_export
+from payment.models import CustomerOrder, CustomerOrderPayment, Fee, OrderStaticConfig
+from users.models import User
+from utils.export_utils import EXPORT_FORMATS, export_response
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the payment export in each format against generated payments and report the peak Python memory "
+        "while the download is consumed. The payments are created in a transaction that is rolled back, so the "
+        "database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Payments to generate")
+        parser.add_argument('--format', action='append', choices=EXPORT_FORMATS,
+                            help="Format to measure; repeatable, all by default")
+
+    def _generate(self, count):
+        group, _ = Group.objects.get_or_create(name='customer')
+        customer = User.objects.create(username='export-bench', phone='+255700000000', password='!')
+        static_conf = OrderStaticConfig.objects.create(
+            vendor_till='BENCH', currency='TZS', payment_methods='ALL', api_key='key', secrets_key='secret',
+            base_url='https://gateway.invalid', webhook_url='', callback_url='', redirect_url='', cancel_url='',
+            order_path='', active=False,
+        )
+        fee = Fee.objects.create(amount=10000, group=group, interval=30, active=False)
+        order = CustomerOrder.objects.create(
+            customer=customer, fee=fee, static_conf=static_conf,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+        for offset in range(0, count, 10_000):
+            CustomerOrderPayment.objects.bulk_create([
+                CustomerOrderPayment(
+                    uuid=uuid.uuid4(), order=order, customer=customer, result='SUCCESS', resultcode='000',
+                    transid=f"TX{index}", reference=f"REF{index}", channel='MPESA', amount=Decimal('10000.00'),
+                    phone='255700000000', payment_status='COMPLETED', orderid=order.order_id,
+                )
+                for index in range(offset, min(offset + 10_000, count))
+            ])
+
+    def _measure(self, export_format):
+        """
+        Consume the download as the server would and return (seconds, bytes, peak traced bytes).
+
+        Tracing every allocation slows the export down several times, so the timings are relative.
+        """
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = 0
+        response = export_response(payment_export, export_format)
+        with open(os.devnull, 'wb') as sink:
+            for chunk in response:
+                size += len(chunk)
+                sink.write(chunk)
+        # not response.close(): its request_finished signal would close the connection holding the test rows
+        if getattr(response, 'file_to_stream', None) is not None:
+            response.file_to_stream.close()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, size, peak
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        with transaction.atomic():
+            started = time.perf_counter()
+            self._generate(count)
+            self.stdout.write(f"Generated {count} payments in {time.perf_counter() - started:.1f} s")
+
+            self.stdout.write(f"Exporting on {connection.vendor}:")
+            self.stdout.write(f"  {'format':<7} {'seconds':>8} {'rows/s':>9} {'MB out':>8} {'peak MB':>8}")
+            for export_format in options['format'] or EXPORT_FORMATS:
+                elapsed, size, peak = self._measure(export_format)
+                self.stdout.write(
+                    f"  {export_format:<7} {elapsed:>8.1f} {count / elapsed:>9.0f} "
+                    f"{size / 1_048_576:>8.1f} {peak / 1_048_576:>8.1f}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,107 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from payment.actions import create_payment_record, record_payment
+from payment.models import CustomerOrder, CustomerOrderPayment, Fee, OrderStaticConfig, WebhookResponse
+from users.models import User
+from utils.metrics import QueryCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Record N successful webhook deliveries, and a duplicate of each, through record_payment and through the "
+        "save/signal path it replaced, and report the throughput. Everything is created in a transaction that is "
+        "rolled back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deliveries', type=int, default=2_000, help="Webhook deliveries per path")
+
+    def _generate(self, count):
+        group, _ = Group.objects.get_or_create(name='customer')
+        customer = User.objects.create(username='webhook-bench', phone='+255700000000', password='!')
+        static_conf = OrderStaticConfig.objects.create(
+            vendor_till='BENCH', currency='TZS', payment_methods='ALL', api_key='key', secrets_key='secret',
+            base_url='https://gateway.invalid', webhook_url='', callback_url='', redirect_url='', cancel_url='',
+            order_path='', active=False,
+        )
+        fee = Fee.objects.create(amount=10000, group=group, interval=30, active=False)
+        today = timezone.localdate()
+        deliveries = {}
+        for path in ('record', 'legacy'):
+            orders = CustomerOrder.objects.bulk_create([
+                CustomerOrder(
+                    order_id=f"BENCH-{path}-{index}", customer=customer, fee=fee, static_conf=static_conf,
+                    last_payment_date=today, next_payment_date=today,
+                )
+                for index in range(count)
+            ])
+            webhooks = WebhookResponse.objects.bulk_create([
+                WebhookResponse(response=f'{{"order_id": "{order.order_id}", "delivery": {attempt}}}',
+                                remote_ip='127.0.0.1')
+                for attempt in range(2) for order in orders
+            ])
+            deliveries[path] = [
+                ({
+                    'result': 'SUCCESS', 'resultcode': '000', 'order_id': order.order_id,
+                    'transid': f"TX-{order.order_id}", 'reference': f"REF-{order.order_id}", 'channel': 'MPESA',
+                    'amount': '10000', 'phone': '255700000000', 'payment_status': 'COMPLETED',
+                }, webhook)
+                for order, webhook in zip(orders * 2, webhooks)
+            ]
+        return deliveries
+
+    def _record_legacy(self, payment_data, webhook_res):
+        """The path record_payment replaced: CustomerOrderPayment.save and its post_save signal each saved the order."""
+        with transaction.atomic():
+            order = CustomerOrder.objects.get(order_id=payment_data['order_id'])
+            order.is_paid = True
+            order.save()
+            payment = create_payment_record(order, payment_data)
+            if payment.is_successful:
+                order.is_paid = True
+                order.next_payment_date = payment.created_at + timedelta(days=order.get_interval_days())
+                order.save()
+            webhook_res.processed = True
+            webhook_res.save()
+
+    def _run(self, label, record, deliveries):
+        latencies = []
+        query_counts = []
+        for payment_data, webhook_res in deliveries:
+            # an execute wrapper rather than CaptureQueriesContext, whose log is capped at 9000 queries
+            counter = QueryCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                record(payment_data, webhook_res)
+            latencies.append(time.perf_counter() - started)
+            query_counts.append(counter.count)
+        latencies.sort()
+        payments = CustomerOrderPayment.objects.filter(
+            orderid__in={payment_data['order_id'] for payment_data, _ in deliveries}
+        ).count()
+        self.stdout.write(
+            f"  {label:<14} {len(latencies) / sum(latencies):8.1f} deliveries/s  "
+            f"mean {statistics.mean(latencies) * 1000:6.2f} ms  "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:6.2f} ms  "
+            f"{statistics.mean(query_counts):4.1f} queries  {payments} payments stored"
+        )
+
+    def handle(self, *args, **options):
+        count = options['deliveries']
+        with transaction.atomic():
+            started = time.perf_counter()
+            deliveries = self._generate(count)
+            self.stdout.write(f"Generated {count} orders per path in {time.perf_counter() - started:.1f} s")
+
+            self.stdout.write(f"{count} deliveries plus {count} duplicates on {connection.vendor}:")
+            self._run("record_payment", record_payment, deliveries['record'])
+            self._run("save/signal", self._record_legacy, deliveries['legacy'])
+
+            transaction.set_rollback(True)
@@ -0,0 +1,7 @@
+from payment.exports import order_export
+from utils.export_utils import ExportCommand
+
+
+class Command(ExportCommand):
+    help = "Export all customer orders as csv, ndjson or xlsx"
+    dataset = order_export
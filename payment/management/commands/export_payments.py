@@ -0,0 +1,7 @@
+from payment.exports import payment_export
+from utils.export_utils import ExportCommand
+
+
+class Command(ExportCommand):
+    help = "Export all subscription payments as csv, ndjson or xlsx"
+    dataset = payment_export
@@ -0,0 +1,109 @@
+# Generated by Django 5.2 on 2026-10-19 16:20
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+# Fee.type values of 0001_initial -> the group the fee is charged to
+FEE_TYPE_GROUPS = {
+    'property owner': 'owner',
+    'customer': 'customer',
+    'broker': 'broker',
+}
+
+
+def fee_type_to_group(apps, schema_editor):
+    Fee = apps.get_model('payment', 'Fee')
+    Group = apps.get_model('auth', 'Group')
+    for fee in Fee.objects.all():
+        group, created = Group.objects.get_or_create(name=FEE_TYPE_GROUPS.get(fee.type, fee.type))
+        fee.group = group
+        fee.save(update_fields=['group'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('payment', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customerorder',
+            options={'verbose_name': 'Customer Order', 'verbose_name_plural': 'Customer Orders'},
+        ),
+        migrations.AlterModelOptions(
+            name='customerorderpayment',
+            options={'verbose_name': 'Payment', 'verbose_name_plural': 'Subscription Payments'},
+        ),
+        migrations.AlterModelOptions(
+            name='fee',
+            options={'verbose_name': 'Subscription', 'verbose_name_plural': 'Subscription Fee'},
+        ),
+        migrations.AlterModelOptions(
+            name='orderstaticconfig',
+            options={'verbose_name': 'Selcom Params', 'verbose_name_plural': 'Selcom Params'},
+        ),
+        migrations.AddField(
+            model_name='fee',
+            name='group',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='fees_group', to='auth.group'),
+        ),
+        migrations.RunPython(fee_type_to_group, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='fee',
+            name='type',
+        ),
+        migrations.AlterField(
+            model_name='fee',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='fees_group', to='auth.group'),
+        ),
+        migrations.AlterField(
+            model_name='customerorder',
+            name='message',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='customerorder',
+            name='payment_gateway_url',
+            field=models.CharField(blank=True, max_length=60, null=True),
+        ),
+        migrations.AlterModelTable(
+            name='customerorder',
+            table='customer_order',
+        ),
+        migrations.AlterModelTable(
+            name='customerorderpayment',
+            table='payment',
+        ),
+        migrations.AlterModelTable(
+            name='fee',
+            table='Fee',
+        ),
+        migrations.AlterModelTable(
+            name='orderstaticconfig',
+            table='order_static_config',
+        ),
+        migrations.CreateModel(
+            name='WebhookResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('response', models.TextField(unique=True)),
+                ('remote_ip', models.GenericIPAddressField()),
+                ('processed', models.BooleanField(default=False)),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who created this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, help_text='User who last updated this record', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
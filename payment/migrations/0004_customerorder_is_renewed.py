@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0003_croncheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerorder',
+            name='is_renewed',
+            field=models.BooleanField(default=False, help_text='Designates whether the next cycle order was created.'),
+        ),
+        migrations.AddIndex(
+            model_name='customerorder',
+            index=models.Index(condition=models.Q(('is_renewed', False)), fields=['next_payment_date', 'is_paid'], name='customer_order_due_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0004_customerorder_is_renewed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerorder',
+            name='reconciled_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the status was checked with the gateway.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='customerorder',
+            index=models.Index(condition=models.Q(('is_generated', True), ('is_paid', False)), fields=['updated_at'], name='customer_order_unpaid_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_customers(apps, schema_editor):
+    CustomerOrderPayment = apps.get_model('payment', 'CustomerOrderPayment')
+    CustomerOrder = apps.get_model('payment', 'CustomerOrder')
+    CustomerOrderPayment.objects.filter(customer__isnull=True).update(
+        customer_id=Subquery(CustomerOrder.objects.filter(pk=OuterRef('order_id')).values('customer_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0005_customerorder_reconciled_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerorderpayment',
+            name='customer',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_customers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customerorderpayment',
+            index=models.Index(fields=['customer', '-created_at'], name='payment_customer_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 16:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0007_customer_order_customer_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerorder',
+            index=models.Index(fields=['is_paid', '-created_at'], name='customer_order_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerorderpayment',
+            index=models.Index(fields=['payment_status', 'result', '-created_at'], name='payment_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerorderpayment',
+            index=models.Index(fields=['-created_at'], name='payment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookresponse',
+            index=models.Index(fields=['-created_at'], name='webhook_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookresponse',
+            index=models.Index(fields=['processed', '-created_at'], name='webhook_processed_created_idx'),
+        ),
+    ]
@@ -3,20 +3,49 @@ from datetime import timedelta
 
 from django.contrib.auth.models import Group
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 
 from utils.generators import generate_order_id
 
 
+PAYMENT_INTERVAL_DAYS = 30
+
+
 class OrderNumberGenerator(models.Model):
     last_number = models.PositiveBigIntegerField(default=0)
 
     @classmethod
     def get_next_number(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        obj.last_number += 1
-        obj.save()
-        return obj.last_number
+        return cls.reserve_numbers(1)[0]
+
+    @classmethod
+    def reserve_numbers(cls, count):
+        """
+        Reserve `count` consecutive order numbers with a single locked update.
+
+        Returns:
+            range: The reserved numbers.
+        """
+        with transaction.atomic():
+            obj, created = cls.objects.select_for_update().get_or_create(pk=1)
+            start = obj.last_number + 1
+            obj.last_number += count
+            obj.save(update_fields=['last_number'])
+        return range(start, start + count)
+
+
+class CronCheckpoint(models.Model):
+    """Progress marker that lets an interrupted batch job resume where it stopped."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}"
+
+    class Meta:
+        db_table = "cron_checkpoint"
 
 
 class AuditModel(models.Model):
@@ -107,6 +136,10 @@ class CustomerOrder(AuditModel):
     fee = models.ForeignKey(Fee, on_delete=models.RESTRICT, related_name='customer_fee')
     is_paid = models.BooleanField(default=False)
     is_generated = models.BooleanField(default=False)
+    is_renewed = models.BooleanField(default=False, help_text="Designates whether the next cycle order was created.")
+    reconciled_at = models.DateTimeField(
+        null=True, blank=True, help_text="Last time the status was checked with the gateway."
+    )
     last_payment_date = models.DateField()
     next_payment_date = models.DateField()
 
@@ -123,9 +156,14 @@ class CustomerOrder(AuditModel):
     def __str__(self):
         return f"{self.customer}"
 
+    def get_interval_days(self):
+        """Billing interval of this order's fee in days."""
+        from payment.registry import payment_config_registry
+        return payment_config_registry.get_fee_interval(self.fee_id)
+
     def save(self, *args, **kwargs):
         if self.last_payment_date:
-            self.next_payment_date = self.last_payment_date + timedelta(days=30)
+            self.next_payment_date = self.last_payment_date + timedelta(days=self.get_interval_days())
         if not self.order_id:
             self.order_id = generate_order_id()
         super(CustomerOrder, self).save(*args, **kwargs)
@@ -134,6 +172,18 @@ class CustomerOrder(AuditModel):
         db_table = "customer_order"
         verbose_name_plural = "Customer Orders"
         verbose_name = "Customer Order"
+        indexes = [
+            # renewal scheduler: orders due soon that have not been renewed yet
+            models.Index(
+                fields=['next_payment_date', 'is_paid'], name='customer_order_due_idx', condition=Q(is_renewed=False)
+            ),
+            models.Index(fields=['customer', '-created_at'], name='customer_order_customer_idx'),
+            models.Index(fields=['is_paid', '-created_at'], name='customer_order_paid_idx'),
+            # reconciliation: generated orders still waiting for a payment
+            models.Index(
+                fields=['updated_at'], name='customer_order_unpaid_idx', condition=Q(is_generated=True, is_paid=False)
+            ),
+        ]
 
 
 class CustomerOrderPayment(AuditModel):
@@ -149,6 +199,10 @@ class CustomerOrderPayment(AuditModel):
         ("FAIL", "FAIL"),
     )
     order = models.ForeignKey(CustomerOrder, on_delete=models.RESTRICT, related_name='order_payments')
+    # copy of order.customer so a customer's history is read from a single index
+    customer = models.ForeignKey(
+        'users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='payments', db_index=False
+    )
     result = models.CharField(max_length=20, choices=resulty_choices)
     resultcode = models.CharField(max_length=20)
     transid = models.CharField(max_length=50)
@@ -162,16 +216,20 @@ class CustomerOrderPayment(AuditModel):
     def __str__(self):
         return f"{self.order}"
 
-    def save(self, *args, **kwargs):
-        if self.order:
-            self.order.is_paid = True
-            self.order.save()
-        super(CustomerOrderPayment, self).save(*args, **kwargs)
+    @property
+    def is_successful(self):
+        return self.result == "SUCCESS" and self.payment_status == "COMPLETED"
 
     class Meta:
         db_table = "payment"
         verbose_name_plural = "Subscription Payments"
         verbose_name = "Payment"
+        indexes = [
+            models.Index(fields=['customer', '-created_at'], name='payment_customer_created_idx'),
+            # admin changelist filters
+            models.Index(fields=['payment_status', 'result', '-created_at'], name='payment_status_created_idx'),
+            models.Index(fields=['-created_at'], name='payment_created_idx'),
+        ]
 
 
 class WebhookResponse(AuditModel):
@@ -181,3 +239,9 @@ class WebhookResponse(AuditModel):
 
     def __str__(self):
         return f"{self.remote_ip}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='webhook_created_idx'),
+            models.Index(fields=['processed', '-created_at'], name='webhook_processed_created_idx'),
+        ]
@@ -0,0 +1,181 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from payment.actions import record_payment
+from payment.models import CustomerOrder
+from payment.registry import payment_config_registry
+from payment.serializer import PaymentResponseSerializer
+from utils.logger import AppLogger
+from utils.selcom_service import SelcomApiClient
+from utils.tracing import propagate_context, traced
+
+logger = AppLogger(__name__)
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls so no more than `rate` start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+def get_stale_unpaid_orders(stale_minutes, recheck_minutes):
+    """
+    Generated orders that are still unpaid `stale_minutes` after their last update
+    and have not been checked with the gateway in the last `recheck_minutes`.
+    """
+    now = timezone.now()
+    return (
+        CustomerOrder.objects.filter(
+            is_generated=True, is_paid=False, updated_at__lte=now - timedelta(minutes=stale_minutes)
+        )
+        .filter(Q(reconciled_at__isnull=True) | Q(reconciled_at__lte=now - timedelta(minutes=recheck_minutes)))
+        .order_by('updated_at')
+    )
+
+
+def build_payment_data(order_id, response, customer_phone=''):
+    """
+    Map an order-status response to the payload PaymentWebhookApiView receives, or None if unpaid.
+
+    The order-status data carries the payer's number as `msisdn`; the
+    customer's phone stands in when the gateway leaves it out.
+    """
+    if response.get('result') != "SUCCESS" or not response.get('data'):
+        return None
+    details = response['data'][0]
+    if str(details.get('payment_status', '')).upper() != "COMPLETED":
+        return None
+    return {
+        "result": "SUCCESS",
+        "resultcode": response.get('resultcode', ''),
+        "order_id": order_id,
+        "transid": details.get('transid'),
+        "reference": details.get('reference'),
+        "channel": details.get('channel'),
+        "amount": details.get('amount'),
+        "phone": details.get('msisdn') or details.get('phone') or customer_phone,
+        "payment_status": "COMPLETED",
+    }
+
+
+class PaymentReconciler:
+    """
+    Recover payments whose webhook never arrived.
+
+    Stale unpaid orders are read in batches through the partial unpaid index,
+    their status is fetched from the gateway by a thread pool throttled by a
+    RateLimiter, and completed payments are validated with
+    PaymentResponseSerializer and applied with record_payment(), exactly as
+    the webhook would have done. Database work stays on the calling thread.
+
+    The gateway client is injectable so the worker can run against a mock gateway.
+    """
+
+    def __init__(self, client=None, batch_size=None, max_workers=None, rate=None,
+                 stale_minutes=None, recheck_minutes=None):
+        self.client = client
+        self.batch_size = batch_size or getattr(settings, 'RECONCILIATION_BATCH_SIZE', 200)
+        self.max_workers = max_workers or getattr(settings, 'RECONCILIATION_MAX_WORKERS', 4)
+        self.rate_limiter = RateLimiter(rate or getattr(settings, 'RECONCILIATION_RATE_LIMIT', 5))
+        self.stale_minutes = stale_minutes or getattr(settings, 'RECONCILIATION_STALE_MINUTES', 30)
+        self.recheck_minutes = recheck_minutes or getattr(settings, 'RECONCILIATION_RECHECK_MINUTES', 60)
+
+    def _fetch_status(self, order_id):
+        self.rate_limiter.wait()
+        try:
+            return self.client.get_order_status(order_id)
+        except Exception as ex:
+            logger.error(f"❌ Order status request failed for {order_id}: {ex}")
+            return None
+
+    def _apply(self, order_id, response, metrics, customer_phone=''):
+        if response is None:
+            metrics['errors'] += 1
+            return False
+        payment_data = build_payment_data(order_id, response, customer_phone)
+        if payment_data is None:
+            metrics['pending'] += 1
+            return False
+
+        serializer = PaymentResponseSerializer(data=payment_data)
+        if not serializer.is_valid():
+            logger.error(f"❌ Invalid order status data for {order_id}: {serializer.errors}")
+            metrics['errors'] += 1
+            return False
+        _, created = record_payment(serializer.validated_data)
+        if created:
+            metrics['recovered'] += 1
+        return created
+
+    @traced('payment.reconcile_payments')
+    def run(self):
+        """
+        Reconcile every stale unpaid order once.
+
+        Returns:
+            dict: checked/recovered/pending/errors counts, duration, throughput
+            (orders per second) and max/avg lag in seconds between the order's
+            last update and the recovery of its payment.
+        """
+        if self.client is None:
+            static_conf = payment_config_registry.get_static_config()
+            if static_conf is None:
+                logger.info(f"Static configuration not found")
+                return None
+            self.client = SelcomApiClient(static_conf)
+
+        metrics = {'checked': 0, 'recovered': 0, 'pending': 0, 'errors': 0}
+        lags = []
+        started = time.monotonic()
+        run_started_at = timezone.now()
+        last_seen_id = 0
+        stale_orders = get_stale_unpaid_orders(self.stale_minutes, self.recheck_minutes)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='reconciliation') as executor:
+            while True:
+                batch = list(stale_orders.filter(id__gt=last_seen_id).order_by('id').values(
+                    'id', 'order_id', 'updated_at', 'customer__phone'
+                )[:self.batch_size])
+                if not batch:
+                    break
+                last_seen_id = batch[-1]['id']
+
+                responses = executor.map(propagate_context(self._fetch_status), [order['order_id'] for order in batch])
+                for order, response in zip(batch, responses):
+                    if self._apply(order['order_id'], response, metrics, order['customer__phone']):
+                        lags.append((timezone.now() - order['updated_at']).total_seconds())
+
+                CustomerOrder.objects.filter(id__in=[order['id'] for order in batch]).update(
+                    reconciled_at=run_started_at
+                )
+                metrics['checked'] += len(batch)
+
+        duration = time.monotonic() - started
+        metrics['duration'] = round(duration, 3)
+        metrics['throughput'] = round(metrics['checked'] / duration, 2) if duration else 0.0
+        metrics['max_lag'] = round(max(lags), 1) if lags else 0.0
+        metrics['avg_lag'] = round(sum(lags) / len(lags), 1) if lags else 0.0
+        logger.info(f"✅ Payment reconciliation finished: {metrics}")
+        return metrics
+
+
+def reconcile_payments(client=None, **options):
+    """Run a PaymentReconciler with settings defaults; see PaymentReconciler.run."""
+    return PaymentReconciler(client=client, **options).run()
@@ -0,0 +1,142 @@
+import threading
+import time
+from dataclasses import dataclass, fields
+from decimal import Decimal
+
+from django.conf import settings
+
+from payment.models import OrderStaticConfig, Fee, PAYMENT_INTERVAL_DAYS
+from utils.cache_utils import get_cache_versions, bump_cache_version
+from utils.logger import AppLogger
+
+logger = AppLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StaticConfigSnapshot:
+    """Immutable copy of the active OrderStaticConfig, safe to share between requests and threads."""
+    id: int
+    vendor_till: str
+    remark: str
+    country: str
+    city: str
+    state_or_region: str
+    currency: str
+    payment_methods: str
+    no_of_items: int
+    api_key: str
+    secrets_key: str
+    base_url: str
+    webhook_url: str
+    callback_url: str
+    redirect_url: str
+    cancel_url: str
+    order_path: str
+
+    @classmethod
+    def from_values(cls, values):
+        return cls(**{field.name: values[field.name] for field in fields(cls)})
+
+
+@dataclass(frozen=True)
+class FeeSnapshot:
+    """Immutable copy of a Fee row."""
+    id: int
+    amount: Decimal
+    group_id: int
+    interval: int
+    active: bool
+
+    @classmethod
+    def from_values(cls, values):
+        return cls(**{field.name: values[field.name] for field in fields(cls)})
+
+
+@dataclass(frozen=True)
+class _RegistryState:
+    version: int
+    static_config: StaticConfigSnapshot
+    fees_by_group: dict
+    fees_by_id: dict
+
+
+class PaymentConfigRegistry:
+    """
+    Process-wide cache of the active payment configuration and the subscription fees.
+
+    Everything is loaded in two queries and handed out as immutable snapshots.
+    post_save/post_delete on OrderStaticConfig and Fee call invalidate(), which
+    bumps a version in the shared cache (CACHE_URL); other processes notice the
+    new version the next time they check it, at most every `check_interval`
+    seconds. Without a shared cache the version of another process cannot be
+    seen, so the registry then reloads every `check_interval` seconds instead.
+    """
+    VERSION_NAME = 'payment-config'
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._state = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, version):
+        logger.info("🔥 Loading payment configuration and fees")
+        config = OrderStaticConfig.objects.filter(active=True).order_by('pk').values().first()
+        fees_by_group = {}
+        fees_by_id = {}
+        # the first fee (lowest pk) of each group wins, as Fee.objects.filter(group=group).first() did
+        for fee in Fee.objects.order_by('pk').values('id', 'amount', 'group_id', 'interval', 'active'):
+            snapshot = FeeSnapshot.from_values(fee)
+            fees_by_id[snapshot.id] = snapshot
+            fees_by_group.setdefault(snapshot.group_id, snapshot)
+        return _RegistryState(
+            version=version,
+            static_config=StaticConfigSnapshot.from_values(config) if config else None,
+            fees_by_group=fees_by_group,
+            fees_by_id=fees_by_id,
+        )
+
+    def _current(self):
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now - self._checked_at < self.check_interval:
+            return state
+
+        if getattr(settings, 'CACHE_URL', ''):
+            version, = get_cache_versions(self.VERSION_NAME)
+        else:
+            version = None
+        if state is None or version is None or state.version != version:
+            with self._lock:
+                state = self._state
+                if state is None or version is None or state.version != version:
+                    state = self._load(version)
+                    self._state = state
+        self._checked_at = now
+        return state
+
+    def get_static_config(self):
+        """Return the active StaticConfigSnapshot, or None if no configuration is active."""
+        return self._current().static_config
+
+    def get_group_fee(self, group_id):
+        """Return the FeeSnapshot for a group id, or None if the group has no fee."""
+        return self._current().fees_by_group.get(group_id)
+
+    def get_fee(self, fee_id):
+        """Return the FeeSnapshot with the given id, or None if it does not exist."""
+        return self._current().fees_by_id.get(fee_id)
+
+    def get_fee_interval(self, fee_id):
+        """Return the billing interval in days of a fee, falling back to PAYMENT_INTERVAL_DAYS."""
+        fee = self.get_fee(fee_id)
+        return fee.interval if fee else PAYMENT_INTERVAL_DAYS
+
+    def invalidate(self):
+        bump_cache_version(self.VERSION_NAME)
+        self._state = None
+
+
+payment_config_registry = PaymentConfigRegistry(
+    check_interval=getattr(settings, 'PAYMENT_CONFIG_CHECK_INTERVAL', 30)
+)
@@ -1,21 +1,40 @@
-from payment.models import OrderStaticConfig, Fee, CustomerOrder
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from payment.models import CustomerOrder, CustomerOrderPayment
+from payment.registry import payment_config_registry
+from utils.db_router import get_read_db
 from utils.logger import AppLogger
+from utils.tracing import traced
 
 logger = AppLogger(__name__)
 
+# columns read by CustomerOrderSerializer
+CUSTOMER_ORDER_FIELDS = (
+    'id', 'order_id', 'last_payment_date', 'next_payment_date', 'created_at', 'is_paid', 'is_generated',
+    'payment_gateway_url', 'reference', 'result', 'fee__amount', 'fee__interval',
+)
+PAYMENT_HISTORY_FIELDS = (
+    'id', 'uuid', 'orderid', 'transid', 'reference', 'channel', 'amount', 'result', 'payment_status', 'created_at'
+)
 
+
+@traced()
 def get_current_static_config():
-    static_config = OrderStaticConfig.objects.filter(active=True)
-    if not static_config.exists():
-        return None
-    return static_config.first()
+    """Return a snapshot of the active payment configuration, or None if there is none."""
+    return payment_config_registry.get_static_config()
 
 
+@traced()
 def get_group_fee(group):
-    get_fee = Fee.objects.filter(group=group)
-    if not get_fee.exists():
+    """Return a snapshot of the subscription fee of a group, or None if the group has no fee."""
+    if group is None:
         return None
-    return get_fee.first()
+    return payment_config_registry.get_group_fee(group.pk)
 
 
 def get_customer_order(order_id):
@@ -32,3 +51,56 @@ def get_customer_order(order_id):
 def get_orders_url_not_generate():
     """Get all order where url is null and is not generated."""
     return CustomerOrder.objects.filter(is_generated=False, message__isnull=True)
+
+
+def get_customer_orders(customer):
+    """Orders of a customer, newest first, with the fee joined and only the serialized columns loaded."""
+    return (
+        CustomerOrder.objects.using(get_read_db()).filter(customer=customer)
+        .select_related('fee')
+        .only(*CUSTOMER_ORDER_FIELDS)
+        .order_by('-created_at', '-id')
+    )
+
+
+def get_customer_order_summary(customer):
+    """
+    Outstanding amount, number of unpaid orders and next due date of a customer in one aggregate query.
+
+    The next due date is the earliest next_payment_date among orders whose next
+    cycle has not been created yet.
+    """
+    unpaid = Q(is_paid=False)
+    return CustomerOrder.objects.using(get_read_db()).filter(customer=customer).aggregate(
+        outstanding_amount=Coalesce(Sum('fee__amount', filter=unpaid), Value(Decimal('0.00'))),
+        unpaid_orders=Count('id', filter=unpaid),
+        next_due_date=Min('next_payment_date', filter=Q(is_renewed=False)),
+    )
+
+
+def get_customer_payments(customer, order_id=None, date_from=None, date_to=None, payment_status=None):
+    """
+    Payment history of a customer, newest first, read through the (customer, created_at) index.
+
+    Args:
+        customer: User whose payments are returned
+        order_id (str): Only payments of this gateway order id
+        date_from (date): Only payments made on or after this day
+        date_to (date): Only payments made on or before this day
+        payment_status (str): Only payments with this status, e.g. COMPLETED
+    """
+    payments = CustomerOrderPayment.objects.using(get_read_db()).filter(customer=customer).only(*PAYMENT_HISTORY_FIELDS)
+    if order_id:
+        payments = payments.filter(orderid=order_id)
+    if date_from:
+        payments = payments.filter(created_at__gte=_start_of_day(date_from))
+    if date_to:
+        payments = payments.filter(created_at__lt=_start_of_day(date_to + timedelta(days=1)))
+    if payment_status:
+        payments = payments.filter(payment_status=payment_status.upper())
+    return payments.order_by('-created_at', '-id')
+
+
+def _start_of_day(day):
+    # compare against datetimes so the created_at index can be used
+    return timezone.make_aware(datetime.combine(day, time.min))
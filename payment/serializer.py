@@ -20,6 +20,7 @@ class PaymentResponseSerializer(serializers.Serializer):
     channel = serializers.CharField(max_length=20)
     amount = serializers.CharField(max_length=20)
     phone = serializers.CharField(max_length=20)
+    payment_status = serializers.CharField(max_length=20, required=False)
 
     def validate_amount(self, value):
         """
@@ -43,6 +44,25 @@ class PaymentLogsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class PaymentHistorySerializer(serializers.ModelSerializer):
+    """Lean payment representation for the customer payment history."""
+    order_id = serializers.CharField(source='orderid')
+
+    class Meta:
+        model = CustomerOrderPayment
+        fields = (
+            'uuid',
+            'order_id',
+            'transid',
+            'reference',
+            'channel',
+            'amount',
+            'result',
+            'payment_status',
+            'created_at',
+        )
+
+
 class CustomerOrderSerializer(serializers.ModelSerializer):
     """
     Serializer for the CustomerOrder model.
@@ -1,10 +1,10 @@
-from datetime import timedelta
-
-from django.db.models.signals import post_save, m2m_changed
+from django.db import transaction
+from django.db.models.signals import post_save, m2m_changed, post_delete
 from django.dispatch import receiver
 
 from payment.actions import generate_order_action
-from payment.models import CustomerOrderPayment
+from payment.models import OrderStaticConfig, Fee
+from payment.registry import payment_config_registry
 from users.models import User
 from utils.logger import AppLogger
 
@@ -17,15 +17,10 @@ def create_user_order_on_group_add(sender, instance, action, **kwargs):
         generate_order_action(instance)
 
 
-@receiver(post_save, sender=CustomerOrderPayment)
-def update_customer_order_on_payment(sender, instance, created, **kwargs):
-    if created:
-        logger.info(f"Customer order payment created for {instance}")
-        if instance.order:
-            if instance.payment_status == "COMPLETED" and instance.result == "SUCCESS":
-                logger.info(f"Payment completed for order {instance.order.order_id}")
-                instance.order.is_paid = True
-                instance.order.next_payment_date = instance.created_at + timedelta(days=30)
-                instance.order.save()
-        else:
-            logger.error(f"Payment saved successfully but order is not updated")
+@receiver(post_save, sender=OrderStaticConfig)
+@receiver(post_delete, sender=OrderStaticConfig)
+@receiver(post_save, sender=Fee)
+@receiver(post_delete, sender=Fee)
+def refresh_payment_config(sender, **kwargs):
+    # after commit, or another process could reload the old rows under the new version and keep them
+    transaction.on_commit(payment_config_registry.invalidate)
@@ -1,3 +1,908 @@
-from django.test import TestCase
+import asyncio
+import base64
+import contextvars
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, \
+    override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from payment.actions import bulk_generate_orders, generate_order_action, ORDER_GENERATION_CHECKPOINT, \
+    renew_due_subscriptions, record_payment
+from payment.admin import CustomerOrderPaymentAdmin
+from payment.exports import payment_export
+from payment.models import CustomerOrder, CustomerOrderPayment, Fee, OrderStaticConfig
+from payment.registry import PaymentConfigRegistry, payment_config_registry
+from payment.reconciliation import reconcile_payments
+from payment.selectors import get_customer_order_summary, get_customer_orders
+from payment.serializer import CustomerOrderSerializer, PaymentHistorySerializer
+from users.authentication import get_token_for_user
+from users.models import User
+from utils.admin_utils import EstimatedCountPaginator
+from utils.export_utils import export_response
+from utils.locks import run_lock
+from prometheus_client.mmap_dict import MmapedDict
+from utils.metrics import QueryCounter, add_request_query_wrapper, fold_cron_samples, remove_request_query_wrapper
+from utils.selcom_service import SelcomApiClient
+from utils.tracing import CLIENT, SERVER, TRACE_ID_HEADER, OTLPSpanExporter, TracingMiddleware, current_span, \
+    end_root_span, propagate_context, start_root_span, start_span, trace_job, traced
+
+
+def create_payment_config(group_name='customer', amount=10000):
+    # the registry is invalidated on commit, which a TestCase only emulates
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        config = OrderStaticConfig.objects.create(
+            vendor_till='TILL001', currency='TZS', payment_methods='ALL', api_key='key', secrets_key='secret',
+            base_url='https://gateway.test', webhook_url='https://app.test/webhook',
+            callback_url='https://app.test/callback', redirect_url='https://app.test/redirect',
+            cancel_url='https://app.test/cancel', order_path='/v1/checkout/create-order-minimal', active=True,
+        )
+        group, _ = Group.objects.get_or_create(name=group_name)
+        fee = Fee.objects.create(amount=amount, group=group, interval=30, active=True)
+    return config, fee
+
+
+def create_customers(count, group_name='customer'):
+    """Users in the group, added without the m2m signal that would generate their orders."""
+    users = User.objects.bulk_create([
+        User(username=f"customer{index}", phone=f"+2557{index:08d}", password='!') for index in range(count)
+    ])
+    group = Group.objects.get(name=group_name)
+    User.groups.through.objects.bulk_create([User.groups.through(user_id=user.pk, group_id=group.pk) for user in users])
+    return users
+
+
+class OrderGenerationTests(TestCase):
+    def setUp(self):
+        self.config, self.fee = create_payment_config()
+
+    def test_generates_one_order_per_user(self):
+        create_customers(5)
+        self.assertEqual(bulk_generate_orders(chunk_size=2), 5)
+        self.assertEqual(bulk_generate_orders(chunk_size=2), 0)
+        self.assertEqual(CustomerOrder.objects.filter(fee=self.fee).count(), 5)
+
+    def test_overlapping_run_does_nothing(self):
+        create_customers(5)
+        with run_lock(ORDER_GENERATION_CHECKPOINT) as acquired:
+            self.assertTrue(acquired)
+            self.assertEqual(bulk_generate_orders(), 0)
+        self.assertFalse(CustomerOrder.objects.exists())
+        self.assertEqual(bulk_generate_orders(), 5)
+
+
+def config_queries(queries):
+    return [query['sql'] for query in queries if '"order_static_config"' in query['sql'] or '"Fee"' in query['sql']]
+
+
+class PaymentConfigRegistryTests(TestCase):
+    def setUp(self):
+        self.config, self.fee = create_payment_config()
+
+    def test_orders_are_generated_without_config_queries_once_warm(self):
+        payment_config_registry.get_static_config()
+        create_customers(20)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(bulk_generate_orders(chunk_size=5), 20)
+        self.assertEqual(config_queries(queries), [])
+
+        user = User.objects.create(username='joiner', phone='+255788888888', password='!')
+        user.groups.add(self.fee.group)
+        CustomerOrder.objects.filter(customer=user).delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNotNone(generate_order_action(user))
+        self.assertEqual(config_queries(queries), [])
+
+    @override_settings(CACHE_URL='redis://cache.test:6379/0')
+    def test_a_committed_fee_change_reaches_other_processes(self):
+        # a second registry stands in for another worker; it only notices changes through the shared version
+        other = PaymentConfigRegistry(check_interval=0)
+        self.assertEqual(other.get_group_fee(self.fee.group_id).amount, 10000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fee.amount = 15000
+            self.fee.save()
+            self.assertEqual(other.get_group_fee(self.fee.group_id).amount, 10000)
+        self.assertEqual(other.get_group_fee(self.fee.group_id).amount, 15000)
+        self.assertEqual(payment_config_registry.get_group_fee(self.fee.group_id).amount, 15000)
+
+
+class RenewalTests(TestCase):
+    def setUp(self):
+        self.config, self.fee = create_payment_config()
+        self.customer, = create_customers(1)
+
+    def create_order(self, next_payment_date, is_paid=True):
+        return CustomerOrder.objects.create(
+            customer=self.customer, fee=self.fee, static_conf=self.config, is_paid=is_paid,
+            last_payment_date=next_payment_date - timedelta(days=30), next_payment_date=next_payment_date,
+        )
+
+    def test_renews_paid_orders_falling_due_once(self):
+        today = timezone.localdate()
+        due = self.create_order(today + timedelta(days=1))
+        self.create_order(today + timedelta(days=20))
+        self.create_order(today, is_paid=False)
+
+        self.assertEqual(renew_due_subscriptions(window_days=3), 1)
+        self.assertEqual(renew_due_subscriptions(window_days=3), 0)
+
+        due.refresh_from_db()
+        self.assertTrue(due.is_renewed)
+        renewal = CustomerOrder.objects.get(customer=self.customer, last_payment_date=due.next_payment_date)
+        self.assertFalse(renewal.is_paid)
+        self.assertEqual(renewal.next_payment_date, due.next_payment_date + timedelta(days=self.fee.interval))
+
+
+def payment_data(order, transid='TX1001', **overrides):
+    return {
+        'result': 'SUCCESS', 'resultcode': '000', 'order_id': order.order_id, 'transid': transid,
+        'reference': 'REF1001', 'channel': 'AIRTELMONEY', 'amount': '10000', 'phone': '255711111111',
+        'payment_status': 'COMPLETED', **overrides,
+    }
+
+
+class RecordPaymentTests(TestCase):
+    def setUp(self):
+        self.config, self.fee = create_payment_config()
+        self.customer, = create_customers(1)
+        self.order = CustomerOrder.objects.create(
+            customer=self.customer, fee=self.fee, static_conf=self.config,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+
+    def test_successful_payment_marks_the_order_paid(self):
+        order, created = record_payment(payment_data(self.order))
+        self.assertTrue(created)
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_paid)
+        self.assertEqual(self.order.next_payment_date, timezone.localdate() + timedelta(days=self.fee.interval))
+        self.assertEqual(CustomerOrderPayment.objects.get().customer, self.customer)
+
+    def test_failed_payment_leaves_the_order_unpaid(self):
+        record_payment(payment_data(self.order, result='FAIL', payment_status='CANCELLED'))
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+
+    def test_duplicate_delivery_is_recorded_once(self):
+        self.assertTrue(record_payment(payment_data(self.order))[1])
+        self.assertFalse(record_payment(payment_data(self.order))[1])
+        self.assertEqual(CustomerOrderPayment.objects.count(), 1)
+
+    def test_admin_payment_marks_the_order_paid(self):
+        admin_user = User.objects.create_superuser(username='admin', phone='+255799999999', password='x')
+        self.client.force_login(admin_user)
+        form = {
+            'order': self.order.pk, 'result': 'SUCCESS', 'resultcode': '000', 'transid': 'TX2001',
+            'reference': 'REF2001', 'channel': 'CASH', 'amount': '10000', 'phone': '255711111111',
+            'payment_status': 'COMPLETED', 'orderid': self.order.order_id,
+        }
+        url = reverse('admin:payment_customerorderpayment_add')
+        self.assertEqual(self.client.post(url, form).status_code, 302)
+        self.assertEqual(self.client.post(url, form).status_code, 302)
+
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_paid)
+        payment = CustomerOrderPayment.objects.get()
+        self.assertEqual((payment.transid, payment.customer), ('TX2001', self.customer))
+
+
+class PaymentExportTests(TestCase):
+    def setUp(self):
+        config, fee = create_payment_config()
+        customer, = create_customers(1)
+        self.order = CustomerOrder.objects.create(
+            customer=customer, fee=fee, static_conf=config,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+        for index in range(3):
+            record_payment(payment_data(self.order, transid=f"TX40{index}"))
+
+    def test_csv_and_ndjson_are_streamed_row_by_row(self):
+        response = export_response(payment_export, 'csv', 'transid,amount,order__customer__username')
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['transid', 'amount', 'order__customer__username'])
+        self.assertEqual([row[0] for row in rows[1:]], ['TX400', 'TX401', 'TX402'])
+
+        response = export_response(payment_export, 'ndjson', 'transid,payment_status')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0]), {'transid': 'TX400', 'payment_status': 'COMPLETED'})
+        self.assertEqual(len(lines), 3)
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        response = export_response(payment_export, 'xlsx', 'transid,created_at')
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0], ('transid', 'created_at'))
+        self.assertEqual(len(rows), 4)
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            export_response(payment_export, 'csv', 'transid,secrets_key')
+
+
+class CustomerOrderSelectorTests(TestCase):
+    def setUp(self):
+        config, self.fee = create_payment_config(amount=15000)
+        self.customer, other = create_customers(2)
+        today = timezone.localdate()
+        # next_payment_date is last_payment_date plus the 30 day interval
+        self.orders = [
+            CustomerOrder.objects.create(
+                customer=self.customer, fee=self.fee, static_conf=config, is_paid=index < 2, is_renewed=index == 0,
+                last_payment_date=today - timedelta(days=40 - index), next_payment_date=today,
+            )
+            for index in range(5)
+        ]
+        CustomerOrder.objects.create(
+            customer=other, fee=self.fee, static_conf=config, last_payment_date=today, next_payment_date=today,
+        )
+
+    def test_orders_are_listed_newest_first_page_by_page(self):
+        headers = {'Authorization': f"Bearer {get_token_for_user(self.customer).access_token}"}
+        body = self.client.get('/payment/my-order', {'page_size': 3, 'summary': 'true'}, headers=headers).json()
+        self.assertEqual(body['total_item'], 3)
+        self.assertEqual(body['summary']['unpaid_orders'], 3)
+        order_ids = [order['order_id'] for order in body['data']]
+        body = self.client.get(body['next'], headers=headers).json()
+        order_ids += [order['order_id'] for order in body['data']]
+        self.assertIsNone(body['next'])
+        self.assertEqual(order_ids, [order.order_id for order in reversed(self.orders)])
+
+    def test_serializing_orders_loads_no_deferred_fields(self):
+        with self.assertNumQueries(1):
+            data = CustomerOrderSerializer(list(get_customer_orders(self.customer)), many=True).data
+        self.assertEqual(len(data), 5)
+        self.assertEqual((data[0]['amount'], data[0]['interval']), ('15,000.00', 30))
+        self.assertEqual(set(data[0]), set(CustomerOrderSerializer.Meta.fields))
+
+    def test_summary_is_a_single_aggregate(self):
+        with self.assertNumQueries(1):
+            summary = get_customer_order_summary(self.customer)
+        self.assertEqual(summary, {
+            'outstanding_amount': 3 * self.fee.amount,
+            'unpaid_orders': 3,
+            'next_due_date': self.orders[1].next_payment_date,
+        })
+
+
+class PaymentHistoryTests(TestCase):
+    def setUp(self):
+        config, fee = create_payment_config()
+        self.customer, other = create_customers(2)
+        order = CustomerOrder.objects.create(
+            customer=self.customer, fee=fee, static_conf=config,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+        other_order = CustomerOrder.objects.create(
+            customer=other, fee=fee, static_conf=config,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+        record_payment(payment_data(other_order, transid='TX699'))
+        # one payment a day, TX600 four days ago and the cancelled TX604 today
+        for index in range(5):
+            overrides = {'result': 'FAIL', 'payment_status': 'CANCELLED'} if index == 4 else {}
+            record_payment(payment_data(order, transid=f"TX60{index}", **overrides))
+            CustomerOrderPayment.objects.filter(transid=f"TX60{index}").update(
+                created_at=timezone.now() - timedelta(days=4 - index)
+            )
+        self.headers = {'Authorization': f"Bearer {get_token_for_user(self.customer).access_token}"}
+
+    def get(self, url='/payment/payment-history', params=None):
+        response = self.client.get(url, params, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_follow_the_cursor_newest_first(self):
+        body = self.get(params={'page_size': 2})
+        pages = [[payment['transid'] for payment in body['data']]]
+        while body['next']:
+            body = self.get(body['next'])
+            pages.append([payment['transid'] for payment in body['data']])
+        self.assertEqual(pages, [['TX604', 'TX603'], ['TX602', 'TX601'], ['TX600']])
+        self.assertIsNotNone(body['previous'])
+
+    def test_date_and_status_filters(self):
+        today = timezone.localdate()
+        body = self.get(params={
+            'date_from': (today - timedelta(days=3)).isoformat(), 'date_to': (today - timedelta(days=2)).isoformat()
+        })
+        self.assertEqual([payment['transid'] for payment in body['data']], ['TX602', 'TX601'])
+
+        body = self.get(params={'status': 'cancelled'})
+        self.assertEqual([payment['transid'] for payment in body['data']], ['TX604'])
+
+        response = self.client.get('/payment/payment-history', {'date_from': '2026-13-01'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_the_serialized_fields_are_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            body = self.get()
+        self.assertEqual(set(body['data'][0]), set(PaymentHistorySerializer.Meta.fields))
+
+        # one query for the page and no per-row loads of deferred fields
+        payment_queries = [query['sql'] for query in queries if 'FROM "payment"' in query['sql']]
+        self.assertEqual(len(payment_queries), 1)
+        self.assertNotIn('"payment"."phone"', payment_queries[0])
+        self.assertNotIn('"payment"."resultcode"', payment_queries[0])
+
+
+class PaymentAdminTests(TestCase):
+    def setUp(self):
+        self.config, self.fee = create_payment_config()
+        self.admin_user = User.objects.create_superuser(username='admin', phone='+255799999999', password='x')
+        self.client.force_login(self.admin_user)
+        self.url = reverse('admin:payment_customerorderpayment_changelist')
+
+    def create_payments(self, customers):
+        for customer in customers:
+            order = CustomerOrder.objects.create(
+                customer=customer, fee=self.fee, static_conf=self.config,
+                last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+            )
+            record_payment(payment_data(order, transid=f"TX-{customer.username}"))
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelist_queries_do_not_grow_with_the_rows(self):
+        customers = create_customers(6)
+        self.create_payments(customers[:2])
+        response, first = self.changelist_queries()
+        self.assertIsInstance(response.context['cl'].paginator, EstimatedCountPaginator)
+        self.create_payments(customers[2:])
+        response, second = self.changelist_queries()
+        self.assertEqual(response.context['cl'].result_count, 6)
+        self.assertEqual(second, first)
+
+        # joining only the order, every row's __str__ loads its customer
+        with mock.patch.object(CustomerOrderPaymentAdmin, 'list_select_related', ('order',)):
+            _, unjoined = self.changelist_queries()
+        self.assertEqual(unjoined, first + 6)
+
+    def test_export_actions(self):
+        from openpyxl import load_workbook
+
+        self.create_payments(create_customers(3))
+        selected = list(CustomerOrderPayment.objects.exclude(transid='TX-customer1').values_list('pk', flat=True))
+
+        response = self.client.post(self.url, {'action': 'export_as_csv', '_selected_action': selected})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], list(CustomerOrderPaymentAdmin.export_fields))
+        self.assertEqual([row[2] for row in rows[1:]], ['TX-customer0', 'TX-customer2'])
+
+        response = self.client.post(self.url, {'action': 'export_as_xlsx', '_selected_action': selected})
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0], CustomerOrderPaymentAdmin.export_fields)
+        self.assertEqual([row[1] for row in rows[1:]], ['customer0', 'customer2'])
+
+    def test_export_action_is_an_async_stream_under_asgi(self):
+        self.create_payments(create_customers(2))
+        selected = list(CustomerOrderPayment.objects.values_list('pk', flat=True))
+
+        async def export():
+            client = AsyncClient()
+            await client.aforce_login(self.admin_user)
+            response = await client.post(self.url, {'action': 'export_as_csv', '_selected_action': selected})
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        response, content = async_to_sync(export)()
+
+        self.assertTrue(response.is_async)
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual([row[2] for row in rows[1:]], ['TX-customer0', 'TX-customer1'])
+
+
+class ConcurrentWebhookTests(TransactionTestCase):
+    def test_concurrent_duplicate_deliveries_are_recorded_once(self):
+        config, fee = create_payment_config()
+        customer, = create_customers(1)
+        order = CustomerOrder.objects.create(
+            customer=customer, fee=fee, static_conf=config,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+        start = threading.Barrier(2)
+        results = []
+
+        def deliver():
+            try:
+                start.wait()
+                results.append(record_payment(payment_data(order))[1])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=deliver) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [False, True])
+        self.assertEqual(CustomerOrderPayment.objects.filter(order=order).count(), 1)
+
+
+class MockGatewayHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for Selcom.
+
+    The order-status endpoint answers from `orders` (order_id -> data[0], completed
+    orders only); create-order accepts every order after `latency` seconds.
+    """
+    orders = {}
+    latency = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        order_id = parse_qs(url.query)['order_id'][0]
+        details = self.orders.get(order_id)
+        if url.path != SelcomApiClient.order_status_path:
+            body = {'result': 'FAIL', 'resultcode': '404', 'data': []}
+        elif details is None:
+            pending = {'order_id': order_id, 'payment_status': 'PENDING'}
+            body = {'result': 'SUCCESS', 'resultcode': '000', 'data': [pending]}
+        else:
+            body = {'result': 'SUCCESS', 'resultcode': '000', 'data': [details]}
+        self.send_json(body)
+
+    def do_POST(self):
+        order = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        self.send_json({
+            'result': 'SUCCESS', 'resultcode': '000', 'message': 'Order creation successful',
+            'reference': f"REF-{order['order_id']}",
+            'data': [{
+                'gateway_buyer_uuid': f"buyer-{order['order_id']}", 'payment_token': order['order_id'][-8:],
+                'payment_gateway_url': base64.b64encode(f"https://pay.test/{order['order_id']}".encode()).decode(),
+            }],
+        })
+
+    def send_json(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.config, self.fee = create_payment_config()
+        self.gateway = ThreadingHTTPServer(('127.0.0.1', 0), MockGatewayHandler)
+        threading.Thread(target=self.gateway.serve_forever, daemon=True).start()
+        self.addCleanup(self.gateway.server_close)
+        self.addCleanup(self.gateway.shutdown)
+        self.config.base_url = f"http://127.0.0.1:{self.gateway.server_port}"
+        self.client_under_test = SelcomApiClient(self.config)
+
+    def create_stale_orders(self, count):
+        orders = [
+            CustomerOrder.objects.create(
+                customer=customer, fee=self.fee, static_conf=self.config, is_generated=True,
+                last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+            )
+            for customer in create_customers(count)
+        ]
+        CustomerOrder.objects.update(updated_at=timezone.now() - timedelta(hours=2))
+        return orders
+
+    def test_recovers_completed_payments_from_the_gateway(self):
+        paid, with_msisdn, pending = self.create_stale_orders(3)
+        MockGatewayHandler.orders = {
+            paid.order_id: {
+                'order_id': paid.order_id, 'transid': 'TX3001', 'reference': 'REF3001', 'channel': 'MPESA',
+                'amount': '10000', 'payment_status': 'COMPLETED',
+            },
+            with_msisdn.order_id: {
+                'order_id': with_msisdn.order_id, 'transid': 'TX3002', 'reference': 'REF3002', 'channel': 'TIGOPESA',
+                'amount': '10000', 'payment_status': 'COMPLETED', 'msisdn': '255755555555',
+            },
+        }
+
+        metrics = reconcile_payments(client=self.client_under_test, batch_size=2, rate=1000)
+
+        self.assertEqual(
+            {key: metrics[key] for key in ('checked', 'recovered', 'pending', 'errors')},
+            {'checked': 3, 'recovered': 2, 'pending': 1, 'errors': 0},
+        )
+        self.assertGreater(metrics['throughput'], 0)
+        self.assertGreaterEqual(metrics['max_lag'], 2 * 60 * 60)
+        self.assertEqual(
+            dict(CustomerOrderPayment.objects.values_list('transid', 'phone')),
+            {'TX3001': paid.customer.phone, 'TX3002': '255755555555'},
+        )
+        self.assertEqual(set(CustomerOrder.objects.filter(is_paid=True)), {paid, with_msisdn})
+        self.assertFalse(CustomerOrder.objects.filter(reconciled_at__isnull=True).exists())
+
+        # checked orders are left alone until the recheck interval passes
+        self.assertEqual(reconcile_payments(client=self.client_under_test, rate=1000)['checked'], 0)
+
+
+class RequestQueryWrapperTests(TestCase):
+    def test_interleaved_requests_count_only_their_own_queries(self):
+        # two ASGI requests share the thread and connection, each runs in its own context
+        first, second = QueryCounter(), QueryCounter()
+        first_context, second_context = contextvars.copy_context(), contextvars.copy_context()
+        first_context.run(add_request_query_wrapper, first)
+        second_context.run(add_request_query_wrapper, second)
+
+        for _ in range(3):
+            first_context.run(User.objects.count)
+        second_context.run(User.objects.exists)
+        User.objects.count()
+
+        self.assertEqual((first.count, second.count), (3, 1))
+        first_context.run(remove_request_query_wrapper, first)
+        first_context.run(User.objects.count)
+        self.assertEqual(first.count, 3)
+
+
+class AsgiExportTests(TestCase):
+    def test_export_is_an_async_stream_under_asgi(self):
+        config, fee = create_payment_config()
+        customer, = create_customers(1)
+        order = CustomerOrder.objects.create(
+            customer=customer, fee=fee, static_conf=config,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+        for index in range(3):
+            record_payment(payment_data(order, transid=f"TX50{index}"))
+        admin_user = User.objects.create_superuser(username='admin', phone='+255799999999', password='x')
+        token = get_token_for_user(admin_user).access_token
+
+        async def download():
+            response = await AsyncClient().get(
+                '/payment/export/payments', {'fields': 'transid'}, headers={'Authorization': f"Bearer {token}"}
+            )
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        response, content = async_to_sync(download)()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(content.decode().split(), ['transid', 'TX500', 'TX501', 'TX502'])
+
+
+class PaymentUrlLoadTests(TransactionTestCase):
+    """
+    Payment url requests against a gateway that answers in GATEWAY_LATENCY seconds.
+
+    Under WSGI every request holds one of the worker's threads while it waits;
+    under ASGI the waits overlap on the event loop and the vendor pool.
+    """
+    USERS = 20
+    WSGI_THREADS = 2
+    GATEWAY_LATENCY = 0.2
+
+    def setUp(self):
+        gateway = ThreadingHTTPServer(('127.0.0.1', 0), MockGatewayHandler)
+        threading.Thread(target=gateway.serve_forever, daemon=True).start()
+        self.addCleanup(gateway.server_close)
+        self.addCleanup(gateway.shutdown)
+        latency = mock.patch.object(MockGatewayHandler, 'latency', self.GATEWAY_LATENCY)
+        latency.start()
+        self.addCleanup(latency.stop)
+
+        self.config, self.fee = create_payment_config()
+        self.config.base_url = f"http://127.0.0.1:{gateway.server_port}"
+        self.config.save()
+
+    def create_payers(self, first):
+        payers = User.objects.bulk_create([
+            User(username=f"payer{index}", phone=f"+2556{index:08d}", password='!')
+            for index in range(first, first + self.USERS)
+        ])
+        for payer in payers:
+            CustomerOrder.objects.create(
+                customer=payer, fee=self.fee, static_conf=self.config,
+                last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+            )
+        return [f"Bearer {get_token_for_user(payer).access_token}" for payer in payers]
+
+    def serve_wsgi(self, tokens):
+        pending = list(tokens)
+        lock = threading.Lock()
+        statuses = []
+
+        def worker():
+            client = Client()
+            try:
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        token = pending.pop()
+                    response = client.get('/payment/request-payment-url', headers={'Authorization': token})
+                    statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WSGI_THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    async def serve_asgi(self, tokens):
+        client = AsyncClient()
+        responses = await asyncio.gather(*(
+            client.get('/payment/request-payment-url', headers={'Authorization': token}) for token in tokens
+        ))
+        return [response.status_code for response in responses]
+
+    def test_asgi_overlaps_gateway_waits(self):
+        started = time.perf_counter()
+        wsgi_statuses = self.serve_wsgi(self.create_payers(0))
+        wsgi_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        asgi_statuses = async_to_sync(self.serve_asgi)(self.create_payers(self.USERS))
+        asgi_seconds = time.perf_counter() - started
+
+        self.assertEqual(wsgi_statuses + asgi_statuses, [200] * 2 * self.USERS)
+        self.assertEqual(CustomerOrder.objects.filter(is_generated=True).count(), 2 * self.USERS)
+        # WSGI waits USERS / WSGI_THREADS gateway round trips one after the other
+        self.assertGreaterEqual(wsgi_seconds, self.USERS / self.WSGI_THREADS * self.GATEWAY_LATENCY)
+        self.assertLess(asgi_seconds, wsgi_seconds / 2)
+
+
+class MetricsTests(SimpleTestCase):
+    def write_samples(self, directory, filename, samples):
+        samples_file = MmapedDict(os.path.join(directory, filename))
+        for key, value in samples.items():
+            samples_file.write_value(key, value, 0.0)
+        samples_file.close()
+
+    def read_samples(self, directory, filename):
+        samples = MmapedDict.read_all_values_from_file(os.path.join(directory, filename))
+        return {key: value for key, value, _, _ in samples}
+
+    def test_finished_cron_runs_are_folded_into_the_job_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        running = os.getppid()
+
+        self.write_samples(directory, 'counter_cron-renew.db', {'runs': 3})
+        self.write_samples(directory, 'gauge_max_cron-renew.db', {'last_success': 100})
+        self.write_samples(directory, f'counter_cron-renew-{finished.pid}.db', {'runs': 2, 'errors': 1})
+        self.write_samples(directory, f'gauge_max_cron-renew-{finished.pid}.db', {'last_success': 200})
+        self.write_samples(directory, f'gauge_liveall_cron-renew-{finished.pid}.db', {'in_progress': 1})
+        self.write_samples(directory, f'counter_cron-renew-{os.getpid()}.db', {'runs': 1})
+        self.write_samples(directory, f'counter_cron-renew-{running}.db', {'runs': 5})
+        self.write_samples(directory, f'counter_cron-reconcile-{finished.pid}.db', {'runs': 7})
+
+        fold_cron_samples('renew', directory)
+
+        self.assertEqual(self.read_samples(directory, 'counter_cron-renew.db'), {'runs': 6, 'errors': 1})
+        self.assertEqual(self.read_samples(directory, 'gauge_max_cron-renew.db'), {'last_success': 200})
+        self.assertEqual(sorted(name for name in os.listdir(directory) if name.endswith('.db')), sorted([
+            'counter_cron-renew.db', 'gauge_max_cron-renew.db',
+            f'counter_cron-renew-{running}.db', f'counter_cron-reconcile-{finished.pid}.db',
+        ]))
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_require_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'mhp_http_requests_total', response.content)
+
+
+class RecordingSpanProcessor:
+    """Stands in for the export thread and keeps the submitted traces."""
+
+    def __init__(self):
+        self.traces = []
+
+    def submit(self, spans):
+        self.traces.append(spans)
+
+
+@traced('tests.lookup')
+def traced_lookup():
+    return current_span()
+
+
+@traced('tests.fetch', kind=CLIENT)
+async def traced_fetch():
+    with start_span('tests.parse'):
+        await asyncio.sleep(0)
+    return current_span()
+
+
+@override_settings(TRACING_ENABLED=True, TRACING_SAMPLE_RATE=1.0)
+class TracingTests(TestCase):
+    def setUp(self):
+        self.processor = RecordingSpanProcessor()
+        patcher = mock.patch('utils.tracing.get_span_processor', return_value=self.processor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_traced(self, func, *args, name='test'):
+        """Run func under a root span in a fresh context; return (root span, {name: span}) of the exported trace."""
+        def run():
+            root = start_root_span(name)
+            try:
+                func(*args)
+            finally:
+                end_root_span(root)
+            return root
+
+        root = contextvars.copy_context().run(run)
+        spans, = self.processor.traces
+        return root, {span.name: span for span in spans}
+
+    def test_spans_nest_under_the_current_span(self):
+        config, fee = create_payment_config()
+        customer, = create_customers(1)
+        order = CustomerOrder.objects.create(
+            customer=customer, fee=fee, static_conf=config,
+            last_payment_date=timezone.localdate(), next_payment_date=timezone.localdate(),
+        )
+
+        def work():
+            record_payment(payment_data(order))
+            async_to_sync(traced_fetch)()
+            with self.assertRaises(ValueError), start_span('tests.failing', order=order.order_id):
+                raise ValueError("gateway said no")
+
+        root, spans = self.run_traced(work)
+
+        record = spans['payment.actions.record_payment']
+        self.assertEqual(record.parent_id, root.span_id)
+        self.assertEqual(spans['INSERT'].parent_id, record.span_id)
+        self.assertEqual(spans['tests.fetch'].parent_id, root.span_id)
+        self.assertEqual(spans['tests.fetch'].kind, CLIENT)
+        self.assertEqual(spans['tests.parse'].parent_id, spans['tests.fetch'].span_id)
+        failing = spans['tests.failing']
+        self.assertEqual((failing.status, failing.status_message), ('error', "gateway said no"))
+        self.assertEqual(failing.attributes, {'order': order.order_id, 'exception.type': 'ValueError'})
+        self.assertEqual({span.trace_id for span in spans.values()}, {root.trace_id})
+
+    def test_nothing_is_recorded_outside_a_trace(self):
+        self.assertIsNone(contextvars.copy_context().run(traced_lookup))
+        self.assertIsNone(async_to_sync(traced_fetch)())
+        with override_settings(TRACING_SAMPLE_RATE=0.0):
+            self.assertIsNone(self.run_traced_request({}).get(TRACE_ID_HEADER))
+        self.assertEqual(self.processor.traces, [])
+
+    def test_database_queries_are_client_spans(self):
+        _, spans = self.run_traced(User.objects.count)
+        query = spans['SELECT']
+        self.assertEqual(query.kind, CLIENT)
+        self.assertEqual(query.attributes['db.system'], connection.vendor)
+        self.assertEqual(query.attributes['db.name'], 'default')
+        self.assertTrue(query.attributes['db.statement'].startswith('SELECT COUNT(*)'))
+
+    def run_traced_request(self, headers):
+        request = RequestFactory().get('/payment/my-order', headers=headers)
+        middleware = TracingMiddleware(lambda request: HttpResponse("ok"))
+        return contextvars.copy_context().run(middleware, request)
+
+    def test_incoming_traceparent_is_continued_with_its_sampled_flag(self):
+        trace_id, parent_id = '4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'
+        response = self.run_traced_request({'traceparent': f"00-{trace_id}-{parent_id}-01"})
+        self.assertEqual(response[TRACE_ID_HEADER], trace_id)
+        root, = self.processor.traces[0]
+        self.assertEqual((root.trace_id, root.parent_id, root.kind), (trace_id, parent_id, SERVER))
+        self.assertEqual(root.attributes['http.status_code'], 200)
+
+        # the caller decided not to sample, whatever TRACING_SAMPLE_RATE says
+        response = self.run_traced_request({'traceparent': f"00-{trace_id}-{parent_id}-00"})
+        self.assertFalse(response.has_header(TRACE_ID_HEADER))
+        self.assertEqual(len(self.processor.traces), 1)
+
+        # a malformed header starts a new trace
+        response = self.run_traced_request({'traceparent': f"00-{trace_id}-{parent_id}"})
+        self.assertNotEqual(response[TRACE_ID_HEADER], trace_id)
+        self.assertIsNone(self.processor.traces[1][0].parent_id)
+
+    @override_settings(TRACING_SAMPLE_RATE=0.0)
+    def test_every_job_run_is_a_root_span(self):
+        @trace_job('renew')
+        def renew(fail=False):
+            if fail:
+                raise RuntimeError("gateway down")
+            return traced_lookup()
+
+        lookup = contextvars.copy_context().run(renew)
+        with self.assertRaises(RuntimeError):
+            contextvars.copy_context().run(renew, True)
+
+        (child, root), (failed,) = self.processor.traces
+        self.assertEqual((root.name, root.parent_id, root.attributes), ('cron renew', None, {'cron.job': 'renew'}))
+        self.assertEqual(child.parent_id, root.span_id)
+        self.assertIs(lookup, child)
+        self.assertEqual((failed.status, failed.attributes['exception.type']), ('error', 'RuntimeError'))
+
+    def test_executor_threads_join_the_trace_through_propagate_context(self):
+        def work():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                self.assertIsNone(executor.submit(traced_lookup).result())
+                self.joined = executor.submit(propagate_context(traced_lookup)).result()
+
+        root, spans = self.run_traced(work)
+        self.assertIs(spans['tests.lookup'], self.joined)
+        self.assertEqual(self.joined.parent_id, root.span_id)
+
+    def test_otlp_payload(self):
+        def work():
+            attributes = {'order': 'MHP-1', 'amount': 10000, 'retry': False, 'fee': 0.5, 'note': None}
+            with start_span('selcom.create_order', CLIENT, **attributes):
+                pass
+
+        root, spans = self.run_traced(work, name='GET payment.views.CustomerOrderApiView')
+        root.set_status('error', 'boom')
+        exporter = OTLPSpanExporter(
+            'http://collector.test/v1/traces', headers={'X-Api-Key': 'k'}, service_name='mhp-test'
+        )
+        resource_spans, = exporter.payload([root, spans['selcom.create_order']])['resourceSpans']
+
+        self.assertEqual(resource_spans['resource'], {
+            'attributes': [{'key': 'service.name', 'value': {'stringValue': 'mhp-test'}}],
+        })
+        scope_spans, = resource_spans['scopeSpans']
+        self.assertEqual(scope_spans['scope'], {'name': 'utils.tracing'})
+        exported_root, child = scope_spans['spans']
+        self.assertEqual(exported_root['parentSpanId'], '')
+        self.assertEqual(exported_root['status'], {'code': 2, 'message': 'boom'})
+        self.assertEqual(child, {
+            'traceId': root.trace_id,
+            'spanId': spans['selcom.create_order'].span_id,
+            'parentSpanId': root.span_id,
+            'name': 'selcom.create_order',
+            'kind': 3,
+            'startTimeUnixNano': str(spans['selcom.create_order'].start_ns),
+            'endTimeUnixNano': str(spans['selcom.create_order'].end_ns),
+            'attributes': [
+                {'key': 'order', 'value': {'stringValue': 'MHP-1'}},
+                {'key': 'amount', 'value': {'intValue': '10000'}},
+                {'key': 'retry', 'value': {'boolValue': False}},
+                {'key': 'fee', 'value': {'doubleValue': 0.5}},
+            ],
+            'status': {'code': 0, 'message': ''},
+        })
+        self.assertRegex(root.trace_id, r'^[0-9a-f]{32}$')
+        self.assertRegex(root.span_id, r'^[0-9a-f]{16}$')
+
+        with mock.patch('utils.tracing.requests.post') as post:
+            exporter.export([root])
+        self.assertEqual(post.call_args.args, ('http://collector.test/v1/traces',))
+        self.assertEqual(post.call_args.kwargs['headers'], {'Content-Type': 'application/json', 'X-Api-Key': 'k'})
+        self.assertEqual(json.loads(post.call_args.kwargs['data']), exporter.payload([root]))
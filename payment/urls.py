@@ -2,7 +2,7 @@ from django.urls import path
 
 from payment.views import (
     payment_redirect, PaymentWebhookApiView, CustomerOrderApiView, CustomerPaymentLogsAPIView,
-    RequestPaymentUrlApiView
+    RequestPaymentUrlApiView, CustomerOrderExportApiView, PaymentExportApiView
 )
 
 urlpatterns = [
@@ -11,4 +11,6 @@ urlpatterns = [
     path('my-order', CustomerOrderApiView.as_view(), name='payment-webhook-api'),
     path('payment-history', CustomerPaymentLogsAPIView.as_view(), name='payment-webhook-api'),
     path('request-payment-url', RequestPaymentUrlApiView.as_view(), name='payment-webhook-api'),
+    path('export/orders', CustomerOrderExportApiView.as_view(), name='export-orders'),
+    path('export/payments', PaymentExportApiView.as_view(), name='export-payments'),
 ]
@@ -1,15 +1,21 @@
-from django.db import transaction
 from django.shortcuts import render
-from drf_spectacular.utils import extend_schema
+from django.utils.dateparse import parse_date
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-from payment.actions import create_payment_record, request_payment_url, create_webhook_response
-from payment.models import CustomerOrder, CustomerOrderPayment
-from payment.selectors import get_customer_order
-from payment.serializer import PaymentResponseSerializer, PaymentLogsSerializer, CustomerOrderSerializer
+from payment.actions import record_payment, arequest_payment_url, create_webhook_response
+from payment.exports import order_export, payment_export
+from payment.models import CustomerOrder
+from payment.selectors import get_customer_payments, get_customer_orders, get_customer_order_summary
+from payment.serializer import PaymentResponseSerializer, PaymentHistorySerializer, CustomerOrderSerializer
+from utils.async_utils import AsyncAPIViewMixin
+from utils.export_utils import ExportAPIView
 from utils.logger import AppLogger
+from utils.metrics import WEBHOOK_EVENTS
+from utils.pagination import paginate_queryset
 from utils.response_utils import create_response
 
 logger = AppLogger(__name__)
@@ -42,39 +48,41 @@ class PaymentWebhookApiView(APIView):
         if not serializer.is_valid():
             msg = f"Invalid payment webhook data: {serializer.errors}"
             logger.error(msg)
+            WEBHOOK_EVENTS.labels('invalid').inc()
             return create_response(msg, status.HTTP_400_BAD_REQUEST)
 
         # before processing the data first save the request body
         webhook_res = create_webhook_response(request.data, request.META.get("REMOTE_ADDR", "0.0.0.0"))
         if serializer.is_valid() and webhook_res is not None:
             try:
-                with transaction.atomic():
-                    payment_data = serializer.validated_data
-                    order = get_customer_order(payment_data['order_id'])
-                    create_payment_record(order, payment_data)
-
-                    # set webhook response processed to true
-                    webhook_res.processed = True
-                    webhook_res.save()
-
-                    logger.info(
-                        f"Payment processed | "
-                        f"Order: {order.order_id} | "
-                        f"Amount: {payment_data['amount']} | "
-                        f"Status: {payment_data.get('payment_status', 'PENDING')}"
-                    )
-                    return create_response("Payment Processed successfully", status.HTTP_200_OK)
+                payment_data = serializer.validated_data
+                order, created = record_payment(payment_data, webhook_res)
+                if not created:
+                    WEBHOOK_EVENTS.labels('duplicate').inc()
+                    return create_response("Payment already processed", status.HTTP_200_OK)
+
+                logger.info(
+                    f"Payment processed | "
+                    f"Order: {order.order_id} | "
+                    f"Amount: {payment_data['amount']} | "
+                    f"Status: {payment_data.get('payment_status', 'PENDING')}"
+                )
+                WEBHOOK_EVENTS.labels('processed').inc()
+                return create_response("Payment Processed successfully", status.HTTP_200_OK)
 
             except CustomerOrder.DoesNotExist:
                 logger.error(f"Order not found: {payment_data['order_id']}")
+                WEBHOOK_EVENTS.labels('order_not_found').inc()
                 msg = f"Order not found: {payment_data['order_id']}"
                 return create_response(msg, status.HTTP_404_NOT_FOUND)
 
             except Exception as e:
                 logger.error(f"Error processing payment: {str(e)}")
+                WEBHOOK_EVENTS.labels('error').inc()
                 msg = f"Error processing payment: {str(e)}"
                 return create_response(msg, status.HTTP_500_INTERNAL_SERVER_ERROR)
         else:
+            WEBHOOK_EVENTS.labels('not_stored').inc()
             return create_response("Payment process failed", status.HTTP_400_BAD_REQUEST)
 
 
@@ -89,17 +97,26 @@ class CustomerOrderApiView(APIView):
             400: "Bad request - invalid request",
             404: "Customer with the given name does not have any order",
         },
+        parameters=[
+            OpenApiParameter('summary', bool, description="Include outstanding amount and next due date"),
+            OpenApiParameter('cursor', str, description="Cursor of the page to return"),
+            OpenApiParameter('page_size', int, description="Orders per page (max 100)"),
+        ],
         tags=["payment"],
         summary="Get customer order",
         description="This return the list of all orders belong to authenticated customer",
     )
 
     def get(self, request):
-        get_customer = CustomerOrder.objects.filter(customer=request.user)
-        if get_customer:
-            serializer = CustomerOrderSerializer(get_customer, many=True)
+        orders, extra = paginate_queryset(get_customer_orders(request.user), request, view=self)
+        if orders or request.query_params.get('cursor'):
+            serializer = CustomerOrderSerializer(orders, many=True)
+            if request.query_params.get('summary', '').lower() in ('1', 'true'):
+                extra["summary"] = get_customer_order_summary(request.user)
             msg = "Customer order retrieved successfully"
-            return create_response(msg, status.HTTP_200_OK, data=serializer.data)
+            return create_response(
+                msg, status.HTTP_200_OK, total_item=len(orders), data=serializer.data, extra=extra
+            )
         else:
             msg = f"Customer {request.user.first_name} {request.user.last_name} does not have any order"
             logger.error(msg)
@@ -108,32 +125,51 @@ class CustomerOrderApiView(APIView):
 
 class CustomerPaymentLogsAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = PaymentLogsSerializer
+    serializer_class = PaymentHistorySerializer
     @extend_schema(
-        request=CustomerOrderSerializer,
+        parameters=[
+            OpenApiParameter('order_id', str, description="Only payments of this order"),
+            OpenApiParameter('date_from', OpenApiTypes.DATE, description="Only payments made on or after this day"),
+            OpenApiParameter('date_to', OpenApiTypes.DATE, description="Only payments made on or before this day"),
+            OpenApiParameter('status', str, description="Payment status, e.g. COMPLETED"),
+            OpenApiParameter('cursor', str, description="Cursor of the page to return"),
+            OpenApiParameter('page_size', int, description="Payments per page (max 100)"),
+        ],
         responses={
             200: {"msg": "Customer payment history retrieved successfully"},
             400: "Bad request - invalid request",
-            500: "active payment configuration found.",
         },
         tags=["payment"],
-        summary="Request Payment URL",
-        description="Request the payment url from Third part",
+        summary="Customer payment history",
+        description="Cursor paginated payment history of the authenticated customer, newest first",
     )
     def get(self, request):
-        order_id = request.query_params.get('order_id')
-        user = request.user
-
-        payments = CustomerOrderPayment.objects.filter(order__customer=user).order_by('-created_at')
-
-        if order_id:
-            payments.filter(order__order_id=order_id)
-
-        serializer = self.serializer_class(payments, many=True)
-        return create_response("Success", status.HTTP_200_OK, data=serializer.data)
-
-
-class RequestPaymentUrlApiView(APIView):
+        params = request.query_params
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            value = params.get(name)
+            if value:
+                try:
+                    dates[name] = parse_date(value)
+                except ValueError:
+                    dates[name] = None
+                if dates[name] is None:
+                    return create_response(f"Invalid {name}, expected YYYY-MM-DD", status.HTTP_400_BAD_REQUEST)
+
+        payments = get_customer_payments(
+            request.user,
+            order_id=params.get('order_id'),
+            payment_status=params.get('status'),
+            **dates,
+        )
+        page, extra = paginate_queryset(payments, request, view=self)
+        serializer = self.serializer_class(page, many=True)
+        return create_response(
+            "Success", status.HTTP_200_OK, total_item=len(page), data=serializer.data, extra=extra
+        )
+
+
+class RequestPaymentUrlApiView(AsyncAPIViewMixin, APIView):
     permission_classes = [IsAuthenticated]
     @extend_schema(
         request=CustomerOrderSerializer,
@@ -146,5 +182,24 @@ class RequestPaymentUrlApiView(APIView):
         summary="Request payment payment urls",
         description="This the successfully message to user ",
     )
-    def get(self, request):
-        return request_payment_url(request.user)
+    async def get(self, request):
+        return await arequest_payment_url(request.user)
+
+
+@extend_schema_view(get=extend_schema(
+    tags=["payment"],
+    summary="Export customer orders",
+    description="Streams all customer orders as csv, ndjson or xlsx. Admin only.",
+))
+class CustomerOrderExportApiView(ExportAPIView):
+    dataset = order_export
+
+
+@extend_schema_view(get=extend_schema(
+    tags=["payment"],
+    summary="Export payments",
+    description="Streams all subscription payments as csv, ndjson or xlsx. Admin only.",
+))
+class PaymentExportApiView(ExportAPIView):
+    dataset = payment_export
+
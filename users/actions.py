@@ -1,6 +1,9 @@
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import Group
+from django.db import transaction
 
+from users.selectors import user_access_cache, user_access_version_name, GROUP_PERMISSIONS_VERSION
+from utils.cache_utils import bump_cache_version
 from utils.logger import AppLogger
 
 logger = AppLogger(__name__)
@@ -8,7 +11,7 @@ logger = AppLogger(__name__)
 def change_user_password(user, password):
     user.reset_otp = False
     user.password = make_password(password)
-    user.save()
+    user.save(update_fields=['reset_otp', 'password'])
 
 
 def add_user_to_default_group(user, default_group_name="customer"):
@@ -33,3 +36,31 @@ def add_user_to_default_group(user, default_group_name="customer"):
     except Exception as e:
         logger.error(f"❌ Failed to add user '{user.username}' to group '{default_group_name}': {e}")
         return False
+
+
+def _bump_user_access(user_ids):
+    for user_id in user_ids:
+        bump_cache_version(user_access_version_name(user_id))
+        user_access_cache.delete(user_id)
+
+
+def _bump_group_permissions():
+    bump_cache_version(GROUP_PERMISSIONS_VERSION)
+    user_access_cache.clear()
+
+
+def invalidate_user_access(user_ids):
+    """
+    Drop the cached groups/permissions of the given users in every process.
+
+    Runs once the current transaction commits: bumped earlier, another
+    process could load the old rows under the new version and keep them for
+    USER_ACCESS_TIMEOUT.
+    """
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _bump_user_access(user_ids))
+
+
+def invalidate_group_permissions():
+    """Drop every cached groups/permissions entry once the transaction commits, e.g. after a group changed."""
+    transaction.on_commit(_bump_group_permissions)
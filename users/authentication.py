@@ -0,0 +1,133 @@
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.models import User
+from utils.cache_utils import TTLCache, bump_cache_version, get_cache_versions
+
+# process-local layer in front of the shared cache; bounds how long another process may accept a revoked user
+auth_state_cache = TTLCache(ttl=getattr(settings, 'JWT_REVOCATION_CACHE_TTL', 10))
+AUTH_STATE_TIMEOUT = 60 * 60
+
+
+def get_token_for_user(user):
+    """
+    Create a refresh token carrying the claims ClaimsJWTCookieAuthentication trusts.
+
+    The claims are copied to the access token derived from it. Groups are not
+    among them: they are read through users.selectors.get_user_access, which
+    sees a group change at once instead of when the token expires.
+    """
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['verified'] = user.verified
+    refresh['is_locked'] = user.is_locked
+    return refresh
+
+
+def auth_state_version_name(user_id):
+    return f"user-auth:{user_id}"
+
+
+def get_user_auth_state(user_id):
+    """
+    Return the cached is_active/is_locked values and password hash digest of a user, or None if the user is gone.
+
+    Entries live in the shared cache under the user's auth version, which
+    invalidate_user_auth_state bumps for every process.
+    """
+    auth_state = auth_state_cache.get(user_id)
+    if auth_state is not None:
+        return auth_state
+
+    version, = get_cache_versions(auth_state_version_name(user_id))
+    key = f"user-auth:{user_id}:{version}"
+    auth_state = cache.get(key)
+    if auth_state is None:
+        row = User.objects.filter(pk=user_id).values('is_active', 'is_locked', 'password').first()
+        if row is None:
+            return None
+        # only the digest compared with the token's revoke claim is shared, not the password hash
+        auth_state = {
+            'is_active': row['is_active'],
+            'is_locked': row['is_locked'],
+            'password_digest': get_md5_hash_password(row['password']),
+        }
+        cache.set(key, auth_state, AUTH_STATE_TIMEOUT)
+
+    auth_state_cache.set(user_id, auth_state)
+    return auth_state
+
+
+def invalidate_user_auth_state(user_id):
+    """Make every process re-read the auth state of a user, e.g. after a lock or password change."""
+    bump_cache_version(auth_state_version_name(user_id))
+    auth_state_cache.delete(user_id)
+
+
+def build_claims_user(user_id, validated_token, auth_state):
+    """
+    Build a User instance from token claims without reading the users table.
+
+    Only the claim fields are loaded. The first access to any other field loads
+    all remaining fields in one query, the same way Django loads deferred fields.
+    """
+    loaded = {
+        'id': user_id,
+        'username': validated_token.get('username'),
+        'verified': validated_token['verified'],
+        'is_locked': auth_state['is_locked'],
+        'is_active': auth_state['is_active'],
+    }
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in loaded]
+    user = User.from_db(DEFAULT_DB_ALIAS, field_names, [loaded[name] for name in field_names])
+
+    refresh_from_db = user.refresh_from_db
+
+    def load_remaining_fields(using=None, fields=None, from_queryset=None):
+        if fields is not None:
+            fields = list(user.get_deferred_fields()) or fields
+        del user.refresh_from_db
+        return refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    user.refresh_from_db = load_remaining_fields
+    return user
+
+
+class ClaimsJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    JWT cookie/header authentication that trusts the signed claims added by get_token_for_user.
+
+    The users table is only consulted through the shared cache, with a short-TTL
+    per-process layer, to catch deactivated accounts, lock changes and (if
+    CHECK_REVOKE_TOKEN is on) password changes. Tokens issued without the
+    claims fall back to the regular per-request user lookup.
+    """
+
+    def get_user(self, validated_token):
+        if 'verified' not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed(_("Token contained no recognizable user identification"))
+
+        auth_state = get_user_auth_state(user_id)
+        if auth_state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not auth_state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != auth_state['password_digest']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return build_claims_user(user_id, validated_token, auth_state)
@@ -0,0 +1,59 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+
+# PASSWORD_HASHING_ALGORITHM -> Hasher.algorithm
+ALGORITHMS = {
+    'scrypt': 'scrypt',
+    'argon2': 'argon2',
+    'pbkdf2': 'pbkdf2_sha256',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password hashing throughput and latency through the bounded hashing pool "
+        "(PASSWORD_HASHING_MAX_WORKERS) with the configured cost parameters, for a number of concurrent logins"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', action='append', choices=sorted(ALGORITHMS),
+                            help="Algorithm to measure; repeatable, all by default")
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help="Concurrent callers; repeatable, defaults to 1, 4 and 16")
+        parser.add_argument('--hashes', type=int, default=32, help="Hashes per measurement")
+
+    def _measure(self, hasher, concurrency, count):
+        def login(number):
+            started = time.perf_counter()
+            hasher.verify(f"password-{number}", encoded)
+            return time.perf_counter() - started
+
+        encoded = hasher.encode('password-0', hasher.salt())
+        with ThreadPoolExecutor(max_workers=concurrency) as callers:
+            started = time.perf_counter()
+            latencies = sorted(callers.map(login, range(count)))
+            elapsed = time.perf_counter() - started
+        return count / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+    def handle(self, *args, **options):
+        concurrencies = options['concurrency'] or [1, 4, 16]
+        self.stdout.write(f"Hashing pool: {settings.PASSWORD_HASHING_MAX_WORKERS} workers, "
+                          f"{options['hashes']} verifications per row")
+        self.stdout.write(f"  {'algorithm':<14} {'callers':>7} {'hashes/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for name in options['algorithm'] or sorted(ALGORITHMS):
+            hasher = get_hasher(ALGORITHMS[name])
+            for concurrency in concurrencies:
+                try:
+                    throughput, p50, p95 = self._measure(hasher, concurrency, options['hashes'])
+                except ValueError as e:
+                    # e.g. argon2-cffi is not installed
+                    self.stdout.write(self.style.WARNING(f"  {name}: {e}"))
+                    break
+                self.stdout.write(
+                    f"  {name:<14} {concurrency:>7} {throughput:>9.1f} {p50 * 1000:>8.1f} {p95 * 1000:>8.1f}"
+                )
@@ -0,0 +1,76 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from users.models import User
+from users.views.user_views import RegisterUserAPIView
+
+
+class Command(BaseCommand):
+    help = (
+        "Register users through RegisterUserAPIView (conflict check, password hash and insert) against "
+        "generated users and report the throughput. Everything is created in a transaction that is rolled "
+        "back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help="Existing users to generate")
+        parser.add_argument('--registrations', type=int, default=200, help="Registrations to send")
+
+    def _register(self, view, factory, payload):
+        request = factory.post('/api/v1/auth/registration/', payload, format='json')
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+        return time.perf_counter() - started, len(queries), response.status_code
+
+    def _report(self, label, results):
+        latencies = sorted(result[0] for result in results)
+        total = sum(latencies)
+        statuses = sorted({result[2] for result in results})
+        self.stdout.write(
+            f"  {label:<10} {len(results) / total:8.1f} req/s  mean {statistics.mean(latencies) * 1000:7.2f} ms  "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.2f} ms  "
+            f"{statistics.mean(result[1] for result in results):4.1f} queries  status {statuses}"
+        )
+
+    def handle(self, *args, **options):
+        count = options['users']
+        registrations = options['registrations']
+        view = RegisterUserAPIView.as_view()
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            started = time.perf_counter()
+            for offset in range(0, count, 5_000):
+                User.objects.bulk_create([
+                    User(username=f"bench{index}", email=f"bench{index}@example.com",
+                         phone=f"+2557{index:08d}", password='!')
+                    for index in range(offset, min(offset + 5_000, count))
+                ])
+            self.stdout.write(f"Generated {count} users in {time.perf_counter() - started:.1f} s")
+
+            # phone numbers from +2556... were not generated, so these registrations succeed
+            created = [
+                self._register(view, factory, {
+                    'username': f"new{index}", 'email': f"new{index}@example.com",
+                    'phone': f"+2556{index:08d}", 'password': "Secret-pass-1",
+                    'first_name': "New", 'last_name': "User",
+                })
+                for index in range(registrations)
+            ]
+            conflicts = [
+                self._register(view, factory, {
+                    'username': f"other{index}", 'email': f"other{index}@example.com",
+                    'phone': f"+2557{index:08d}", 'password': "Secret-pass-1",
+                })
+                for index in range(registrations)
+            ]
+            self.stdout.write(f"{registrations} registrations each on {connection.vendor}:")
+            self._report("created", created)
+            self._report("conflict", conflicts)
+
+            transaction.set_rollback(True)
@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from users.models import User
+from users.selectors import check_user_by_phone, get_registration_conflict, get_user_phone, verify_phone
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the username/email/phone lookups of registration and login against generated users. "
+        "The users are created in a transaction that is rolled back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help="Users to generate")
+        parser.add_argument('--lookups', type=int, default=2_000, help="Calls to time per lookup")
+
+    def _time(self, label, func, values):
+        started = time.perf_counter()
+        for value in values:
+            func(*value)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  {label:<28} {elapsed / len(values) * 1_000_000:8.1f} us/call")
+
+    def handle(self, *args, **options):
+        count = options['users']
+        with transaction.atomic():
+            started = time.perf_counter()
+            for offset in range(0, count, 5_000):
+                User.objects.bulk_create([
+                    User(username=f"bench{index}", email=f"bench{index}@example.com",
+                         phone=f"+2557{index:08d}", password='!')
+                    for index in range(offset, min(offset + 5_000, count))
+                ])
+            self.stdout.write(f"Generated {count} users in {time.perf_counter() - started:.1f} s")
+
+            existing = [random.randrange(count) for _ in range(options['lookups'])]
+            # indexes from `count` on were not generated, so these lookups miss
+            missing = [count + index for index in range(options['lookups'])]
+            self.stdout.write(f"{options['lookups']} calls each on {connection.vendor}:")
+            self._time("registration, conflict", get_registration_conflict,
+                       [(f"new{index}", f"bench{index}@example.com", '') for index in existing])
+            self._time("registration, no conflict", get_registration_conflict,
+                       [(f"new{index}", f"new{index}@example.com", f"+2557{index:08d}") for index in missing])
+            self._time("get_user_phone", get_user_phone, [(f"+2557{index:08d}",) for index in existing])
+            self._time("check_user_by_phone, miss", check_user_by_phone, [(f"+2557{index:08d}",) for index in missing])
+            self._time("verify_phone", verify_phone, [(f"+2557{index:08d}",) for index in existing])
+            self.stdout.write(f"Phone lookup plan: {User.objects.filter(phone='+255700000001').explain()}")
+
+            transaction.set_rollback(True)
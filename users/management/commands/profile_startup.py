@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# what a worker does before serving its first request
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def parse_import_times(output):
+    """Return [(module, self microseconds)] from `python -X importtime` output."""
+    times = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, module = line[len('import time:'):].split('|')
+        times.append((module.strip(), int(self_us)))
+    return times
+
+
+def group_import_times(times, apps):
+    """Sum import times per installed app (longest matching app name), or per top level package otherwise."""
+    apps = sorted(apps, key=len, reverse=True)
+    totals = defaultdict(int)
+    for module, self_us in times:
+        group = next((app for app in apps if module == app or module.startswith(app + '.')), module.split('.')[0])
+        totals[group] += self_us
+    return totals
+
+
+class Command(BaseCommand):
+    help = "Measure worker startup (django.setup() and the URLconf) in a fresh interpreter and report import time per app"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=int, help="Milliseconds allowed; defaults to STARTUP_BUDGET_MS")
+        parser.add_argument('--repeat', type=int, default=5, help="Cold starts to time; the fastest counts")
+        parser.add_argument('--top', type=int, default=15, help="Apps and packages to list")
+
+    def _run(self, *python_options):
+        # the child inherits DJANGO_SETTINGS_MODULE, so --settings applies to it too
+        result = subprocess.run(
+            [sys.executable, *python_options, '-c', STARTUP_SCRIPT],
+            capture_output=True, text=True, env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+        return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        budget = options['budget'] or getattr(settings, 'STARTUP_BUDGET_MS', 1000)
+        startup_ms = min(self._run()[0] for _ in range(max(options['repeat'], 1)))
+
+        _, import_log = self._run('-X', 'importtime')
+        totals = group_import_times(parse_import_times(import_log), settings.INSTALLED_APPS)
+        imported_ms = sum(totals.values()) / 1000
+
+        self.stdout.write(f"Startup with {os.environ.get('DJANGO_SETTINGS_MODULE')}: {startup_ms:.0f} ms "
+                          f"(fastest of {options['repeat']}), budget {budget} ms")
+        self.stdout.write(f"Import time, {imported_ms:.0f} ms in total (inflated by -X importtime):")
+        for group, self_us in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {group}")
+
+        if startup_ms > budget:
+            raise CommandError(f"Startup took {startup_ms:.0f} ms, over the {budget} ms budget")
+        self.stdout.write(self.style.SUCCESS("Startup is within budget"))
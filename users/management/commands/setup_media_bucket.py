@@ -0,0 +1,105 @@
+import json
+import os
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from storages.backends.s3 import S3Storage
+
+from utils.media import VARIANTS_DIR
+
+
+class Command(BaseCommand):
+    help = (
+        "Create and configure the media bucket of MEDIA_STORAGE=s3: public reads, CORS for direct uploads "
+        "and cleanup of abandoned multipart uploads. Works against AWS S3 and local MinIO, e.g.\n"
+        "  docker run -p 9000:9000 -e MINIO_ROOT_USER=minio -e MINIO_ROOT_PASSWORD=minio-secret "
+        "minio/minio server /data\n"
+        "  MEDIA_STORAGE=s3 MEDIA_BUCKET_NAME=mhp-media MEDIA_S3_ENDPOINT_URL=http://localhost:9000 "
+        "MEDIA_S3_ADDRESSING_STYLE=path MEDIA_S3_ACCESS_KEY=minio MEDIA_S3_SECRET_KEY=minio-secret "
+        "python manage.py setup_media_bucket --cors-origin http://localhost:3000 --upload-local"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cors-origin', action='append', default=[],
+                            help="Origin allowed to upload from a browser; repeatable, '*' for any")
+        parser.add_argument('--abort-multipart-days', type=int, default=1,
+                            help="Days after which unfinished multipart uploads are removed")
+        parser.add_argument('--private', action='store_true',
+                            help="Do not allow anonymous reads (set MEDIA_S3_QUERYSTRING_AUTH=True then)")
+        parser.add_argument('--upload-local', action='store_true',
+                            help="Copy the files in MEDIA_ROOT that are missing from the bucket, under the same names")
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, S3Storage):
+            raise CommandError("MEDIA_STORAGE is not 's3'")
+        client = default_storage.connection.meta.client
+        bucket = default_storage.bucket_name
+
+        try:
+            client.head_bucket(Bucket=bucket)
+            self.stdout.write(f"Bucket {bucket} exists")
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchBucket'):
+                raise CommandError(f"Cannot access bucket {bucket}: {e}")
+            params = {'Bucket': bucket}
+            region = client.meta.region_name
+            if region and region != 'us-east-1':
+                params['CreateBucketConfiguration'] = {'LocationConstraint': region}
+            client.create_bucket(**params)
+            self.stdout.write(self.style.SUCCESS(f"Created bucket {bucket}"))
+
+        if not options['private']:
+            client.put_bucket_policy(Bucket=bucket, Policy=json.dumps({
+                'Version': '2012-10-17',
+                'Statement': [{
+                    'Sid': 'PublicReadMedia',
+                    'Effect': 'Allow',
+                    'Principal': '*',
+                    'Action': 's3:GetObject',
+                    'Resource': f"arn:aws:s3:::{bucket}/*",
+                }],
+            }))
+            self.stdout.write("Anonymous reads allowed")
+
+        if options['cors_origin']:
+            client.put_bucket_cors(Bucket=bucket, CORSConfiguration={'CORSRules': [{
+                'AllowedOrigins': options['cors_origin'],
+                'AllowedMethods': ['GET', 'POST', 'PUT'],
+                'AllowedHeaders': ['*'],
+                # the client reads the ETag of every part to complete a multipart upload
+                'ExposeHeaders': ['ETag'],
+                'MaxAgeSeconds': 3600,
+            }]})
+            self.stdout.write(f"CORS allowed for {', '.join(options['cors_origin'])}")
+
+        client.put_bucket_lifecycle_configuration(Bucket=bucket, LifecycleConfiguration={'Rules': [{
+            'ID': 'abort-incomplete-multipart-uploads',
+            'Status': 'Enabled',
+            'Filter': {'Prefix': ''},
+            'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': options['abort_multipart_days']},
+        }]})
+        self.stdout.write(f"Unfinished multipart uploads expire after {options['abort_multipart_days']} day(s)")
+
+        if options['upload_local']:
+            self._upload_local()
+
+    def _upload_local(self):
+        copied = skipped = 0
+        for directory, subdirectories, files in os.walk(settings.MEDIA_ROOT):
+            # resized variants are only served from local storage
+            if os.path.relpath(directory, settings.MEDIA_ROOT) == '.' and VARIANTS_DIR in subdirectories:
+                subdirectories.remove(VARIANTS_DIR)
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                if default_storage.exists(name):
+                    skipped += 1
+                    continue
+                with open(path, 'rb') as media_file:
+                    # save() would hash the name again; existing rows must keep theirs
+                    default_storage._save(name, File(media_file, name=name))
+                copied += 1
+        self.stdout.write(self.style.SUCCESS(f"Copied {copied} local files, {skipped} already in the bucket"))
@@ -3,6 +3,7 @@ import uuid
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
 
 from payment.models import AuditModel
 from utils.validators import phone_regex
@@ -43,10 +44,11 @@ class User(AbstractUser):
         max_length=255,
         blank=True,
         null=True,
+        db_index=True,
     )
     first_name = models.CharField(max_length=100, null=True, blank=False)
     last_name = models.CharField(max_length=100, null=True, blank=False)
-    phone = models.CharField(validators=[phone_regex], max_length=20, blank=True)
+    phone = models.CharField(validators=[phone_regex], max_length=20, blank=True, db_index=True)
     profile = models.ImageField(upload_to="profile_picture", blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
     otp = models.CharField(max_length=6, null=True, blank=True)
@@ -69,6 +71,13 @@ class User(AbstractUser):
 
     class Meta:
         db_table = 'users'
+        constraints = [
+            # blank phone/email are allowed, so uniqueness only applies to filled values
+            models.UniqueConstraint(fields=['phone'], condition=~Q(phone=''), name='users_phone_unique'),
+            models.UniqueConstraint(
+                fields=['email'], condition=Q(email__isnull=False) & ~Q(email=''), name='users_email_unique'
+            ),
+        ]
 
 
 class Ads(AuditModel):
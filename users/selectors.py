@@ -1,8 +1,19 @@
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import Q
+
 from users.models import User
+from utils.cache_utils import TTLCache, get_cache_versions
 from utils.logger import AppLogger
 
 logger = AppLogger(__name__)
 
+# process-local layer in front of the shared cache; bounds how long another process may serve stale access
+user_access_cache = TTLCache(ttl=getattr(settings, 'USER_ACCESS_LOCAL_TTL', 10))
+USER_ACCESS_TIMEOUT = 60 * 60
+GROUP_PERMISSIONS_VERSION = 'group-permissions'
+
 
 def verify_phone(phone):
     users = User.objects.filter(phone=phone)
@@ -30,3 +41,96 @@ def check_current_password(user, password):
 def get_user_phone(phone):
     logger.debug("🔥 get user by phone number")
     return User.objects.filter(phone=phone).first()
+
+
+def get_registration_conflict(username, email, phone):
+    """
+    Check username, email and phone against existing accounts in a single query.
+
+    Returns:
+        str: The first conflicting field ('username', 'email' or 'phone'), or None if there is no conflict.
+    """
+    logger.debug("🔥 check registration conflicts")
+    lookup = Q(username=username)
+    if email:
+        lookup |= Q(email=email)
+    if phone:
+        lookup |= Q(phone=phone)
+
+    matches = list(User.objects.filter(lookup).values_list('username', 'email', 'phone')[:3])
+    for field, index, value in (('username', 0, username), ('email', 1, email), ('phone', 2, phone)):
+        if value and any(match[index] == value for match in matches):
+            return field
+    return None
+
+
+def user_access_version_name(user_id):
+    return f"user-access:{user_id}"
+
+
+def get_user_access(user_id):
+    """
+    Return the cached group names and group/user permissions of a user.
+
+    Entries live in the shared cache under the user's access version and the
+    global group-permissions version, and are bumped by the signals in
+    users/signals/users_signals.py.
+
+    Returns:
+        dict: {'groups': tuple of group names, 'permissions': frozenset of 'app_label.codename'}
+    """
+    access = user_access_cache.get(user_id)
+    if access is not None:
+        return access
+
+    user_version, group_version = get_cache_versions(user_access_version_name(user_id), GROUP_PERMISSIONS_VERSION)
+    key = f"user-access:{user_id}:{user_version}:{group_version}"
+    access = cache.get(key)
+    if access is None:
+        logger.debug(f"🔥 load groups and permissions for user {user_id}")
+        groups = tuple(Group.objects.filter(user=user_id).order_by('id').values_list('name', flat=True))
+        permissions = frozenset(
+            f"{app_label}.{codename}" for app_label, codename in
+            Permission.objects.filter(Q(group__user=user_id) | Q(user=user_id))
+            .values_list('content_type__app_label', 'codename').distinct()
+        )
+        access = {'groups': groups, 'permissions': permissions}
+        cache.set(key, access, USER_ACCESS_TIMEOUT)
+
+    user_access_cache.set(user_id, access)
+    return access
+
+
+def get_user_group_names(user_id):
+    return get_user_access(user_id)['groups']
+
+
+def get_all_permission_names():
+    group_version, = get_cache_versions(GROUP_PERMISSIONS_VERSION)
+    key = f"all-permissions:{group_version}"
+    permissions = cache.get(key)
+    if permissions is None:
+        permissions = frozenset(
+            f"{app_label}.{codename}" for app_label, codename in
+            Permission.objects.values_list('content_type__app_label', 'codename')
+        )
+        cache.set(key, permissions, USER_ACCESS_TIMEOUT)
+    return permissions
+
+
+def get_user_permissions(user):
+    """Cached equivalent of user.get_all_permissions() for the model backend."""
+    if not user.is_active or user.is_anonymous:
+        return frozenset()
+    if user.is_superuser:
+        return get_all_permission_names()
+    return get_user_access(user.pk)['permissions']
+
+
+def user_has_perm(user, perm):
+    """Cached equivalent of user.has_perm(perm)."""
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_active and user.is_superuser:
+        return True
+    return perm in get_user_permissions(user)
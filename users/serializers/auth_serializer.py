@@ -3,6 +3,7 @@ from rest_framework import serializers
 
 from users.actions import add_user_to_default_group
 from users.models import User
+from users.selectors import get_user_permissions
 from utils.logger import AppLogger
 
 logger = AppLogger(__name__)
@@ -67,8 +68,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
         email = validated_data.pop('email', None)
         groups = validated_data.pop('groups', None)
         user = User(**validated_data)
-        if password and email:
+        if password:
             user.set_password(password)
+        if password and email:
             user.username = email
             user.email = email
             user.verified = True
@@ -97,7 +99,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     def get_permissions(self, obj):
         """Return a list of permission codenames assigned to the user."""
-        all_perms = obj.get_all_permissions()
+        all_perms = get_user_permissions(obj)
         cleaned_perms = [perm.split('.', 1)[-1] for perm in all_perms]
         return cleaned_perms
 
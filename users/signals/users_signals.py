@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, m2m_changed, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 from django.conf import settings
+from django.db import transaction
+
+from users.actions import invalidate_user_access, invalidate_group_permissions
+from users.authentication import invalidate_user_auth_state
+from users.models import User as UserModel
 
 User = settings.AUTH_USER_MODEL
 
@@ -10,3 +15,38 @@ def assign_admin_group(sender, instance, created, **kwargs):
     if created and (instance.is_superuser):
         admin_group, _ = Group.objects.get_or_create(name='admin')
         instance.groups.add(admin_group)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def refresh_user_auth_state(sender, instance, **kwargs):
+    # lock/deactivate/password changes and deletions are picked up by the JWT claims authentication;
+    # bumped after commit, or another process could cache the old row again under the new version
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user_auth_state(user_id))
+
+
+@receiver(m2m_changed, sender=UserModel.groups.through)
+@receiver(m2m_changed, sender=UserModel.user_permissions.through)
+def refresh_user_access_on_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user_access([instance.pk])
+    elif pk_set:
+        invalidate_user_access(pk_set)
+    else:
+        # cleared from the group/permission side, the affected users are unknown
+        invalidate_group_permissions()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def refresh_access_on_group_permissions_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_group_permissions()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def refresh_access_on_group_change(sender, **kwargs):
+    invalidate_group_permissions()
@@ -1,3 +1,218 @@
-from django.test import TestCase
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import hashers as django_hashers
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from homes.models import Property
+from homes.selectors import get_property_to_display
+from homes.serializers import PropertySerializer
+from users.authentication import ClaimsJWTCookieAuthentication, auth_state_cache, get_token_for_user
+from users.models import User
+from users.selectors import get_registration_conflict, get_user_access, get_user_phone, user_access_cache, \
+    user_has_perm, verify_phone
+from utils import hashers
+
+
+class UserLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(username=f"user{index}", email=f"user{index}@example.com", phone=f"+2557{index:08d}", password='!')
+            for index in range(50)
+        ])
+
+    def test_registration_conflict_is_one_query(self):
+        cases = [
+            (('user7', 'new@example.com', '+255799999999'), 'username'),
+            (('new', 'user7@example.com', '+255799999999'), 'email'),
+            (('new', 'new@example.com', '+255700000007'), 'phone'),
+            (('new', 'new@example.com', '+255799999999'), None),
+            (('new', None, ''), None),
+        ]
+        for arguments, conflict in cases:
+            with self.subTest(arguments=arguments), self.assertNumQueries(1):
+                self.assertEqual(get_registration_conflict(*arguments), conflict)
+
+    def test_phone_lookups(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_phone('+255700000007').username, 'user7')
+        self.assertIsNone(get_user_phone('+255799999999'))
+        self.assertTrue(verify_phone('+255700000007'))
+
+    def test_lookups_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("query plans are checked on SQLite")
+        with CaptureQueriesContext(connection) as queries:
+            get_registration_conflict('new', 'user7@example.com', '+255700000007')
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+            details = [row[-1] for row in cursor.fetchall()]
+        # one index search per OR branch, never a scan of the users table
+        self.assertFalse([detail for detail in details if detail.startswith('SCAN users')], details)
+
+        for lookup in ({'phone': '+255700000007'}, {'email': 'user7@example.com'}):
+            with self.subTest(lookup=lookup):
+                self.assertNotIn('SCAN users', User.objects.filter(**lookup).explain())
+
+    def test_duplicate_phone_and_email_are_rejected_by_the_database(self):
+        for fields in ({'phone': '+255700000007'}, {'email': 'user7@example.com'}):
+            with self.subTest(fields=fields), self.assertRaises(IntegrityError), transaction.atomic():
+                User.objects.create(username='duplicate', password='!', **{'phone': '', **fields})
+
+        # blank phones and missing emails stay allowed for any number of users
+        User.objects.create(username='blank1', password='!', phone='', email=None)
+        User.objects.create(username='blank2', password='!', phone='', email=None)
+
+
+class PasswordHashingTests(SimpleTestCase):
+    def test_hashes_verify_and_upgrade_when_the_cost_changes(self):
+        with mock.patch.object(hashers.PBKDF2PasswordHasher, 'iterations', 1000):
+            for hasher in (hashers.ScryptPasswordHasher(), hashers.PBKDF2PasswordHasher()):
+                with self.subTest(hasher=hasher.algorithm):
+                    encoded = hasher.encode('secret', hasher.salt())
+                    self.assertTrue(hasher.verify('secret', encoded))
+                    self.assertFalse(hasher.verify('wrong', encoded))
+                    self.assertFalse(hasher.must_update(encoded))
+
+        # the PBKDF2 hash above used 1000 iterations, fewer than the configured cost
+        self.assertTrue(hashers.PBKDF2PasswordHasher().must_update(encoded))
+
+    def test_pool_bounds_concurrent_hashing(self):
+        active = peak = 0
+        lock = threading.Lock()
+
+        def slow_encode(hasher, password, salt, *args, **kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return f"scrypt${salt}$fake"
+
+        hasher = hashers.ScryptPasswordHasher()
+        with mock.patch.object(django_hashers.ScryptPasswordHasher, 'encode', slow_encode):
+            with ThreadPoolExecutor(max_workers=8) as logins:
+                results = list(logins.map(lambda number: hasher.encode(f"secret{number}", 'salt'), range(16)))
+
+        self.assertEqual(len(results), 16)
+        self.assertLessEqual(peak, settings.PASSWORD_HASHING_MAX_WORKERS)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        # ids are reused after a test's rollback, whose on_commit bumps never ran
+        cache.clear()
+        auth_state_cache.clear()
+        self.user = User.objects.create_user('claims', 'secret', phone='+255711111111', verified=True)
+        self.token = str(get_token_for_user(self.user).access_token)
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        return ClaimsJWTCookieAuthentication().authenticate(request)
+
+    def test_user_is_built_from_claims(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+            self.assertEqual((user.pk, user.username, user.verified), (self.user.pk, 'claims', True))
+        self.assertNotIn('groups', token)
+        # fields outside the claims are loaded on first use
+        with self.assertNumQueries(1):
+            self.assertEqual(user.phone, '+255711111111')
+
+    def test_deactivation_is_seen_through_the_shared_cache(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # until the commit other processes may still load the active row, so nothing is bumped yet
+            auth_state_cache.clear()
+            self.authenticate()
+        # another process only holds its local entry; the shared version was bumped on commit
+        auth_state_cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        auth_state_cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class UserAccessTests(TestCase):
+    def setUp(self):
+        # ids are reused after a test's rollback, whose on_commit bumps never ran
+        cache.clear()
+        user_access_cache.clear()
+        self.broker_group, _ = Group.objects.get_or_create(name='broker')
+        self.user = User.objects.create(username='broker', phone='+255711111112', password='!')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.broker_group)
+
+    def group_queries(self, queries):
+        return [query['sql'] for query in queries if 'auth_group' in query['sql']]
+
+    def test_rendering_properties_runs_no_group_queries_once_warm(self):
+        uploaders = [self.user] + [
+            User.objects.create(username=f"owner{index}", phone=f"+25571200000{index}", password='!')
+            for index in range(3)
+        ]
+        for index in range(20):
+            Property.objects.create(
+                uploader=uploaders[index % len(uploaders)], name=f"Flat {index}", type="House", category="Rent",
+                address="Mikocheni", price=500000, total_price=500000, maintenance=0,
+            )
+        request = RequestFactory().get('/api/v1/property/')
+
+        def render():
+            properties = list(get_property_to_display(None))
+            with CaptureQueriesContext(connection) as queries:
+                data = PropertySerializer(properties, many=True, context={'request': request}).data
+            return data, queries
+
+        data, cold = render()
+        # one load per uploader, not per property
+        self.assertEqual(len(self.group_queries(cold)), 2 * len(uploaders))
+        data, warm = render()
+        self.assertEqual(self.group_queries(warm), [])
+        self.assertEqual({row['uploader_role'] for row in data}, {'broker', None})
+
+    def test_group_and_permission_changes_reach_other_processes_on_commit(self):
+        self.assertEqual(get_user_access(self.user.pk)['groups'], ('broker',))
+        # not 'customer': joining it generates a subscription order
+        agent_group = Group.objects.create(name='agent')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(agent_group)
+            # before the commit the shared entry is untouched, so no process caches the new version early
+            user_access_cache.clear()
+            self.assertEqual(get_user_access(self.user.pk)['groups'], ('broker',))
+        # another process only holds its local entry; the shared version was bumped on commit
+        user_access_cache.clear()
+        self.assertEqual(get_user_access(self.user.pk)['groups'], ('broker', 'agent'))
+
+        self.assertFalse(user_has_perm(self.user, 'homes.add_property'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.broker_group.permissions.add(Permission.objects.get(codename='add_property'))
+        self.assertTrue(user_has_perm(self.user, 'homes.add_property'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            agent_group.user_set.remove(self.user)
+        user_access_cache.clear()
+        self.assertEqual(get_user_access(self.user.pk)['groups'], ('broker',))
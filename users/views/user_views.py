@@ -2,22 +2,26 @@ import random
 from datetime import timedelta
 from email.headerregistry import Group
 
-from dj_rest_auth.views import LoginView
+from asgiref.sync import sync_to_async
+from dj_rest_auth.views import LoginView, sensitive_post_parameters_m
+from django.db import IntegrityError
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from users.authentication import get_token_for_user
 from users.models import User
-from utils.function import send_sms_to_user
+from utils.async_utils import AsyncAPIViewMixin
+from utils.function import asend_sms_to_user
 from utils.logger import AppLogger
 from utils.otp_util import OtpUtil
 from utils.response_utils import create_response, create_auth_response
 from utils.validators import validate_phone
 from ..actions import change_user_password
-from ..selectors import verify_phone, get_user_phone, check_user_by_phone, check_password_match, check_current_password
+from ..selectors import verify_phone, get_user_phone, check_user_by_phone, check_password_match, check_current_password, \
+    get_registration_conflict
 from ..serializers import UserProfileSerializer, RequestNewOTPSerializer, OTPVerificationSerializer, \
     ResetPasswordSerializer, ChangePasswordSerializer, LoginSerializer, UserGroupSerializer
 from django.contrib.auth.models import Group
@@ -25,7 +29,7 @@ logger = AppLogger(__name__)
 
 
 # Helper function to generate and send OTP
-def generate_and_send_otp(user):
+async def agenerate_and_send_otp(user):
     if not user.phone:
         return False
 
@@ -34,14 +38,18 @@ def generate_and_send_otp(user):
     user.otp_expiry = timezone.now() + timedelta(minutes=2)
     user.max_otp_try = 3
     user.otp_max_out = None
-    user.save()
+    await user.asave()
 
     print(f"DEBUG: Sending OTP {otp_code} to {user.phone} for user {user.username}")
-    send_sms_to_user(user.phone, f"Your OTP is: {otp_code}")
+    await asend_sms_to_user(user.phone, f"Your OTP is: {otp_code}")
     return True
 
 
-class CustomLoginView(LoginView):
+class CustomLoginView(AsyncAPIViewMixin, LoginView):
+
+    @sensitive_post_parameters_m
+    async def dispatch(self, *args, **kwargs):
+        return await super().dispatch(*args, **kwargs)
 
     @extend_schema(
         request=LoginSerializer,
@@ -55,37 +63,38 @@ class CustomLoginView(LoginView):
         summary="User login with OTP handling",
         description="Authenticates a user. If the account is verified, returns JWT tokens; otherwise, sends an OTP for verification.",
     )
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         self.request = request
         self.serializer = self.get_serializer(data=self.request.data)
-        self.serializer.is_valid(raise_exception=True)
+        # authentication queries the user and hashes the password
+        await sync_to_async(self.serializer.is_valid)(raise_exception=True)
 
         self.user = self.serializer.validated_data['user']
 
         # Bypass OTP verification for active user
         if self.user.verified:
-            refresh = RefreshToken.for_user(self.user)
-            user_serializer = UserProfileSerializer(instance=self.user)
-            msg = "Login successfully."
-            access_token = refresh.access_token
-            return create_auth_response(msg, access_token, refresh, user_serializer.data, status.HTTP_200_OK)
-
-        if not self.user.verified:
-            otp_util = OtpUtil(self.user)
-            otp_is_sent, msg = otp_util.generate_and_send_otp()
-            if otp_is_sent:
-                msg = "OTP sent to your phone for verification."
-                body = {
-                    "detail": msg,
-                    "phone": self.user.phone,
-                    "otp_required": True
-                }
-                return Response(body, status=status.HTTP_202_ACCEPTED)
-            else:
-                msg = f"Account not verified, but could not send OTP ({msg}). Please contact support."
-                return create_response(msg, status.HTTP_401_UNAUTHORIZED)
+            return await sync_to_async(self.get_verified_response)()
 
-        return super().post(request, *args, **kwargs)
+        otp_util = OtpUtil(self.user)
+        otp_is_sent, msg = await otp_util.agenerate_and_send_otp()
+        if otp_is_sent:
+            msg = "OTP sent to your phone for verification."
+            body = {
+                "detail": msg,
+                "phone": self.user.phone,
+                "otp_required": True
+            }
+            return Response(body, status=status.HTTP_202_ACCEPTED)
+        else:
+            msg = f"Account not verified, but could not send OTP ({msg}). Please contact support."
+            return create_response(msg, status.HTTP_401_UNAUTHORIZED)
+
+    def get_verified_response(self):
+        refresh = get_token_for_user(self.user)
+        user_serializer = UserProfileSerializer(instance=self.user)
+        msg = "Login successfully."
+        access_token = refresh.access_token
+        return create_auth_response(msg, access_token, refresh, user_serializer.data, status.HTTP_200_OK)
 
 
 class RegisterUserAPIView(APIView):
@@ -101,8 +110,8 @@ class RegisterUserAPIView(APIView):
     )
     def post(self, request):
         serializer = UserProfileSerializer(data=request.data)
-        password = request.data.get('password')
         username = request.data.get('username', None)
+        email = request.data.get('email', None)
         phone = request.data.get('phone', None)
 
         if username is None:
@@ -113,23 +122,18 @@ class RegisterUserAPIView(APIView):
             msg = f"Invalid phone number."
             return create_response(msg, status.HTTP_400_BAD_REQUEST)
 
-        if User.objects.filter(username=username).exists():
-            msg = f"User {username} with the same username already exists."
-            return create_response(msg, status.HTTP_409_CONFLICT)
-
-        if User.objects.filter(email=request.data['email']).exists():
-            msg = f"User {username} with the same email already exists."
-            return create_response(msg, status.HTTP_409_CONFLICT)
-
-        if User.objects.filter(phone=phone).exists():
-            msg = f"User {username} with the same phone already exists."
+        conflict = get_registration_conflict(username, email, phone)
+        if conflict is not None:
+            msg = f"User {username} with the same {conflict} already exists."
             return create_response(msg, status.HTTP_409_CONFLICT)
 
         if serializer.is_valid():
-            serializer.save()
-            get_user = User.objects.filter(username=username).first()
-            get_user.set_password(password)
-            get_user.save()
+            try:
+                # password is hashed inside the serializer, so the user row is written once
+                serializer.save()
+            except IntegrityError:
+                msg = f"User {username} with the same username, email or phone already exists."
+                return create_response(msg, status.HTTP_409_CONFLICT)
             msg = "Account created successfully, please login"
             return create_response(msg, status.HTTP_201_CREATED)
 
@@ -137,7 +141,7 @@ class RegisterUserAPIView(APIView):
         return create_response(msg, status.HTTP_400_BAD_REQUEST)
 
 
-class OTPVerificationView(APIView):
+class OTPVerificationView(AsyncAPIViewMixin, APIView):
     @extend_schema(
         request=OTPVerificationSerializer,
         responses={
@@ -148,57 +152,69 @@ class OTPVerificationView(APIView):
         summary="Verify OTP and authenticate user",
         description="Verifies the OTP sent to the user's phone and issues JWT tokens upon successful verification.",
     )
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = OTPVerificationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         phone = serializer.validated_data['phone']
         otp_code = serializer.validated_data['otp']
 
+        error_response, otp_util, auth = await sync_to_async(self.check_otp)(request, phone, otp_code)
+        if error_response is not None:
+            return error_response
+
+        # verify user
+        if await otp_util.averify_user():
+            msg = "OTP verified successfully. and user account verified successfully"
+        else:
+            msg = "OTP verified successfully. but user account not successfully verified"
+        return create_auth_response(msg, *auth, status.HTTP_200_OK)
+
+    def check_otp(self, request, phone, otp_code):
+        """
+        Run the OTP checks and build the tokens of the user.
+
+        Returns:
+            tuple: (error response or None, OtpUtil, (access_token, refresh_token, user_data))
+        """
         if not verify_phone(phone):
             msg = "Multiple accounts found. Please contact support. or account does not exist"
-            return create_response(msg, status.HTTP_400_BAD_REQUEST)
+            return create_response(msg, status.HTTP_400_BAD_REQUEST), None, None
 
         if get_user_phone(phone) is None:
             msg = "No user found with the given phone number"
-            return create_response(msg, status.HTTP_400_BAD_REQUEST)
+            return create_response(msg, status.HTTP_400_BAD_REQUEST), None, None
 
         user = get_user_phone(phone)
         otp_util = OtpUtil(user)
 
         if not otp_util.verify_otp_max_time():
             msg = "Too many OTP attempts. Try again later. (after 10 minutes)"
-            return create_response(msg, status.HTTP_400_BAD_REQUEST)
+            return create_response(msg, status.HTTP_400_BAD_REQUEST), None, None
 
         if not otp_util.verify_otp_expiry():
-            return create_response("OTP expired", status.HTTP_400_BAD_REQUEST)
+            return create_response("OTP expired", status.HTTP_400_BAD_REQUEST), None, None
 
         if otp_util.check_max_limit():
             msg = "Incorrect OTP. Too many attempts. Please try again after 5 minutes."
-            return create_response(msg, status.HTTP_400_BAD_REQUEST)
+            return create_response(msg, status.HTTP_400_BAD_REQUEST), None, None
 
         if not otp_util.verify_otp(otp_code):
             msg = "Invalid otp"
             msg = otp_util.decrease_max_retries()
-            return create_response(f"{msg}", status.HTTP_400_BAD_REQUEST)
+            return create_response(f"{msg}", status.HTTP_400_BAD_REQUEST), None, None
 
         # Verify OTP
         # --- JWT TOKEN GENERATION AND RETURN ---
-        refresh = RefreshToken.for_user(user)
+        refresh = get_token_for_user(user)
         access_token = refresh.access_token
         refresh_token = refresh
 
         user_serializer = UserProfileSerializer(user, context={'request': request})
         user_data = user_serializer.data
-
-        # verify user
-        if otp_util.verify_user():
-            msg = "OTP verified successfully. and user account verified successfully"
-        else:
-            msg = "OTP verified successfully. but user account not successfully verified"
-        return create_auth_response(msg, access_token, refresh_token, user_data, status.HTTP_200_OK)
+        return None, otp_util, (access_token, refresh_token, user_data)
 
 
-class RequestNewOTPView(APIView):
+class RequestNewOTPView(AsyncAPIViewMixin, APIView):
 
     @extend_schema(
         request=RequestNewOTPSerializer,
@@ -211,13 +227,13 @@ class RequestNewOTPView(APIView):
         summary="Request a new OTP code",
         description="Generates and sends a new OTP to the user's registered phone number.",
     )
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = RequestNewOTPSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         phone = serializer.validated_data['phone']
 
         try:
-            user = User.objects.get(phone=phone)
+            user = await User.objects.aget(phone=phone)
         except User.DoesNotExist:
             return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -225,15 +241,15 @@ class RequestNewOTPView(APIView):
         otp_code = str(random.randint(100000, 999999))
         user.otp = otp_code
         user.otp_expiry = timezone.now() + timedelta(minutes=2)
-        user.save()
+        await user.asave()
 
-        generate_and_send_otp(user)
+        await agenerate_and_send_otp(user)
         print(f"Sending OTP {otp_code} to {user.phone}")
 
         return Response({"detail": "New OTP sent successfully."}, status=status.HTTP_200_OK)
 
 
-class RequestResetOtpApiView(APIView):
+class RequestResetOtpApiView(AsyncAPIViewMixin, APIView):
     @extend_schema(
         request=None,
         responses={
@@ -244,21 +260,22 @@ class RequestResetOtpApiView(APIView):
         summary="Request OTP for password reset",
         description="Sends an OTP to the user's registered phone number for password reset verification.",
     )
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         phone = request.data.get('phone')
-        if not check_user_by_phone(phone):
+        if not await sync_to_async(check_user_by_phone)(phone):
             msg = "No user found with given phone number"
             return create_response(msg, response_status=status.HTTP_400_BAD_REQUEST)
-        if not verify_phone(phone):
+        if not await sync_to_async(verify_phone)(phone):
             msg = "The phone number have more than one account, contact system admin"
             return create_response(msg, response_status=status.HTTP_400_BAD_REQUEST)
 
-        user = get_user_phone(phone)
+        user = await sync_to_async(get_user_phone)(phone)
         otp_util = OtpUtil(user, reset_otp=True)
 
-        if otp_util.generate_and_send_otp():
+        otp_is_sent, _ = await otp_util.agenerate_and_send_otp()
+        if otp_is_sent:
             msg = "OTP sent to your phone for verification."
-            data = UserProfileSerializer(user, context={'request': request}).data
+            data = await sync_to_async(lambda: UserProfileSerializer(user, context={'request': request}).data)()
             return create_response(msg, response_status=status.HTTP_200_OK, total_item=1, data=data)
         else:
             msg = "Fail to request token Please contact support."
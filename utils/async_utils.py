@@ -0,0 +1,75 @@
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+DEFAULT_VENDOR_POOL_SIZE = 10
+
+_vendor_executors = {}
+_vendor_executors_lock = threading.Lock()
+
+
+def get_vendor_executor(vendor):
+    """
+    Return the bounded thread pool used for blocking calls to one vendor SDK.
+
+    Pool sizes come from VENDOR_THREAD_POOL_SIZES (e.g. {'selcom': 20, 'sms': 10}),
+    so a slow gateway can hold at most that many threads; further calls queue.
+    """
+    with _vendor_executors_lock:
+        executor = _vendor_executors.get(vendor)
+        if executor is None:
+            size = getattr(settings, 'VENDOR_THREAD_POOL_SIZES', {}).get(vendor, DEFAULT_VENDOR_POOL_SIZE)
+            executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"vendor-{vendor}")
+            _vendor_executors[vendor] = executor
+    return executor
+
+
+async def run_vendor_call(vendor, func, *args, **kwargs):
+    """
+    Await a blocking vendor SDK call (Selcom, NextSMS) on the vendor's bounded pool.
+
+    `func` must only do network I/O: pool threads are not database threads,
+    so any ORM work belongs in sync_to_async before or after the call.
+    """
+    executor = get_vendor_executor(vendor)
+    return await sync_to_async(func, thread_sensitive=False, executor=executor)(*args, **kwargs)
+
+
+class AsyncAPIViewMixin:
+    """
+    Let a DRF APIView declare `async def` handlers.
+
+    Authentication, permission and throttling checks may query the database,
+    so they run through sync_to_async; the handler runs on the event loop and
+    wraps its own ORM work the same way. Under ASGI a request waiting on a
+    gateway then holds no worker thread. Under WSGI the view still works,
+    Django runs it in a one-off event loop.
+
+    Put it before APIView (or a subclass) in the bases.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            # options() and http_method_not_allowed() stay synchronous
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache whose entries expire after `ttl` seconds.
+
+    Used for hot lookups that may be slightly stale but must not hit the
+    database on every request.
+    """
+
+    def __init__(self, ttl, max_size=10000):
+        """
+        Args:
+            ttl (float): Seconds an entry stays valid.
+            max_size (int): Entries kept before the cache is cleared to bound memory.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_size:
+                self._data.clear()
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_set(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` to fill it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _version_key(name):
+    return f"cache-version:{name}"
+
+
+def get_cache_versions(*names):
+    """
+    Return the current version number of each named cache namespace from the shared cache.
+
+    Versions start at 1 and are only ever incremented, so a key built from them
+    changes as soon as any process calls bump_cache_version().
+    """
+    keys = [_version_key(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, 1, timeout=None)
+    return tuple(found.get(key, 1) for key in keys)
+
+
+def bump_cache_version(name):
+    """Invalidate every entry stored under the current version of `name`."""
+    key = _version_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
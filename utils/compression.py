@@ -0,0 +1,248 @@
+import gzip
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# server preference when the client accepts several encodings with the same quality
+ENCODINGS = tuple(
+    encoding for encoding, available in (('zstd', zstandard), ('br', brotli), ('gzip', gzip)) if available
+)
+DEFAULT_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+DEFAULT_PRECOMPRESSION_LEVELS = {'zstd': 12, 'br': 9, 'gzip': 9}
+DEFAULT_CONTENT_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml', 'application/x-ndjson',
+    'application/vnd.oai.openapi', 'image/svg+xml',
+)
+
+
+def _min_size():
+    return getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+def _levels():
+    return {**DEFAULT_LEVELS, **getattr(settings, 'COMPRESSION_LEVELS', {})}
+
+
+def parse_accept_encoding(header):
+    """Return {coding: quality} for an Accept-Encoding header."""
+    accepted = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header, available=ENCODINGS):
+    """
+    Pick the content coding for a response from the Accept-Encoding header.
+
+    The client's highest quality wins, ties go to the order of `available`.
+    Returns None when the response should be sent uncompressed.
+    """
+    accepted = parse_accept_encoding(header)
+    if not accepted:
+        return None
+    candidates = [
+        (accepted.get(encoding, accepted.get('*', 0.0)), -index, encoding)
+        for index, encoding in enumerate(available)
+    ]
+    quality, _, encoding = max(candidates, default=(0.0, 0, None))
+    return encoding if quality > 0 else None
+
+
+def compress(data, encoding, level=None):
+    """Compress bytes with gzip, br or zstd."""
+    level = level if level is not None else _levels()[encoding]
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+class StreamCompressor:
+    """Incremental compressor whose output is flushed after every chunk so streamed rows reach the client."""
+
+    def __init__(self, encoding, level=None):
+        level = level if level is not None else _levels()[encoding]
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, chunk):
+        if self.encoding == 'gzip':
+            return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _as_bytes(chunk):
+    return chunk.encode() if isinstance(chunk, str) else bytes(chunk)
+
+
+def compress_sequence(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(_as_bytes(chunk))
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_sequence(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(_as_bytes(chunk))
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def is_compressible(content_type):
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    content_types = getattr(settings, 'COMPRESSION_CONTENT_TYPES', DEFAULT_CONTENT_TYPES)
+    return any(media_type.startswith(prefix) for prefix in content_types)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with zstd, brotli or gzip, negotiated from Accept-Encoding.
+
+    brotli and zstd are used when the `brotli` / `zstandard` packages are
+    installed, gzip is always available. Responses are left alone when they
+    already carry a Content-Encoding (e.g. precompressed payloads), are
+    partial (206), have a content type outside COMPRESSION_CONTENT_TYPES or
+    are smaller than COMPRESSION_MIN_SIZE bytes. Streaming responses are
+    compressed chunk by chunk, so exports keep streaming.
+
+    Must come before any middleware that reads or rewrites the response body.
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.has_header('Content-Encoding')
+            or response.status_code == 206
+            or not is_compressible(response.get('Content-Type', ''))
+        ):
+            return response
+
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length is not None and int(length) < _min_size():
+                return response
+        elif len(response.content) < _min_size():
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_sequence(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content, encoding)
+            # the compressed length is unknown until the stream ends
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # the bytes differ from the uncompressed representation, so a strong ETag no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def precompress(content, encodings=ENCODINGS):
+    """
+    Compress a rendered payload once in every available encoding.
+
+    Returns:
+        dict: {'identity': content, 'gzip': ..., 'br': ..., 'zstd': ...}; only
+        identity for payloads below COMPRESSION_MIN_SIZE.
+    """
+    payload = {'identity': content}
+    if len(content) < _min_size():
+        return payload
+    levels = {**DEFAULT_PRECOMPRESSION_LEVELS, **getattr(settings, 'PRECOMPRESSION_LEVELS', {})}
+    for encoding in encodings:
+        compressed = compress(content, encoding, levels[encoding])
+        if len(compressed) < len(content):
+            payload[encoding] = compressed
+    return payload
+
+
+def precompressed_response(request, payload, response_status=200, content_type="application/json"):
+    """Serve the best encoding of a precompress() payload for the request; CompressionMiddleware skips it."""
+    encodings = [encoding for encoding in payload if encoding != 'identity']
+    encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), encodings) if encodings else None
+    response = HttpResponse(payload[encoding or 'identity'], status=response_status, content_type=content_type)
+    if encodings:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def get_precompressed_response(request, cache_key, build_content, timeout=None):
+    """
+    Serve a JSON payload from the cache, stored already compressed.
+
+    On a miss `build_content()` renders the body (e.g. with render_response),
+    which is compressed once per encoding and cached under `cache_key`, so
+    hits neither serialize nor compress. Exceptions raised by build_content
+    propagate and nothing is cached. A timeout of 0 turns the cache off.
+    """
+    if timeout == 0:
+        return precompressed_response(request, precompress(build_content()))
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = precompress(build_content())
+        cache.set(cache_key, payload, timeout)
+    return precompressed_response(request, payload)
@@ -0,0 +1,119 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+PRIMARY_PIN_COOKIE = 'db_primary'
+
+# the client wrote within REPLICA_STICKY_SECONDS (cookie set by ReplicaStickinessMiddleware)
+_client_pinned = ContextVar('client_pinned_to_primary', default=False)
+# the current request or job wrote, so its later reads must see the write
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def _sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def _written_key(scope):
+    return f"db-written:{scope}"
+
+
+def _has_shared_cache():
+    return bool(getattr(settings, 'CACHE_URL', ''))
+
+
+def mark_written(scope):
+    """
+    Read `scope` (e.g. 'properties') from the primary for REPLICA_STICKY_SECONDS, for every client.
+
+    Used for data that is cached for all users after a write, so a lagging
+    replica cannot put the old rows back into the cache. The mark is kept in
+    the shared cache (CACHE_URL), where every worker and cron process sees it.
+    """
+    if get_replicas() and _has_shared_cache():
+        cache.set(_written_key(scope), True, _sticky_seconds())
+
+
+def get_read_db(scope=None):
+    """
+    Return the database alias read-only selectors should query.
+
+    A random replica from DATABASE_REPLICAS, or the primary when there are no
+    replicas, when the client or the current request wrote recently, inside
+    a transaction, or while `scope` was marked written. Without a shared
+    cache a mark made by another process cannot be seen, so reads of a
+    `scope` then always go to the primary.
+
+    Bind it when the queryset is built, querysets are lazy:
+        Property.objects.using(get_read_db('properties')).filter(...)
+    """
+    replicas = get_replicas()
+    if (
+        not replicas
+        or _client_pinned.get()
+        or _wrote.get()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        or (scope and (not _has_shared_cache() or cache.get(_written_key(scope))))
+    ):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+class PrimaryReplicaRouter:
+    """
+    Keep every write and migration on the primary.
+
+    Reads go to the primary unless a selector asks for get_read_db(); objects
+    loaded from a replica are still saved to the primary, and the request is
+    then pinned to the primary so it reads its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaStickinessMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes for replica reads.
+
+    A request that wrote to the primary sets a short-lived cookie; requests
+    carrying it read from the primary until it expires (REPLICA_STICKY_SECONDS),
+    so a client never sees its own change disappear because a replica lags.
+    """
+
+    def process_request(self, request):
+        # thread and task state is reused between requests, so reset it on every request
+        _client_pinned.set(PRIMARY_PIN_COOKIE in request.COOKIES)
+        _wrote.set(False)
+
+    def process_response(self, request, response):
+        if _wrote.get() and get_replicas():
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, '1',
+                max_age=_sticky_seconds(),
+                httponly=True,
+                samesite='Lax',
+                secure=getattr(settings, 'SESSION_COOKIE_SECURE', False),
+            )
+        return response
@@ -0,0 +1,267 @@
+import csv
+import tempfile
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from utils.response_utils import create_response
+
+EXPORT_CHUNK_SIZE = 2000
+# rows (or file blocks) pulled from the database thread per step of an async export
+ASYNC_EXPORT_BATCH_SIZE = 500
+FILE_BLOCK_SIZE = 64 * 1024
+EXPORT_FORMATS = ('csv', 'ndjson', 'xlsx')
+CONTENT_TYPES = {
+    'csv': "text/csv",
+    'ndjson': "application/x-ndjson",
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class Echo:
+    """File-like object whose write() returns the value, so csv.writer rows can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+class ExportDataset:
+    """
+    A named table that can be exported, with the field paths that may be selected.
+
+    Args:
+        name (str): Used in file names, e.g. "payments"
+        get_queryset (callable): Returns the rows to export
+        fields (tuple): Exportable field paths for values_list, e.g. 'order__order_id'
+    """
+
+    def __init__(self, name, get_queryset, fields):
+        self.name = name
+        self.get_queryset = get_queryset
+        self.fields = tuple(fields)
+
+    def resolve_fields(self, requested=None):
+        """
+        Return the requested fields (comma separated string or list), or all fields.
+
+        Raises:
+            ValueError: If a requested field is not exportable.
+        """
+        if not requested:
+            return list(self.fields)
+        if isinstance(requested, str):
+            requested = [field.strip() for field in requested.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown export fields: {', '.join(unknown)}")
+        return list(requested)
+
+
+def export_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a tuple per row with the values of `fields`, reading the queryset with a server-side cursor."""
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def export_filename(name, extension):
+    return f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{extension}"
+
+
+def iter_csv(queryset, fields, headers):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in export_rows(queryset, fields):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(queryset, fields):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in export_rows(queryset, fields):
+        yield encoder.encode(dict(zip(fields, row))) + "\n"
+
+
+def is_asgi_request(request):
+    """True when the (DRF or Django) request is served by the ASGI handler."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def aiter_chunks(chunks, batch_size=ASYNC_EXPORT_BATCH_SIZE):
+    """
+    Async iterator over a blocking iterator of str or bytes chunks.
+
+    Under ASGI Django reads a sync StreamingHttpResponse iterator into memory
+    before sending anything, so exports hand it this instead. The chunks are
+    pulled `batch_size` at a time on Django's database thread, where the
+    queryset cursor lives, and each batch is sent as one piece.
+    """
+    iterator = iter(chunks)
+    take = sync_to_async(lambda: list(islice(iterator, batch_size)), thread_sensitive=True)
+    while batch := await take():
+        yield ''.join(batch) if isinstance(batch[0], str) else b''.join(batch)
+
+
+def _streaming_response(chunks, export_format, filename, asynchronous=False):
+    response = StreamingHttpResponse(
+        aiter_chunks(chunks) if asynchronous else chunks, content_type=CONTENT_TYPES[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_csv(queryset, fields, headers, filename, asynchronous=False):
+    """
+    Stream a queryset as CSV without building the file in memory.
+
+    Args:
+        queryset: Rows to export
+        fields (list): Field paths passed to values_list, e.g. 'order__order_id'
+        headers (list): Header row
+        filename (str): Name offered to the browser
+        asynchronous (bool): Stream through an async iterator, for requests served under ASGI
+    """
+    return _streaming_response(iter_csv(queryset, fields, headers), 'csv', filename, asynchronous)
+
+
+def stream_ndjson(queryset, fields, filename, asynchronous=False):
+    """Stream a queryset as newline delimited JSON, one object per row."""
+    return _streaming_response(iter_ndjson(queryset, fields), 'ndjson', filename, asynchronous)
+
+
+def _xlsx_value(value):
+    # Excel cannot store timezone aware datetimes
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    if value is not None and not isinstance(value, (int, float, str, bool, datetime)):
+        return str(value)
+    return value
+
+
+def write_xlsx(queryset, fields, headers, output, sheet_title="Export"):
+    """
+    Write a queryset to `output` (path or binary file) with an openpyxl write-only workbook.
+
+    Rows are written one at a time and openpyxl spools them to disk, so memory
+    stays flat regardless of the number of rows.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title[:31])
+    sheet.append(headers)
+    for row in export_rows(queryset, fields):
+        sheet.append([_xlsx_value(value) for value in row])
+    workbook.save(output)
+
+
+def _file_blocks(file):
+    with file:
+        yield from iter(lambda: file.read(FILE_BLOCK_SIZE), b'')
+
+
+def export_xlsx(queryset, fields, headers, filename, sheet_title="Export", asynchronous=False):
+    """Export a queryset as an XLSX download, spooled through a temporary file."""
+    output = tempfile.TemporaryFile()
+    write_xlsx(queryset, fields, headers, output, sheet_title=sheet_title)
+    output.seek(0)
+    if asynchronous:
+        return _streaming_response(_file_blocks(output), 'xlsx', filename, asynchronous)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=CONTENT_TYPES['xlsx'])
+
+
+def export_response(dataset, export_format, fields=None, request=None):
+    """
+    Build the download response for a dataset in csv, ndjson or xlsx.
+
+    Pass the request so that under ASGI the file is streamed through an async
+    iterator instead of being read into memory by the handler.
+
+    Raises:
+        ValueError: For an unknown format or field.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}, expected one of {', '.join(EXPORT_FORMATS)}")
+    fields = dataset.resolve_fields(fields)
+    queryset = dataset.get_queryset()
+    filename = export_filename(dataset.name, export_format)
+    asynchronous = request is not None and is_asgi_request(request)
+    if export_format == 'csv':
+        return stream_csv(queryset, fields, fields, filename, asynchronous)
+    if export_format == 'ndjson':
+        return stream_ndjson(queryset, fields, filename, asynchronous)
+    return export_xlsx(queryset, fields, fields, filename, sheet_title=dataset.name, asynchronous=asynchronous)
+
+
+class ExportAPIView(APIView):
+    """
+    Admin only API view that downloads an ExportDataset.
+
+    Subclasses set `dataset` and describe the endpoint with
+    @extend_schema_view(get=extend_schema(...)).
+    """
+    permission_classes = [IsAdminUser]
+    dataset = None
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('file_format', str, enum=EXPORT_FORMATS, description="csv (default), ndjson or xlsx"),
+            OpenApiParameter('fields', str, description="Comma separated fields to export (default: all)"),
+        ],
+        responses={200: OpenApiTypes.BINARY, 400: "Unknown format or field"},
+    )
+    def get(self, request):
+        try:
+            return export_response(
+                self.dataset, request.query_params.get('file_format', 'csv'), request.query_params.get('fields'),
+                request=request,
+            )
+        except ValueError as ex:
+            return create_response(str(ex), status.HTTP_400_BAD_REQUEST)
+
+
+class ExportCommand(BaseCommand):
+    """
+    Base management command that exports an ExportDataset to a file or stdout.
+
+    Subclasses set `dataset`.
+    """
+    dataset = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--fields', help="Comma separated fields to export (default: all)")
+        parser.add_argument('--output', help="File to write; csv and ndjson go to stdout when omitted")
+
+    def handle(self, *args, **options):
+        export_format = options['format']
+        output = options['output']
+        try:
+            fields = self.dataset.resolve_fields(options['fields'])
+        except ValueError as ex:
+            raise CommandError(str(ex))
+
+        queryset = self.dataset.get_queryset()
+        if export_format == 'xlsx':
+            if not output:
+                raise CommandError("--output is required for xlsx exports")
+            write_xlsx(queryset, fields, fields, output, sheet_title=self.dataset.name)
+        else:
+            chunks = iter_csv(queryset, fields, fields) if export_format == 'csv' else iter_ndjson(queryset, fields)
+            if output:
+                with open(output, 'w', newline='', encoding='utf-8') as stream:
+                    stream.writelines(chunks)
+            else:
+                for chunk in chunks:
+                    self.stdout.write(chunk, ending='')
+
+        if output:
+            self.stderr.write(f"Exported {self.dataset.name} to {output}")
@@ -3,11 +3,17 @@ import nextsms
 import uuid
 import json
 from django.core.files.base import ContentFile
-from payment.models import CustomerOrder, OrderStaticConfig
+from payment.models import CustomerOrder
+from payment.registry import payment_config_registry
+from utils.async_utils import run_vendor_call
 from utils.logger import AppLogger
+from utils.metrics import track_gateway_call
+from utils.tracing import CLIENT, traced
 
 logger = AppLogger(__name__)
 
+@traced('nextsms.send_sms', kind=CLIENT)
+@track_gateway_call('nextsms', 'send_sms')
 def send_sms_to_user(phone: str, msg: str) -> dict:
     """Send SMS to user using NextSMS gateway.
     Args:
@@ -27,6 +33,11 @@ def send_sms_to_user(phone: str, msg: str) -> dict:
     return {'msg': 'success', 'results': responses}
 
 
+async def asend_sms_to_user(phone: str, msg: str) -> dict:
+    """Async send_sms_to_user, run on the bounded 'sms' vendor pool."""
+    return await run_vendor_call('sms', send_sms_to_user, phone, msg)
+
+
 def is_customer_paid_func(customer) -> bool:
     """Check if customer has unpaid orders.
     Returns:
@@ -42,9 +53,9 @@ def get_active_static_config():
     """Get the first active static configuration.
 
     Returns:
-        OrderStaticConfig: The first active config instance or None if none exists
+        StaticConfigSnapshot: The first active config or None if none exists
     """
-    return OrderStaticConfig.objects.filter(active=True).first()
+    return payment_config_registry.get_static_config()
 
 
 def has_active_static_config() -> bool:
@@ -53,7 +64,7 @@ def has_active_static_config() -> bool:
     Returns:
         bool: True if at least one active config exists, False otherwise
     """
-    return OrderStaticConfig.objects.filter(active=True).exists()
+    return payment_config_registry.get_static_config() is not None
 
 
 def create_file_from_base64(base64_str, ext="jpg"):
@@ -15,7 +15,7 @@ def generate_short_uuid():
     return str(uuid.uuid4())[:28].upper()
 
 
-def generate_order_id():
+def generate_order_id(seq_number=None):
     from payment.models import OrderNumberGenerator
     """
     Generates a formatted order ID with the following structure:
@@ -28,6 +28,10 @@ def generate_order_id():
 
     The ID ensures consistent length and readability with separators.
 
+    Args:
+        seq_number (int): A number already reserved with OrderNumberGenerator.reserve_numbers().
+                          A new one is taken from the database when omitted.
+
     Returns:
         str: Formatted order ID string
     """
@@ -35,7 +39,8 @@ def generate_order_id():
     date_part = timezone.now().strftime('%y%m%d')
 
     # Get next sequential number from database
-    seq_number = OrderNumberGenerator.get_next_number()
+    if seq_number is None:
+        seq_number = OrderNumberGenerator.get_next_number()
 
     # Combine date and sequence number
     combined = f"{date_part}{seq_number}"
@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hashing_executor():
+    """
+    Return the process wide thread pool used for password hashing.
+
+    The pool size is PASSWORD_HASHING_MAX_WORKERS, so no more than that many
+    hashes are computed at once no matter how many requests are logging in.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PASSWORD_HASHING_MAX_WORKERS', 2),
+                    thread_name_prefix='password-hashing',
+                )
+    return _executor
+
+
+def run_bounded(func, *args, **kwargs):
+    """Run a hashing function on the bounded pool and wait for its result."""
+    return get_hashing_executor().submit(func, *args, **kwargs).result()
+
+
+class BoundedEncodeMixin:
+    """Compute encode() on the hashing pool. verify() of these hashers calls encode(), so it is bounded too."""
+
+    def encode(self, password, salt, *args, **kwargs):
+        return run_bounded(super().encode, password, salt, *args, **kwargs)
+
+
+class ScryptPasswordHasher(BoundedEncodeMixin, hashers.ScryptPasswordHasher):
+    work_factor = getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)
+    block_size = getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', 8)
+    parallelism = getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', 1)
+
+
+class PBKDF2PasswordHasher(BoundedEncodeMixin, hashers.PBKDF2PasswordHasher):
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id with tunable cost. Requires the argon2-cffi package."""
+    time_cost = getattr(settings, 'PASSWORD_ARGON2_TIME_COST', 2)
+    memory_cost = getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', 19456)
+    parallelism = getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', 1)
+
+    # argon2's verify() does not go through encode(), so both are bounded separately
+    def encode(self, password, salt):
+        return run_bounded(super().encode, password, salt)
+
+    def verify(self, password, encoded):
+        return run_bounded(super().verify, password, encoded)
+
@@ -0,0 +1,47 @@
+"""
+Run locks for jobs that must not overlap, e.g. an every-minute cron whose run can outlast the minute.
+"""
+import uuid
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+
+
+def _advisory_locks_available():
+    # PgBouncer in transaction mode hands each transaction a different server session
+    return connection.vendor == 'postgresql' and not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS')
+
+
+@contextmanager
+def run_lock(name, timeout=60 * 60):
+    """
+    Hold the lock `name` for the duration of the block, yielding False without waiting if another run holds it.
+
+    On PostgreSQL this is a session-level advisory lock: it survives the
+    transactions committed inside the block and is released by the server when
+    a killed run's connection closes. Elsewhere it is an entry in the shared
+    cache, which expires after `timeout` seconds if the run dies.
+    """
+    if _advisory_locks_available():
+        key = zlib.crc32(name.encode())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+        return
+
+    key = f"run-lock:{name}"
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
@@ -1,29 +1,49 @@
 # logger.py
 import os
 import logging
+import threading
 from datetime import datetime
 
 
+_configure_lock = threading.Lock()
+
+
 class AppLogger:
     def __init__(self, name=__name__, log_dir="logs"):
         """
         Initialize the logger with a name and log directory.
 
+        Nothing is created at import time: the log directory and handlers are
+        set up on the first message, once per logger name.
+
         Args:
             name (str): Name of the logger (usually __name__)
             log_dir (str): Directory to store log files
         """
-        self._setup_log_directory(log_dir)
-        self.logger = logging.getLogger(name)
-        self._configure_logger(log_dir)
+        self.name = name
+        self.log_dir = log_dir
+        self._logger = None
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            with _configure_lock:
+                logger = logging.getLogger(self.name)
+                # several AppLogger instances may share a name; add the handlers only once
+                if not getattr(logger, '_app_logger_configured', False):
+                    self._setup_log_directory(self.log_dir)
+                    self._configure_logger(logger, self.log_dir)
+                    logger._app_logger_configured = True
+                self._logger = logger
+        return self._logger
 
     def _setup_log_directory(self, log_dir):
         """Create log directory if it doesn't exist"""
         if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+            os.makedirs(log_dir, exist_ok=True)
             self._log_to_file(f"Created logs directory at {os.path.abspath(log_dir)}", "info")
 
-    def _configure_logger(self, log_dir):
+    def _configure_logger(self, logger, log_dir):
         """Configure logging settings"""
         log_filename = datetime.now().strftime("%Y-%m-%d") + ".log"
         log_filepath = os.path.join(log_dir, log_filename)
@@ -32,16 +52,16 @@ class AppLogger:
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
         # Configure handlers
-        file_handler = logging.FileHandler(log_filepath)
+        file_handler = logging.FileHandler(log_filepath, delay=True)
         file_handler.setFormatter(formatter)
 
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
 
         # Add handlers and set level
-        self.logger.setLevel(logging.INFO)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
 
     def info(self, message):
         """Log an info message"""
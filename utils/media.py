@@ -0,0 +1,273 @@
+"""
+Media delivery: content-hashed upload names, image variants and a serving view.
+
+Uploads are stored as "<name>.<content hash><ext>", so a URL always points
+at the same bytes and is served with a one-year immutable Cache-Control.
+Image variants and files uploaded before hashing get MEDIA_CACHE_MAX_AGE:
+a variant URL names the variant, not its width, so its bytes change when
+MEDIA_IMAGE_VARIANTS does.
+
+serve_media answers /media/<path>[?variant=thumb]. With MEDIA_SERVE_MODE
+"x-accel" (nginx) or "x-sendfile" (Apache, lighttpd) it only sets the headers
+and the web server sends the file, ranges included. The nginx side:
+
+    location /protected-media/ {
+        internal;
+        alias /srv/mhp/media/;
+    }
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.crypto import get_random_string
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from utils.logger import AppLogger
+
+logger = AppLogger(__name__)
+
+HASH_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+VARIANTS_DIR = 'variants'
+STREAM_CHUNK_SIZE = 64 * 1024
+VARIANT_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+_HASHED_NAME = re.compile(rf"\.([0-9a-f]{{{HASH_LENGTH}}})\.[^./]+$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def content_hash(content):
+    sha = hashlib.sha256()
+    for chunk in content.chunks():
+        sha.update(chunk)
+    content.seek(0)
+    return sha.hexdigest()[:HASH_LENGTH]
+
+
+class HashedNameMixin:
+    """
+    Storage mixin that puts the content hash in every saved name, e.g. property/images/ab12.9f86d081884c.jpg.
+
+    Every save writes its own file, even for bytes already stored under the
+    same name: that name gets a random suffix ahead of the hash, e.g.
+    ab12_Xk3v9Qa.9f86d081884c.jpg. Records never share a file, so deleting
+    one record's file cannot break another.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        root, ext = os.path.splitext(name)
+        return super().save(f"{root}.{content_hash(content)}{ext}", content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        match = _HASHED_NAME.search(name)
+        if match is None:
+            return super().get_available_name(name, max_length=max_length)
+        # as Storage.get_available_name, but the suffix goes ahead of the hash and a taken name is never
+        # overwritten, which S3Storage would do
+        stem, hashed_ext = name[:match.start()], name[match.start():]
+        while self.exists(name) or (max_length and len(name) > max_length):
+            name = f"{stem}_{get_random_string(7)}{hashed_ext}"
+            excess = len(name) - max_length if max_length else 0
+            if excess > 0:
+                stem = stem[:-excess]
+                if not os.path.basename(stem):
+                    raise SuspiciousFileOperation(f'Storage can not find an available filename for "{name}".')
+                name = f"{stem}_{get_random_string(7)}{hashed_ext}"
+        return name
+
+
+class HashedFileSystemStorage(HashedNameMixin, FileSystemStorage):
+    pass
+
+
+def get_image_variants():
+    """Variant name -> maximum width in pixels, from MEDIA_IMAGE_VARIANTS."""
+    return getattr(settings, 'MEDIA_IMAGE_VARIANTS', {})
+
+
+def media_url(file, request=None, variant=None):
+    """
+    Absolute URL of a stored file, or None when the field is empty.
+
+    `variant` (a key of MEDIA_IMAGE_VARIANTS) asks serve_media for a resized copy;
+    files in object storage are linked directly, in their original size.
+    """
+    if not file:
+        return None
+    url = file.url
+    if variant and isinstance(file.storage, FileSystemStorage):
+        url = f"{url}?variant={variant}"
+    if request is not None:
+        return request.build_absolute_uri(url)
+    # object storages return absolute URLs already
+    return url if urlsplit(url).scheme else f"{settings.BASE_URL}{url}"
+
+
+def _variant_path(path, variant, width):
+    # the width is part of the path so a changed MEDIA_IMAGE_VARIANTS builds new files instead of reusing old
+    # sizes; the URL only names the variant, so browsers revalidate it through the ETag
+    return os.path.join(VARIANTS_DIR, f"{variant}-{width}", path)
+
+
+def _build_variant(source, target, width):
+    """Write a copy of the image at `source` at most `width` pixels wide; False if it is not a supported image."""
+    try:
+        with Image.open(source) as image:
+            image_format = image.format
+            if image_format not in VARIANT_FORMATS:
+                return False
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                image.thumbnail((width, image.height * width // image.width or 1))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temporary = f"{target}.{uuid.uuid4().hex}.tmp"
+            options = {'quality': 85, 'optimize': True} if image_format in ('JPEG', 'WEBP') else {}
+            image.save(temporary, format=image_format, **options)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning(f"⚠️ Cannot build a {width}px variant of {source}: {e}")
+        return False
+    # concurrent requests for the same variant each write their own file; the last rename wins
+    os.replace(temporary, target)
+    return True
+
+
+def resolve_media(path, variant=None):
+    """
+    Return (relative path, absolute path) of the file to serve for a media request.
+
+    A variant is built on first use and kept under MEDIA_ROOT/variants; when
+    the file is not an image it falls back to the original.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Media not found")
+    if path.startswith(f"{VARIANTS_DIR}/") or not os.path.isfile(full_path):
+        raise Http404("Media not found")
+    if not variant:
+        return path, full_path
+
+    width = get_image_variants().get(variant)
+    if width is None:
+        raise Http404("Unknown image variant")
+    variant_path = _variant_path(path, variant, width)
+    variant_full_path = os.path.join(settings.MEDIA_ROOT, variant_path)
+    if os.path.isfile(variant_full_path) or _build_variant(full_path, variant_full_path, width):
+        return variant_path, variant_full_path
+    return path, full_path
+
+
+def _parse_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, None to send the whole file, or False when it cannot be satisfied.
+
+    Multiple ranges are answered with the whole file, which RFC 9110 allows.
+    """
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _stream(full_path, start, length):
+    with open(full_path, 'rb') as media_file:
+        media_file.seek(start)
+        while length > 0:
+            chunk = media_file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with cache validators, range support and optional image variants.
+
+    The transfer itself is left to the web server when MEDIA_SERVE_MODE is
+    "x-accel" (X-Accel-Redirect to MEDIA_ACCEL_PREFIX) or "x-sendfile".
+    """
+    relative_path, full_path = resolve_media(path, request.GET.get('variant'))
+    stat = os.stat(full_path)
+    hashed = _HASHED_NAME.search(path)
+    if hashed:
+        # a variant is named after its directory, e.g. "9f86d081884c-thumb-480"
+        etag = hashed.group(1) if relative_path == path else f"{hashed.group(1)}-{relative_path.split('/', 2)[1]}"
+    else:
+        etag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    etag = f'"{etag}"'
+    if hashed and relative_path == path:
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+    last_modified = http_date(stat.st_mtime)
+
+    if_none_match = request.headers.get('If-None-Match')
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if (if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]) or (
+        not if_none_match and if_modified_since and int(stat.st_mtime) <= if_modified_since
+    ):
+        response = HttpResponseNotModified()
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+    if mode == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response.headers['X-Accel-Redirect'] = f"{settings.MEDIA_ACCEL_PREFIX.rstrip('/')}/{relative_path}"
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response.headers['X-Sendfile'] = full_path
+    else:
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if 'Range' in request.headers and (if_range is None or if_range in (etag, last_modified)):
+            byte_range = _parse_range(request.headers['Range'], stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response.headers['Content-Range'] = f"bytes */{stat.st_size}"
+            return response
+        start, end = byte_range or (0, stat.st_size - 1)
+        length = end - start + 1 if stat.st_size else 0
+        response = StreamingHttpResponse(
+            _stream(full_path, start, length) if request.method == 'GET' else iter(()),
+            status=206 if byte_range else 200, content_type=content_type,
+        )
+        response.headers['Content-Length'] = str(length)
+        if byte_range:
+            response.headers['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+        response.headers['Accept-Ranges'] = 'bytes'
+
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,245 @@
+import atexit
+import fcntl
+import operator
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.deprecation import MiddlewareMixin
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess, values,
+)
+from prometheus_client.mmap_dict import MmapedDict
+
+# Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR and /metrics sums them.
+# A cron run writes under "cron-<job>-<pid>" and folds its files into the job's "cron-<job>" files at exit,
+# so overlapping runs never share a file and the directory does not grow by one set of files per run.
+_process_identity = {'value': None}
+_folded_cron_jobs = set()
+# how the samples of a finished run are combined with those of the job; other files are dropped
+CRON_FOLDED_FILES = {'counter': operator.add, 'histogram': operator.add, 'gauge_max': max, 'gauge_min': min}
+
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    values.ValueClass = values.MultiProcessValue(process_identifier=lambda: _process_identity['value'] or os.getpid())
+
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS')
+
+HTTP_REQUESTS = Counter(
+    'mhp_http_requests_total', "HTTP requests by view, method and status", ['view', 'method', 'status'],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'mhp_http_request_duration_seconds', "Time to build the response, by view", ['view', 'method'],
+)
+HTTP_REQUEST_QUERIES = Histogram(
+    'mhp_http_request_db_queries', "Database queries per request, by view", ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+GATEWAY_REQUEST_DURATION = Histogram(
+    'mhp_gateway_request_duration_seconds', "Outbound calls to Selcom and NextSMS",
+    ['gateway', 'operation', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+WEBHOOK_EVENTS = Counter(
+    'mhp_payment_webhook_events_total', "Payment webhook deliveries by outcome", ['outcome'],
+)
+CRON_RUNS = Counter('mhp_cron_runs_total', "Cron job runs by outcome", ['job', 'outcome'])
+CRON_DURATION = Histogram(
+    'mhp_cron_duration_seconds', "Cron job run time", ['job'],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+CRON_LAST_SUCCESS = Gauge(
+    'mhp_cron_last_success_timestamp_seconds', "Unix time of the last successful run", ['job'],
+    multiprocess_mode='max',
+)
+
+
+@contextmanager
+def track_gateway_call(gateway, operation):
+    """
+    Time an outbound gateway call, as a context manager or decorator.
+
+        @track_gateway_call('selcom', 'create_order')
+        def post_order(self, order_dict): ...
+
+    The outcome is "error" when the call raises, "ok" otherwise.
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        GATEWAY_REQUEST_DURATION.labels(gateway, operation, outcome).observe(time.perf_counter() - started)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fold_cron_samples(job, directory=None):
+    """
+    Merge the sample files of finished runs of a cron job into the job's own files.
+
+    Counters and histograms are added to "cron-<job>", max and min gauges keep
+    the extreme value. Files of the current process are folded, as are those
+    left behind by runs that were killed before they could fold their own.
+    """
+    directory = directory or os.environ['PROMETHEUS_MULTIPROC_DIR']
+    run_file = re.compile(rf"(?P<prefix>\w+)_cron-{re.escape(job)}-(?P<pid>\d+)\.db")
+    with open(os.path.join(directory, f"cron-{job}.lock"), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for filename in sorted(os.listdir(directory)):
+            match = run_file.fullmatch(filename)
+            if match is None or (int(match['pid']) != os.getpid() and _is_running(int(match['pid']))):
+                continue
+            path = os.path.join(directory, filename)
+            combine = CRON_FOLDED_FILES.get(match['prefix'])
+            if combine is not None:
+                job_file = MmapedDict(os.path.join(directory, f"{match['prefix']}_cron-{job}.db"))
+                try:
+                    folded = {key: value for key, value, _ in job_file.read_all_values()}
+                    for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(path):
+                        job_file.write_value(key, combine(folded[key], value) if key in folded else value, timestamp)
+                finally:
+                    job_file.close()
+            os.remove(path)
+
+
+def track_cron(job):
+    """Decorator counting the runs, failures and duration of a cron job."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if os.environ.get('PROMETHEUS_MULTIPROC_DIR') and job not in _folded_cron_jobs:
+                _folded_cron_jobs.add(job)
+                atexit.register(fold_cron_samples, job)
+            _process_identity['value'] = f"cron-{job}-{os.getpid()}"
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                CRON_RUNS.labels(job, 'error').inc()
+                raise
+            finally:
+                CRON_DURATION.labels(job).observe(time.perf_counter() - started)
+            CRON_RUNS.labels(job, 'ok').inc()
+            CRON_LAST_SUCCESS.labels(job).set(time.time())
+            return result
+        return wrapper
+    return decorator
+
+
+# execute wrappers of the request being served in this context; under ASGI concurrent requests run their
+# queries on the same thread and connection, so wrappers appended to the connection would see each other's queries
+_request_query_wrappers = ContextVar('request_query_wrappers', default=())
+
+
+def _run_request_query_wrappers(execute, sql, params, many, context):
+    for wrapper in reversed(_request_query_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def add_request_query_wrapper(wrapper):
+    """
+    Run `wrapper` (a database execute wrapper) for the queries of the current request only.
+
+    The wrappers are kept in a context variable, which asgiref carries into
+    sync_to_async calls, so each request only sees its own queries.
+    """
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if _run_request_query_wrappers not in wrappers:
+            wrappers.append(_run_request_query_wrappers)
+    _request_query_wrappers.set((*_request_query_wrappers.get(), wrapper))
+
+
+def remove_request_query_wrapper(wrapper):
+    _request_query_wrappers.set(tuple(item for item in _request_query_wrappers.get() if item is not wrapper))
+
+
+class QueryCounter:
+    """Database execute wrapper that counts the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def request_view(request):
+    """
+    The dotted path of the view that served the request, e.g. "payment.views.CustomerOrderApiView".
+
+    Several routes share a url name and the webhook route carries a secret, so
+    requests are labelled by view; the label values stay bounded.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view = getattr(match.func, 'view_class', match.func)
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Record latency, status and database query count of every request, labelled by view.
+
+    Put it first in MIDDLEWARE so the time spent in the other middleware counts.
+    """
+
+    def process_request(self, request):
+        request._metrics_started = time.perf_counter()
+        request._metrics_queries = QueryCounter()
+        add_request_query_wrapper(request._metrics_queries)
+
+    def process_response(self, request, response):
+        started = getattr(request, '_metrics_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        queries = request._metrics_queries
+        remove_request_query_wrapper(queries)
+
+        view = request_view(request)
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        HTTP_REQUESTS.labels(view, method, str(response.status_code)).inc()
+        HTTP_REQUEST_DURATION.labels(view, method).observe(duration)
+        HTTP_REQUEST_QUERIES.labels(view).observe(queries.count)
+        return response
+
+
+def metrics_view(request):
+    """
+    Serve the metrics in the Prometheus text format.
+
+    Requires "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is set,
+    which the production settings insist on.
+    Under gunicorn set PROMETHEUS_MULTIPROC_DIR for the master, workers and crons;
+    the samples of all of them are then aggregated here.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse("Unauthorized", status=401, content_type="text/plain")
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -2,9 +2,13 @@ import random
 from datetime import timedelta
 
 import nextsms
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 
+from utils.async_utils import run_vendor_call
 from utils.logger import AppLogger
+from utils.metrics import track_gateway_call
+from utils.tracing import CLIENT, traced
 
 logger = AppLogger(__name__)
 
@@ -23,7 +27,18 @@ class OtpUtil:
         self.send_otp(otp_code)
 
         print(f"sending otp {otp_code}")
+        return self.save_otp(otp_code), None
 
+    async def agenerate_and_send_otp(self):
+        """Async generate_and_send_otp: the SMS goes out on the bounded 'sms' vendor pool."""
+        if not self.user.phone:
+            return False, "User does not have phone number"
+
+        otp_code = str(random.randint(1000, 9999))
+        await run_vendor_call('sms', self.send_otp, otp_code)
+        return await sync_to_async(self.save_otp)(otp_code), None
+
+    def save_otp(self, otp_code):
         self.user.otp = otp_code
         self.user.otp_expiry = timezone.now() + timedelta(minutes=2)
         self.user.reset_otp = self.reset_otp
@@ -40,6 +55,8 @@ class OtpUtil:
         self.send_sms_to_user(self.user.phone, f"Your OTP is: {otp_code}")
         return True
 
+    @traced('nextsms.send_sms', kind=CLIENT)
+    @track_gateway_call('nextsms', 'send_sms')
     def send_sms_to_user(self, phone: str, msg: str) -> dict:
         """Send SMS to user using NextSMS gateway.
         Args:
@@ -89,13 +106,26 @@ class OtpUtil:
             self.logger.info(f"🔥DEBUG: Verifying user {self.user.username}")
             self.user.verified = True
             self.user.save()
-            msg = f"Congratulations, account with username {self.user.username} verified successfully"
-            self.send_sms_to_user(self.user.phone, msg)
+            self.send_sms_to_user(self.user.phone, self.verified_message())
+            return True
+        except Exception as e:
+            self.logger.error("❌Error: Error verifying user: " + str(e))
+            return False
+
+    async def averify_user(self):
+        try:
+            self.logger.info(f"🔥DEBUG: Verifying user {self.user.username}")
+            self.user.verified = True
+            await sync_to_async(self.user.save)()
+            await run_vendor_call('sms', self.send_sms_to_user, self.user.phone, self.verified_message())
             return True
         except Exception as e:
             self.logger.error("❌Error: Error verifying user: " + str(e))
             return False
 
+    def verified_message(self):
+        return f"Congratulations, account with username {self.user.username} verified successfully"
+
     # verify if the otp validity
     def verify_otp(self, otp_code):
         self.logger.error(f"🔥Debug:Verifying otp {otp_code}")
@@ -0,0 +1,26 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Newest-first cursor pagination on (created_at, id).
+
+    Each page is a keyset seek on an index led by created_at instead of an
+    OFFSET scan, so deep pages cost the same as the first one.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def paginate_queryset(queryset, request, view=None, pagination_class=CreatedAtCursorPagination):
+    """
+    Paginate a queryset with a cursor paginator.
+
+    Returns:
+        tuple: (list of objects on the page, dict with the `next` and `previous` links)
+    """
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    return page, {'next': paginator.get_next_link(), 'previous': paginator.get_previous_link()}
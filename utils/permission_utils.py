@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from users.selectors import user_has_perm
+
 
 class AddPermission(permissions.BasePermission):
     model = None
@@ -8,7 +10,7 @@ class AddPermission(permissions.BasePermission):
         if not self.model:
             return False
         perm = f"{self.model._meta.app_label}.add_{self.model._meta.model_name}"
-        return request.user.has_perm(perm)
+        return user_has_perm(request.user, perm)
 
 
 class ViewPermission(permissions.BasePermission):
@@ -18,7 +20,7 @@ class ViewPermission(permissions.BasePermission):
         if not self.model:
             return False
         perm = f"{self.model._meta.app_label}.view_{self.model._meta.model_name}"
-        return request.user.has_perm(perm)
+        return user_has_perm(request.user, perm)
 
 
 class ChangePermission(permissions.BasePermission):
@@ -28,7 +30,7 @@ class ChangePermission(permissions.BasePermission):
         if not self.model:
             return False
         perm = f"{self.model._meta.app_label}.change_{self.model._meta.model_name}"
-        return request.user.has_perm(perm)
+        return user_has_perm(request.user, perm)
 
 
 class DeletePermission(permissions.BasePermission):
@@ -38,7 +40,7 @@ class DeletePermission(permissions.BasePermission):
         if not self.model:
             return False
         perm = f"{self.model._meta.app_label}.delete_{self.model._meta.model_name}"
-        return request.user.has_perm(perm)
+        return user_has_perm(request.user, perm)
 
 
 class WebhookPermission(permissions.BasePermission):
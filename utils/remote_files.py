@@ -0,0 +1,119 @@
+"""
+Downloads of user supplied URLs, e.g. the image links of a bulk property import.
+
+Only http(s) URLs whose host resolves to public addresses are fetched, so an
+import cannot make the server read its own admin, the cloud metadata service
+(169.254.169.254) or anything else on the private network. Redirects are
+followed by hand and every hop is checked again. Each request connects to
+the address that was checked rather than resolving the host a second time,
+so a DNS answer that changes in between (DNS rebinding) cannot redirect it.
+Bodies are streamed and abandoned as soon as they exceed the size limit.
+"""
+import ipaddress
+import socket
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ALLOWED_SCHEMES = ('http', 'https')
+MAX_REDIRECTS = 3
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class RemoteFileError(Exception):
+    """The URL is not allowed or its response is not an acceptable file."""
+
+
+def _is_public_address(address):
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_public_url(url):
+    """
+    Raise RemoteFileError unless `url` is http(s) and every address its host resolves to is public.
+
+    Private, loopback, link-local, shared, reserved and multicast ranges are refused.
+
+    Returns:
+        list: The checked addresses, sorted
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ALLOWED_SCHEMES or not parts.hostname:
+        raise RemoteFileError(f"Only http and https URLs can be fetched: {url}")
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError) as ex:
+        raise RemoteFileError(f"Cannot resolve {parts.hostname}: {ex}")
+    blocked = sorted(address for address in addresses if not _is_public_address(address))
+    if blocked:
+        raise RemoteFileError(f"{parts.hostname} resolves to a non-public address: {', '.join(blocked)}")
+    return sorted(addresses)
+
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """
+    Transport adapter that connects to an already checked address instead of resolving the host again.
+
+    The URL is rewritten to the address, while the Host header, the TLS SNI
+    and the certificate check keep using the host name.
+    """
+
+    def __init__(self, hostname, address):
+        self.hostname = hostname
+        self.address = address
+        super().__init__()
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        host = f"[{self.address}]" if ':' in self.address else self.address
+        request.url = urlunsplit(parts._replace(netloc=f"{host}:{parts.port}" if parts.port else host))
+        request.headers['Host'] = f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname
+        if parts.scheme == 'https':
+            self.poolmanager.connection_pool_kw.update(server_hostname=self.hostname, assert_hostname=self.hostname)
+        return super().send(request, **kwargs)
+
+
+def fetch_remote_file(url, timeout, max_bytes, content_type_prefix='image/'):
+    """
+    Download a public http(s) URL and return (content bytes, final URL).
+
+    Args:
+        url (str): User supplied URL
+        timeout (int): Seconds for connecting and between received bytes
+        max_bytes (int): Largest accepted body
+        content_type_prefix (str): Required start of the Content-Type, e.g. "image/"
+
+    Raises:
+        RemoteFileError: For a refused URL or redirect, a wrong content type or an oversized body.
+        requests.RequestException: For network errors and error statuses.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        address = check_public_url(url)[0]
+        parts = urlsplit(url)
+        with requests.Session() as session:
+            session.mount(f"{parts.scheme}://", PinnedAddressAdapter(parts.hostname, address))
+            with session.get(url, timeout=timeout, stream=True, allow_redirects=False) as response:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers['Location'])
+                    continue
+                response.raise_for_status()
+
+                content_type = response.headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+                if not content_type.startswith(content_type_prefix):
+                    raise RemoteFileError(f"Unexpected content type {content_type or 'none'} for {url}")
+                declared = response.headers.get('Content-Length')
+                if declared and declared.isdigit() and int(declared) > max_bytes:
+                    raise RemoteFileError(f"{url} is {declared} bytes, the limit is {max_bytes}")
+
+                content = bytearray()
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    content += chunk
+                    if len(content) > max_bytes:
+                        raise RemoteFileError(f"{url} is larger than {max_bytes} bytes")
+                return bytes(content), url
+    raise RemoteFileError(f"More than {MAX_REDIRECTS} redirects for {url}")
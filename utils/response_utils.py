@@ -1,14 +1,37 @@
+from django.http import HttpResponse
 from rest_framework.response import Response
 
+from utils.renderers import dumps
 
-def create_response(msg, response_status, total_item=0, data=None):
+
+def _response_body(msg, response_status, total_item=0, data=None, extra=None):
     body = {
         "total_item": total_item,
         "detail": msg,
         "data": data,
         "status_code": response_status
     }
-    return Response(body, status=response_status)
+    if extra is not None:
+        body.update(extra)
+    return body
+
+
+def create_response(msg, response_status, total_item=0, data=None, extra=None):
+    return Response(_response_body(msg, response_status, total_item, data, extra), status=response_status)
+
+
+def render_response(msg, response_status, total_item=0, data=None, extra=None):
+    """Render the create_response body to JSON bytes once, e.g. to store it in a cache."""
+    return dumps(_response_body(msg, response_status, total_item, data, extra))
+
+
+def create_raw_response(content, response_status=200):
+    """
+    Return JSON bytes built by render_response (or read from a cache) as they are.
+
+    Skips content negotiation and rendering entirely.
+    """
+    return HttpResponse(content, status=response_status, content_type="application/json")
 
 
 def create_auth_response(msg, access_token, refresh_token, user, response_status):
@@ -1,8 +1,12 @@
 import base64
 
+from asgiref.sync import sync_to_async
 from selcom_apigw_client import apigwClient
 
+from utils.async_utils import run_vendor_call
 from utils.logger import AppLogger  # Custom logger utility
+from utils.metrics import track_gateway_call
+from utils.tracing import CLIENT, traced
 
 
 class SelcomApiClient:
@@ -10,13 +14,14 @@ class SelcomApiClient:
     A client class for interacting with the Selcom Payment Gateway API.
     Handles payment processing, order updates, and logging of all operations.
     """
+    order_status_path = "/v1/checkout/order-status"
 
     def __init__(self, get_static_config):
         """
         Initialize the Selcom API client with configuration and order details.
 
         Args:
-            get_static_config: Configuration object containing API settings
+            get_static_config: StaticConfigSnapshot (or OrderStaticConfig) containing API settings
         """
         # Initialize logger for tracking all operations
         self.logger = AppLogger(__name__)
@@ -48,22 +53,18 @@ class SelcomApiClient:
         self.vendor_till = get_static_config.vendor_till
         self.remark = get_static_config.remark
 
-    def execute_selcom_payment(self, order):
+    def build_order_payload(self, order):
         """
-        Execute a payment transaction through the Selcom API.
-
-        Args:
-            order: Order object containing customer and payment details
+        Build the create-order payload for an order.
 
-        Returns:
-            dict: Response from the API including status and payment URL if successful
+        Reads order.customer and order.fee, so load them with select_related
+        before calling this from async code.
         """
-        self.logger.info(f"Starting request payment execution for order: {order.order_id}")
         cancel_url = f"{self.redirect_url}/{order.uuid}/?redirect_status=cancel"
         redirect_url = f"{self.redirect_url}/{order.uuid}/?redirect_status=success"
 
         # Construct the order payload for the API request
-        order_dict = {
+        return {
             # Vendor and order identification
             "vendor": self.vendor_till,
             "order_id": order.order_id,
@@ -98,46 +99,90 @@ class SelcomApiClient:
             "redirect_url": base64.b64encode(redirect_url.encode()).decode(),
         }
 
+    @traced('selcom.create_order', kind=CLIENT)
+    @track_gateway_call('selcom', 'create_order')
+    def post_order(self, order_dict):
+        """
+        Send a create-order payload to the Selcom API.
+
+        Only performs the HTTP call, so it is safe to run from worker threads.
+        """
+        client = apigwClient.Client(self.base_url, self.api_Key, self.api_secret)
+        return client.postFunc(self.order_path, order_dict)
+
+    def handle_order_response(self, order, response):
+        """
+        Turn a create-order response into the result returned to the caller and
+        store the gateway details on the order when it succeeded.
+        """
+        if response['result'] == "FAIL":
+            # Handle failed payment response
+            self.logger.error(f"Payment failed for order: {order.order_id}. Response: {response}")
+            return {
+                "order": order.order_id,
+                "msg": response['message'],
+                "result": response['result'],
+                "result_code": response['resultcode'],
+                "decoded_string": "",
+            }
+
+        # Handle successful payment response
+        encoded_string = response['data'][0]['payment_gateway_url']
+        decoded_bytes = base64.b64decode(encoded_string)
+        decoded_string = decoded_bytes.decode('utf-8')
+
+        json_response = {
+            "msg": response['message'],
+            "result": response['result'],
+            "result_code": response['resultcode'],
+            "url": decoded_string,
+        }
+        self.logger.info(f"Payment successful for order: {order.order_id}")
+        self.update_order(order, response, decoded_string)
+        return json_response
+
+    @traced('selcom.execute_payment')
+    def execute_selcom_payment(self, order):
+        """
+        Execute a payment transaction through the Selcom API.
+
+        Args:
+            order: Order object containing customer and payment details
+
+        Returns:
+            dict: Response from the API including status and payment URL if successful
+        """
+        self.logger.info(f"Starting request payment execution for order: {order.order_id}")
+        order_dict = self.build_order_payload(order)
         self.logger.debug(f"Order payload: {order_dict}")
 
         try:
-            # Initialize API client and make the request
-            client = apigwClient.Client(self.base_url, self.api_Key, self.api_secret)
-            response = client.postFunc(self.order_path, order_dict)
-
-            if response['result'] == "FAIL":
-                # Handle failed payment response
-                json_response = {
-                    "order": order.order_id,
-                    "msg": response['message'],
-                    "result": response['result'],
-                    "result_code": response['resultcode'],
-                    "decoded_string": "",
-                }
-                self.logger.error(f"Payment failed for order: {order.order_id}. Response: {response}")
-
-            else:
-                # Handle successful payment response
-                encoded_string = response['data'][0]['payment_gateway_url']
-                decoded_bytes = base64.b64decode(encoded_string)
-                decoded_string = decoded_bytes.decode('utf-8')
-
-                json_response = {
-                    "msg": response['message'],
-                    "result": response['result'],
-                    "result_code": response['resultcode'],
-                    "url": decoded_string,
-                }
-                self.logger.info(f"Payment successful for order: {order.order_id}")
-                self.update_order(order, response, decoded_string)
-
-            return json_response
-
+            return self.handle_order_response(order, self.post_order(order_dict))
         except Exception as e:
             # Handle any exceptions during API communication
             self.logger.error(f"API request failed for order {order.order_id}: {str(e)}")
             raise  # Re-raise the exception after logging
 
+    @traced('selcom.execute_payment')
+    async def aexecute_selcom_payment(self, order):
+        """
+        Async execute_selcom_payment for ASGI views.
+
+        The HTTP call runs on the bounded 'selcom' vendor pool and the order
+        update through sync_to_async, so the event loop never blocks.
+        """
+        self.logger.info(f"Starting request payment execution for order: {order.order_id}")
+        order_dict = self.build_order_payload(order)
+        self.logger.debug(f"Order payload: {order_dict}")
+
+        try:
+            response = await run_vendor_call('selcom', self.post_order, order_dict)
+            return await sync_to_async(self.handle_order_response)(order, response)
+        except Exception as e:
+            self.logger.error(f"API request failed for order {order.order_id}: {str(e)}")
+            raise
+
+    @traced('selcom.update_order')
     def update_order(self, order, response, url):
         self.logger.info(f"Updating order {url}")
         """
@@ -172,3 +217,21 @@ class SelcomApiClient:
         except Exception as e:
             self.logger.error(f"Failed to update order {order.order_id}: {str(e)}")
             raise  # Re-raise the exception after logging
+
+    @traced('selcom.order_status', kind=CLIENT)
+    @track_gateway_call('selcom', 'order_status')
+    def get_order_status(self, order_id):
+        """
+        Query the status of an order from the Selcom API.
+
+        Only performs the HTTP call, so it is safe to run from worker threads.
+
+        Args:
+            order_id: Gateway order id (CustomerOrder.order_id)
+
+        Returns:
+            dict: API response; on success `data[0]` holds the payment details
+        """
+        self.logger.debug(f"Requesting order status for order: {order_id}")
+        client = apigwClient.Client(self.base_url, self.api_Key, self.api_secret)
+        return client.getFunc(self.order_status_path, {"order_id": order_id})
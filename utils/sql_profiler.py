@@ -0,0 +1,277 @@
+import hashlib
+import heapq
+import os
+import random
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.deprecation import MiddlewareMixin
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from utils.logger import AppLogger
+from utils.metrics import add_request_query_wrapper, remove_request_query_wrapper, request_view
+from utils.response_utils import create_response
+
+logger = AppLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-SQL'
+# execute wrappers in the project; never reported as the caller of a query
+WRAPPER_FILES = ('utils/sql_profiler.py', 'utils/metrics.py', 'utils/tracing.py')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+")
+
+
+def normalize_sql(sql):
+    """
+    Reduce a query to its shape: literals and placeholders become ?, IN lists and bulk VALUES collapse.
+
+    Queries that differ only in their parameters normalize to the same text.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql.replace('%s', '?'))
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES_LIST.sub(r'\1, ...', sql)
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def _caller():
+    # the innermost project frame outside the profiler,
+    # e.g. "homes/serializers/property_serializer.py:42 in get_thumbnail"
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack(limit=60)):
+        filename = frame.filename
+        if not filename.startswith(base_dir) or 'site-packages' in filename:
+            continue
+        path = os.path.relpath(filename, base_dir)
+        if path not in WRAPPER_FILES:
+            return f"{path}:{frame.lineno} in {frame.name}"
+    return None
+
+
+class QueryRecorder:
+    """Database execute wrapper that records every query of a request with its duration and caller."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started, _caller()))
+
+    def summarize(self):
+        """
+        Group the recorded queries by fingerprint, slowest first.
+
+        Returns:
+            list: dicts with fingerprint, sql, count, time_ms and callers
+        """
+        groups = {}
+        for sql, duration, caller in self.queries:
+            normalized = normalize_sql(sql)
+            key = fingerprint(normalized)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {'fingerprint': key, 'sql': normalized, 'count': 0, 'time_ms': 0.0, 'callers': []}
+            group['count'] += 1
+            group['time_ms'] += duration * 1000
+            if caller and caller not in group['callers']:
+                group['callers'].append(caller)
+        return sorted(groups.values(), key=lambda item: item['time_ms'], reverse=True)
+
+
+class QueryStatsStore:
+    """
+    Top query fingerprints and slowest profiled requests of this process.
+
+    Fingerprints are bounded: when the store is full, the one with the least
+    total time is dropped. Each gunicorn worker keeps its own store.
+    """
+
+    def __init__(self, max_fingerprints=500, max_requests=50):
+        self.max_fingerprints = max_fingerprints
+        self.max_requests = max_requests
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.profiled_requests = 0
+            self._fingerprints = {}
+            self._slow_requests = []
+            self._sequence = 0
+
+    def record(self, request_summary, groups):
+        with self._lock:
+            self.profiled_requests += 1
+            for group in groups:
+                stats = self._fingerprints.get(group['fingerprint'])
+                if stats is None:
+                    if len(self._fingerprints) >= self.max_fingerprints:
+                        cheapest = min(self._fingerprints, key=lambda key: self._fingerprints[key]['time_ms'])
+                        del self._fingerprints[cheapest]
+                    stats = self._fingerprints[group['fingerprint']] = {
+                        'fingerprint': group['fingerprint'], 'sql': group['sql'], 'count': 0, 'requests': 0,
+                        'time_ms': 0.0, 'max_request_time_ms': 0.0, 'views': [],
+                    }
+                stats['count'] += group['count']
+                stats['requests'] += 1
+                stats['time_ms'] += group['time_ms']
+                stats['max_request_time_ms'] = max(stats['max_request_time_ms'], group['time_ms'])
+                if request_summary['view'] not in stats['views'] and len(stats['views']) < 5:
+                    stats['views'].append(request_summary['view'])
+
+            # min-heap on duration keeps the slowest requests
+            self._sequence += 1
+            entry = (request_summary['duration_ms'], self._sequence, request_summary)
+            if len(self._slow_requests) < self.max_requests:
+                heapq.heappush(self._slow_requests, entry)
+            elif entry[0] > self._slow_requests[0][0]:
+                heapq.heapreplace(self._slow_requests, entry)
+
+    def snapshot(self, limit=50):
+        with self._lock:
+            fingerprints = sorted(self._fingerprints.values(), key=lambda item: item['time_ms'], reverse=True)
+            return {
+                'profiled_requests': self.profiled_requests,
+                'fingerprints': [
+                    dict(
+                        item, views=list(item['views']), time_ms=round(item['time_ms'], 3),
+                        max_request_time_ms=round(item['max_request_time_ms'], 3),
+                    )
+                    for item in fingerprints[:limit]
+                ],
+                'slow_requests': [entry[2] for entry in sorted(self._slow_requests, reverse=True)],
+            }
+
+
+query_stats = QueryStatsStore(max_fingerprints=getattr(settings, 'SQL_PROFILER_MAX_FINGERPRINTS', 500))
+
+
+def _should_profile(request):
+    token = getattr(settings, 'SQL_PROFILER_TOKEN', '')
+    header = request.headers.get(PROFILE_HEADER)
+    if header is not None and token and constant_time_compare(header, token):
+        return 'header'
+    sample_rate = getattr(settings, 'SQL_PROFILER_SAMPLE_RATE', 0.0)
+    if sample_rate and random.random() < sample_rate:
+        return 'sample'
+    return None
+
+
+class SQLProfilerMiddleware(MiddlewareMixin):
+    """
+    Profile the SQL of sampled requests.
+
+    A request is profiled when it sends "X-Profile-SQL: <SQL_PROFILER_TOKEN>"
+    or is picked at SQL_PROFILER_SAMPLE_RATE (0 to 1, off by default). Its
+    queries are normalized and grouped by fingerprint; a fingerprint run
+    SQL_PROFILER_DUPLICATE_THRESHOLD times or more in one request is reported
+    as an N+1 with the project code that issued it. Requests slower than
+    SQL_PROFILER_SLOW_REQUEST_MS (and every header-profiled request) are
+    logged with their query breakdown, and all profiled requests feed the
+    per-process stats served by SQLProfileApiView.
+    """
+
+    def process_request(self, request):
+        request._sql_profile_mode = _should_profile(request)
+        if request._sql_profile_mode is None:
+            return
+        request._sql_profile_started = time.perf_counter()
+        request._sql_recorder = QueryRecorder()
+        add_request_query_wrapper(request._sql_recorder)
+
+    def process_response(self, request, response):
+        recorder = getattr(request, '_sql_recorder', None)
+        if recorder is None:
+            return response
+        duration_ms = (time.perf_counter() - request._sql_profile_started) * 1000
+        remove_request_query_wrapper(recorder)
+
+        groups = recorder.summarize()
+        threshold = getattr(settings, 'SQL_PROFILER_DUPLICATE_THRESHOLD', 5)
+        duplicates = [group for group in groups if group['count'] >= threshold]
+        query_time_ms = sum(group['time_ms'] for group in groups)
+        summary = {
+            'view': request_view(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'queries': len(recorder.queries),
+            'query_time_ms': round(query_time_ms, 2),
+            'duplicates': [
+                {'fingerprint': group['fingerprint'], 'count': group['count'], 'callers': group['callers'][:3]}
+                for group in duplicates
+            ],
+            'at': timezone.now().isoformat(),
+        }
+        query_stats.record(summary, groups)
+
+        slow_request_ms = getattr(settings, 'SQL_PROFILER_SLOW_REQUEST_MS', 500)
+        if request._sql_profile_mode == 'header' or duration_ms >= slow_request_ms:
+            self._log(summary, groups)
+        if request._sql_profile_mode == 'header':
+            response.headers['X-SQL-Profile'] = (
+                f"queries={summary['queries']}; time_ms={summary['query_time_ms']}; duplicates={len(duplicates)}"
+            )
+        return response
+
+    def _log(self, summary, groups):
+        lines = [
+            f"🐢 {summary['method']} {summary['path']} ({summary['view']}) took {summary['duration_ms']:.0f} ms, "
+            f"{summary['queries']} queries in {summary['query_time_ms']:.0f} ms"
+        ]
+        for group in groups[:10]:
+            lines.append(
+                f"  {group['time_ms']:8.1f} ms  x{group['count']:<4} {group['fingerprint']}  {group['sql'][:200]}"
+            )
+        for duplicate in summary['duplicates']:
+            lines.append(
+                f"  🔥 N+1: {duplicate['fingerprint']} ran {duplicate['count']} times "
+                f"from {', '.join(duplicate['callers']) or 'unknown'}"
+            )
+        logger.warning("\n".join(lines))
+
+
+class SQLProfileApiView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        tags=["monitoring"],
+        summary="SQL profile",
+        description="Top query fingerprints by total time and the slowest profiled requests of the worker "
+                    "that serves the call. Admin only.",
+    )
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 500)
+        except ValueError:
+            return create_response("limit must be a number", status.HTTP_400_BAD_REQUEST)
+        snapshot = query_stats.snapshot(limit)
+        return create_response(
+            "success", status.HTTP_200_OK, total_item=len(snapshot['fingerprints']), data=snapshot,
+        )
+
+    @extend_schema(tags=["monitoring"], summary="Reset SQL profile", description="Clear the worker's SQL profile.")
+    def delete(self, request):
+        query_stats.reset()
+        return create_response("SQL profile cleared", status.HTTP_200_OK)
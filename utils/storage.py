@@ -0,0 +1,263 @@
+"""
+Object storage for media: an S3-compatible bucket (AWS S3, MinIO, ...) shared by every app server.
+
+With MEDIA_STORAGE=s3 the default storage is HashedS3Storage, so ImageFields
+(PropertyImage.image, User.profile, Ads.image) write to the bucket; large
+server-side uploads are sent in parts (MEDIA_MULTIPART_THRESHOLD).
+
+Clients can also upload straight to the bucket, keeping the bytes off the
+app workers:
+
+    1. POST /uploads {"kind": "property_image", "content_type": "image/jpeg", "size": 123456}
+       returns a presigned POST (url + form fields), or for files above
+       MEDIA_MULTIPART_THRESHOLD a multipart upload with one presigned PUT URL per part
+    2. the client sends the bytes to the bucket
+    3. multipart only: POST /uploads/complete {"key", "upload_id", "parts": [{"part_number", "etag"}]}
+    4. the key is sent in place of the base64 data, e.g. "images": [{"key": "property/images/u7/....jpg"}]
+
+Prepare a bucket (or a local MinIO) with `python manage.py setup_media_bucket`.
+"""
+import math
+import mimetypes
+import uuid
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.storage import default_storage
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions, serializers, status
+from rest_framework.views import APIView
+from storages.backends.s3 import S3Storage
+
+from utils.logger import AppLogger
+from utils.media import IMMUTABLE_CACHE_CONTROL, HashedNameMixin
+from utils.response_utils import create_response
+
+logger = AppLogger(__name__)
+
+# upload kind -> upload_to of the field the key will be stored in; only kinds whose key an endpoint claims
+# (claim_upload), User.profile and Ads.image are not set through the API
+UPLOAD_KINDS = {
+    'property_image': 'property/images',
+}
+
+
+class HashedS3Storage(HashedNameMixin, S3Storage):
+    pass
+
+
+class DirectUploadsUnavailable(Exception):
+    pass
+
+
+def _s3_storage():
+    if not isinstance(default_storage, S3Storage):
+        raise DirectUploadsUnavailable("Direct uploads need MEDIA_STORAGE=s3")
+    return default_storage
+
+
+def _object_key(storage, name):
+    # the key in the bucket, below the storage's location prefix
+    return storage._normalize_name(name)
+
+
+def upload_prefix(user, kind):
+    return f"{UPLOAD_KINDS[kind]}/u{user.pk}/"
+
+
+def owns_upload(user, key, kind):
+    return kind in UPLOAD_KINDS and key.startswith(upload_prefix(user, kind)) and '..' not in key
+
+
+def create_direct_upload(user, kind, content_type, size):
+    """
+    Reserve a key for a client upload and return what the client needs to send the bytes.
+
+    Returns:
+        dict: {"key", "method": "POST", "url", "fields"} for a single presigned POST, or
+        {"key", "method": "MULTIPART", "upload_id", "part_size", "parts": [{"part_number", "url"}]}
+    """
+    storage = _s3_storage()
+    client = storage.connection.meta.client
+    expires = getattr(settings, 'MEDIA_UPLOAD_EXPIRES', 900)
+    extension = mimetypes.guess_extension(content_type) or ''
+    name = f"{upload_prefix(user, kind)}{uuid.uuid4().hex}{extension}"
+    key = _object_key(storage, name)
+
+    if size <= settings.MEDIA_MULTIPART_THRESHOLD:
+        presigned = client.generate_presigned_post(
+            storage.bucket_name, key,
+            Fields={'Content-Type': content_type, 'Cache-Control': IMMUTABLE_CACHE_CONTROL},
+            Conditions=[
+                {'Content-Type': content_type},
+                {'Cache-Control': IMMUTABLE_CACHE_CONTROL},
+                ['content-length-range', 1, settings.MEDIA_UPLOAD_MAX_SIZE],
+            ],
+            ExpiresIn=expires,
+        )
+        return {'key': name, 'method': 'POST', 'url': presigned['url'], 'fields': presigned['fields']}
+
+    part_size = settings.MEDIA_MULTIPART_PART_SIZE
+    upload_id = client.create_multipart_upload(
+        Bucket=storage.bucket_name, Key=key, ContentType=content_type, CacheControl=IMMUTABLE_CACHE_CONTROL,
+    )['UploadId']
+    parts = [
+        {
+            'part_number': number,
+            'url': client.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': storage.bucket_name, 'Key': key, 'UploadId': upload_id, 'PartNumber': number},
+                ExpiresIn=expires,
+            ),
+        }
+        for number in range(1, math.ceil(size / part_size) + 1)
+    ]
+    return {'key': name, 'method': 'MULTIPART', 'upload_id': upload_id, 'part_size': part_size, 'parts': parts}
+
+
+def complete_multipart_upload(name, upload_id, parts):
+    storage = _s3_storage()
+    storage.connection.meta.client.complete_multipart_upload(
+        Bucket=storage.bucket_name, Key=_object_key(storage, name), UploadId=upload_id,
+        MultipartUpload={
+            'Parts': [
+                {'PartNumber': part['part_number'], 'ETag': part['etag']}
+                for part in sorted(parts, key=lambda part: part['part_number'])
+            ],
+        },
+    )
+
+
+def abort_multipart_upload(name, upload_id):
+    storage = _s3_storage()
+    storage.connection.meta.client.abort_multipart_upload(
+        Bucket=storage.bucket_name, Key=_object_key(storage, name), UploadId=upload_id,
+    )
+
+
+def claim_upload(user, name, kind):
+    """
+    Return `name` when it is a finished direct upload of `user` for `kind` that may be stored in a field, else None.
+
+    Uploads over MEDIA_UPLOAD_MAX_SIZE or of a type not in
+    MEDIA_UPLOAD_CONTENT_TYPES (multipart parts are not size-bound by the
+    presigned URLs) are deleted.
+    """
+    if not owns_upload(user, name, kind):
+        logger.warning(f"⚠️ {user} cannot use upload {name} as {kind}")
+        return None
+    try:
+        storage = _s3_storage()
+        head = storage.connection.meta.client.head_object(Bucket=storage.bucket_name, Key=_object_key(storage, name))
+    except DirectUploadsUnavailable:
+        return None
+    except ClientError as e:
+        logger.warning(f"⚠️ Upload {name} not found: {e}")
+        return None
+    if (
+        head['ContentLength'] > settings.MEDIA_UPLOAD_MAX_SIZE
+        or head.get('ContentType') not in settings.MEDIA_UPLOAD_CONTENT_TYPES
+    ):
+        logger.warning(f"⚠️ Upload {name} rejected: {head['ContentLength']} bytes of {head.get('ContentType')}")
+        storage.delete(name)
+        return None
+    return name
+
+
+class DirectUploadSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=sorted(UPLOAD_KINDS))
+    content_type = serializers.CharField(max_length=100)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_content_type(self, value):
+        if value not in settings.MEDIA_UPLOAD_CONTENT_TYPES:
+            raise serializers.ValidationError(f"Allowed types: {', '.join(settings.MEDIA_UPLOAD_CONTENT_TYPES)}")
+        return value
+
+    def validate_size(self, value):
+        if value > settings.MEDIA_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Files up to {settings.MEDIA_UPLOAD_MAX_SIZE} bytes are accepted")
+        return value
+
+
+class UploadPartSerializer(serializers.Serializer):
+    part_number = serializers.IntegerField(min_value=1, max_value=10000)
+    etag = serializers.CharField(max_length=200)
+
+
+class MultipartUploadSerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=500)
+    upload_id = serializers.CharField(max_length=1000)
+    parts = UploadPartSerializer(many=True, required=False)
+
+    def validate_key(self, value):
+        user = self.context['request'].user
+        if not any(owns_upload(user, value, kind) for kind in UPLOAD_KINDS):
+            raise serializers.ValidationError("Unknown upload")
+        return value
+
+
+class DirectUploadApiView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        request=DirectUploadSerializer,
+        tags=["uploads"],
+        summary="Start a direct upload",
+        description="Presigned POST, or a multipart upload with presigned part URLs for large files, to send a "
+                    "file straight to object storage. Send the returned key in place of the file afterwards.",
+    )
+    def post(self, request):
+        serializer = DirectUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return create_response(f"Invalid upload: {serializer.errors}", status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = create_direct_upload(request.user, **serializer.validated_data)
+        except DirectUploadsUnavailable as e:
+            return create_response(str(e), status.HTTP_400_BAD_REQUEST)
+        logger.info(f"📤 Direct upload {upload['key']} ({upload['method']}) started by {request.user}")
+        return create_response("success", status.HTTP_200_OK, data=upload)
+
+
+class DirectUploadCompleteApiView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        request=MultipartUploadSerializer,
+        tags=["uploads"],
+        summary="Complete a multipart upload",
+        description="Assemble the uploaded parts; `parts` lists the part numbers with the ETag returned for each.",
+    )
+    def post(self, request):
+        serializer = MultipartUploadSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid() or not serializer.validated_data.get('parts'):
+            return create_response(f"Invalid upload: {serializer.errors or 'parts are required'}",
+                                   status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        try:
+            complete_multipart_upload(data['key'], data['upload_id'], data['parts'])
+        except DirectUploadsUnavailable as e:
+            return create_response(str(e), status.HTTP_400_BAD_REQUEST)
+        except ClientError as e:
+            logger.warning(f"⚠️ Completing upload {data['key']} failed: {e}")
+            return create_response("Upload could not be completed", status.HTTP_400_BAD_REQUEST)
+        return create_response("success", status.HTTP_200_OK, data={'key': data['key']})
+
+    @extend_schema(
+        request=MultipartUploadSerializer,
+        tags=["uploads"],
+        summary="Abort a multipart upload",
+        description="Discard the parts uploaded so far.",
+    )
+    def delete(self, request):
+        serializer = MultipartUploadSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return create_response(f"Invalid upload: {serializer.errors}", status.HTTP_400_BAD_REQUEST)
+        try:
+            abort_multipart_upload(serializer.validated_data['key'], serializer.validated_data['upload_id'])
+        except DirectUploadsUnavailable as e:
+            return create_response(str(e), status.HTTP_400_BAD_REQUEST)
+        except ClientError as e:
+            logger.warning(f"⚠️ Aborting upload {serializer.validated_data['key']} failed: {e}")
+            return create_response("Upload could not be aborted", status.HTTP_400_BAD_REQUEST)
+        return create_response("Upload aborted", status.HTTP_200_OK)
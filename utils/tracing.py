@@ -0,0 +1,498 @@
+import atexit
+import inspect
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+
+import requests
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+from utils.logger import AppLogger
+from utils.metrics import request_view
+
+logger = AppLogger(__name__)
+
+INTERNAL = 'internal'
+SERVER = 'server'
+CLIENT = 'client'
+# OTLP SpanKind and StatusCode values
+_OTLP_KINDS = {INTERNAL: 1, SERVER: 2, CLIENT: 3}
+_OTLP_STATUS = {'unset': 0, 'ok': 1, 'error': 2}
+
+TRACE_ID_HEADER = 'X-Trace-Id'
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_MAX_STATEMENT_LENGTH = 2000
+
+# the innermost open span of the current request, job or task; copied into
+# asyncio tasks and sync_to_async threads, so children find their parent
+_current_span = ContextVar('current_span', default=None)
+
+
+def _tracing_enabled():
+    return getattr(settings, 'TRACING_ENABLED', False)
+
+
+def _new_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class _Trace:
+    """The finished spans of one trace in this process, exported when its local root ends."""
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self.open_spans = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+
+class Span:
+    """
+    A timed operation in a trace. Use start_span() or @traced rather than creating spans directly.
+
+    Spans of unsampled traces are not recording: they carry the ids so nested
+    code does not start a trace of its own, but record and export nothing.
+    """
+
+    def __init__(self, name, kind, attributes, trace, parent_id=None, recording=True):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.recording = recording
+        self.status = 'unset'
+        self.status_message = ''
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._started = time.perf_counter_ns()
+        if recording:
+            with trace.lock:
+                trace.open_spans += 1
+
+    @property
+    def trace_id(self):
+        return self.trace.trace_id
+
+    def set_attribute(self, key, value):
+        if self.recording:
+            self.attributes[key] = value
+
+    def set_status(self, status, message=''):
+        if self.recording:
+            self.status = status
+            self.status_message = message
+
+    def record_exception(self, exc):
+        self.set_status('error', str(exc)[:500])
+        self.set_attribute('exception.type', type(exc).__name__)
+
+    def child(self, name, kind, attributes):
+        return Span(name, kind, attributes, self.trace, parent_id=self.span_id, recording=self.recording)
+
+    def end(self):
+        if not self.recording or self.end_ns is not None:
+            return
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._started
+        trace = self.trace
+        with trace.lock:
+            if len(trace.spans) < getattr(settings, 'TRACING_MAX_SPANS', 1000):
+                trace.spans.append(self)
+            else:
+                trace.dropped += 1
+            trace.open_spans -= 1
+            finished = trace.open_spans == 0
+        if finished:
+            if trace.dropped:
+                logger.warning(f"⚠️ Trace {trace.trace_id} dropped {trace.dropped} spans over TRACING_MAX_SPANS")
+            get_span_processor().submit(trace.spans)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_ns': self.start_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'status': self.status,
+            'status_message': self.status_message,
+            'attributes': self.attributes,
+        }
+
+
+def start_root_span(name, kind=INTERNAL, attributes=None, traceparent=None, sampled=None):
+    """
+    Open a span that starts a trace, or continues the one of a W3C `traceparent` header.
+
+    The trace is sampled at TRACING_SAMPLE_RATE unless `sampled` is given; a
+    valid traceparent carries the caller's decision. The span is made current;
+    end it with end_root_span(). Returns None when TRACING_ENABLED is off.
+    """
+    if not _tracing_enabled():
+        return None
+    trace_id = parent_id = None
+    match = _TRACEPARENT.match(traceparent or '')
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        sampled = bool(int(flags, 16) & 1)
+    if sampled is None:
+        sampled = random.random() < getattr(settings, 'TRACING_SAMPLE_RATE', 1.0)
+    span = Span(name, kind, attributes or {}, _Trace(trace_id or _new_id(128)), parent_id=parent_id, recording=sampled)
+    if sampled:
+        _install_query_tracer()
+    _current_span.set(span)
+    return span
+
+
+def end_root_span(span):
+    _current_span.set(None)
+    span.end()
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name, kind=INTERNAL, **attributes):
+    """
+    Time a block as a child of the current span.
+
+        with start_span('selcom.build_payload', order=order.order_id) as span:
+            ...
+
+    Traces are started by TracingMiddleware and @trace_job only, so outside a
+    sampled request or job nothing is recorded and the span yielded is None or
+    not recording. An exception leaving the block marks the span as failed.
+    """
+    parent = _current_span.get()
+    if parent is None or not parent.recording:
+        yield parent
+        return
+    span = parent.child(name, kind, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.record_exception(exc)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name=None, kind=INTERNAL):
+    """
+    Decorator running a sync or async function in a span named `name` (the function's dotted path by default).
+
+        @traced('selcom.create_order', kind=CLIENT)
+        def post_order(self, order_dict): ...
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_job(job):
+    """
+    Decorator giving every run of a background job (cron) a root span "cron <job>".
+
+    Jobs are rare and slow, so every run is recorded when tracing is enabled,
+    regardless of TRACING_SAMPLE_RATE.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            span = start_root_span(f"cron {job}", attributes={'cron.job': job}, sampled=True)
+            if span is None:
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            except BaseException as exc:
+                span.record_exception(exc)
+                raise
+            finally:
+                end_root_span(span)
+        return wrapper
+    return decorator
+
+
+def propagate_context(func):
+    """
+    Bind `func` to a copy of the caller's context, for work handed to a plain ThreadPoolExecutor.
+
+    Executor threads start with an empty context, so without it their spans
+    would open traces of their own instead of joining the caller's.
+    """
+    context = copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # a context can only be entered by one thread at a time
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def _trace_query(execute, sql, params, many, context):
+    parent = _current_span.get()
+    if parent is None or not parent.recording:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    statement = sql if isinstance(sql, str) else str(sql)
+    span = parent.child(
+        statement.split(None, 1)[0].upper() if statement.strip() else 'QUERY', CLIENT,
+        {
+            'db.system': connection.vendor,
+            'db.name': connection.alias,
+            'db.statement': statement[:_MAX_STATEMENT_LENGTH],
+            'db.executemany': many,
+        },
+    )
+    try:
+        return execute(sql, params, many, context)
+    except BaseException as exc:
+        span.record_exception(exc)
+        raise
+    finally:
+        span.end()
+
+
+def _install_query_tracer():
+    # stays installed: it only records while a sampled span is current, and
+    # concurrent async requests share the connections of one thread
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if _trace_query not in wrappers:
+            wrappers.insert(0, _trace_query)
+
+
+class FileSpanExporter:
+    """Append finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = ''.join(json.dumps(span.to_dict(), default=str) + '\n' for span in spans)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as trace_file:
+                trace_file.write(lines)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class OTLPSpanExporter:
+    """
+    Send finished spans to an OpenTelemetry collector over OTLP/HTTP with the JSON encoding.
+
+    The endpoint is the collector's traces URL, e.g. http://otel-collector:4318/v1/traces.
+    """
+
+    def __init__(self, endpoint, headers=None, service_name='mhp', timeout=10):
+        self.endpoint = endpoint
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.resource = _otlp_attributes({'service.name': service_name})
+        self.timeout = timeout
+
+    def payload(self, spans):
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': self.resource},
+                'scopeSpans': [{
+                    'scope': {'name': 'utils.tracing'},
+                    'spans': [
+                        {
+                            'traceId': span.trace_id,
+                            'spanId': span.span_id,
+                            'parentSpanId': span.parent_id or '',
+                            'name': span.name,
+                            'kind': _OTLP_KINDS[span.kind],
+                            'startTimeUnixNano': str(span.start_ns),
+                            'endTimeUnixNano': str(span.end_ns),
+                            'attributes': _otlp_attributes(span.attributes),
+                            'status': {'code': _OTLP_STATUS[span.status], 'message': span.status_message},
+                        }
+                        for span in spans
+                    ],
+                }],
+            }],
+        }
+
+    def export(self, spans):
+        response = requests.post(
+            self.endpoint, data=json.dumps(self.payload(spans), default=str), headers=self.headers,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+
+class BatchSpanProcessor:
+    """
+    Export finished traces from a background thread, so requests never wait on the exporter.
+
+    At most `max_queue` traces wait for export; further ones are dropped and
+    logged. Pending spans are flushed when the process exits.
+    """
+
+    def __init__(self, exporter, max_queue=2048, max_batch=512, interval=2.0):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, spans):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning(f"⚠️ Trace export queue full, dropped {len(spans)} spans")
+
+    def _ensure_thread(self):
+        # gunicorn forks workers after the settings are loaded; each process needs its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._thread = threading.Thread(target=self._run, name='trace-export', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    spans = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if spans is None:
+                    self._export(batch)
+                    return
+                batch = batch + spans
+            self._export(batch)
+
+    def _export(self, spans):
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to export {len(spans)} spans: {e}")
+
+    def shutdown(self, timeout=5):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._pid = None
+
+
+_span_processor = None
+_span_processor_lock = threading.Lock()
+
+
+def _build_exporter():
+    if getattr(settings, 'TRACING_EXPORTER', 'file') == 'otlp':
+        headers = dict(
+            item.split('=', 1) for item in getattr(settings, 'TRACING_OTLP_HEADERS', ()) if '=' in item
+        )
+        return OTLPSpanExporter(
+            settings.TRACING_OTLP_ENDPOINT, headers=headers,
+            service_name=getattr(settings, 'TRACING_SERVICE_NAME', 'mhp'),
+        )
+    return FileSpanExporter(str(settings.TRACING_FILE))
+
+
+def get_span_processor():
+    global _span_processor
+    with _span_processor_lock:
+        if _span_processor is None:
+            _span_processor = BatchSpanProcessor(_build_exporter())
+            atexit.register(_span_processor.shutdown)
+    return _span_processor
+
+
+class TracingMiddleware(MiddlewareMixin):
+    """
+    Open the root span of every sampled request, named after the view that serves it.
+
+    Database queries, @traced functions and gateway calls made while serving
+    the request become its children. An incoming W3C `traceparent` header is
+    continued, and the trace id is returned in X-Trace-Id so a slow request
+    reported by a client can be found in the exported spans.
+    """
+
+    def process_request(self, request):
+        request._trace_span = start_root_span(
+            f"{request.method} {request.path}", SERVER,
+            {'http.method': request.method, 'http.target': request.path},
+            traceparent=request.headers.get('traceparent'),
+        )
+
+    def process_exception(self, request, exception):
+        span = getattr(request, '_trace_span', None)
+        if span is not None:
+            span.record_exception(exception)
+
+    def process_response(self, request, response):
+        span = getattr(request, '_trace_span', None)
+        if span is None:
+            return response
+        if span.recording:
+            span.name = f"{request.method} {request_view(request)}"
+            span.set_attribute('http.status_code', response.status_code)
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                span.set_attribute('enduser.id', user.pk)
+            if response.status_code >= 500:
+                span.set_status('error')
+            response.headers[TRACE_ID_HEADER] = span.trace_id
+        end_root_span(span)
+        return response